@@ -0,0 +1,82 @@
+"""Benchmark the scaling of whole-graph analytics with worker processes.
+
+Usage:
+    python -m benchmarks.analytics_scaling [--shape mixed] [--nodes 100000]
+                                           [--workers 1 2 4 8]
+
+A synthetic lineage graph (see benchmarks.generators) is written to a SQLite
+file and loaded into a Graph. Every analysis of GraphAnalytics is then timed
+with each number of workers, including the start-up of the processes and
+the copy of the encoding into shared memory, and its speed-up over one
+worker is reported. Results are checked to be the same for every count.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any
+
+from benchmarks.generators import SHAPES, populate
+from data_version_graph.analytics import GraphAnalytics
+from data_version_graph.database import create_database
+from data_version_graph.graph import Graph
+
+ANALYSES = ("downstream_counts", "orphans", "stale_report")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="mixed")
+    parser.add_argument("--nodes", type=int, default=100_000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'graph.db')}"
+        populate(database_url, SHAPES[args.shape](args.nodes))
+        graph = Graph(session=create_database(database_url)())
+
+        start = time.perf_counter()
+        GraphAnalytics(graph)
+        encode_seconds = time.perf_counter() - start
+
+        results: dict[str, Any] = {
+            "shape": args.shape,
+            "nodes": graph.graph.number_of_nodes(),
+            "edges": graph.graph.number_of_edges(),
+            "cpus": os.cpu_count(),
+            "encode_seconds": round(encode_seconds, 3),
+        }
+        expected: dict[str, Any] = {}
+        for analysis in ANALYSES:
+            timings = {}
+            for workers in args.workers:
+                graph_analytics = GraphAnalytics(graph, workers=workers)
+                start = time.perf_counter()
+                result = getattr(graph_analytics, analysis)()
+                timings[workers] = time.perf_counter() - start
+                assert expected.setdefault(analysis, result) == result
+            baseline = timings[min(timings)]
+            results[analysis] = {
+                str(workers): {
+                    "seconds": round(seconds, 3),
+                    "speedup": round(baseline / seconds, 2),
+                }
+                for workers, seconds in timings.items()
+            }
+        graph.session.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
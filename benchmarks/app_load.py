@@ -0,0 +1,98 @@
+"""Load-test the Flask app with concurrent test clients.
+
+Usage:
+    python -m benchmarks.app_load [--threads 1 2 4 8] [--requests 2000]
+                                  [--read-ratio 0.95] [--nodes 10000]
+
+Each run is repeated with every request forced through one global mutex,
+which is how the app behaved with a single shared session and one worker
+thread, so the two throughput figures can be compared directly.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from data_version_graph.app import app as flask_app
+from data_version_graph.nodes import BigQueryTable
+
+
+def run(
+    n_threads: int,
+    n_requests: int,
+    read_ratio: float,
+    n_nodes: int,
+    *,
+    serialized: bool,
+) -> float:
+    mutex = threading.Lock() if serialized else contextlib.nullcontext()
+    per_thread = n_requests // n_threads
+    start_barrier = threading.Barrier(n_threads + 1)
+
+    def worker(index: int) -> None:
+        rng = random.Random(index)
+        client = flask_app.app.test_client()
+        start_barrier.wait()
+        for i in range(per_thread):
+            is_read = rng.random() < read_ratio
+            with mutex:
+                if is_read:
+                    client.get(f"/nodes/get?name=table_{rng.randrange(n_nodes)}")
+                else:
+                    client.post(
+                        "/edges/add",
+                        json={
+                            "upstream": {"ntype": "Node", "name": f"src_{index}"},
+                            "downstream": {"ntype": "Node", "name": f"dst_{index}_{i}"},
+                        },
+                    )
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return per_thread * n_threads / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--read-ratio", type=float, default=0.95)
+    parser.add_argument("--nodes", type=int, default=10_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        flask_app.app.config["SQLALCHEMY_DATABASE_URI"] = (
+            f"sqlite:///{os.path.join(tmpdir, 'graph.db')}"
+        )
+        graph = flask_app.init_graph(flask_app.app)
+        graph.add_nodes(BigQueryTable(f"table_{i}") for i in range(args.nodes))
+
+        for n_threads in args.threads:
+            results = {
+                mode: round(
+                    run(
+                        n_threads,
+                        args.requests,
+                        args.read_ratio,
+                        args.nodes,
+                        serialized=mode == "serialized",
+                    ),
+                    1,
+                )
+                for mode in ("serialized", "concurrent")
+            }
+            print(json.dumps({"threads": n_threads, "requests_per_second": results}))
+
+
+if __name__ == "__main__":
+    main()
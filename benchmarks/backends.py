@@ -0,0 +1,96 @@
+"""Benchmark the networkx and CSR engines on lineage queries.
+
+Usage:
+    python -m benchmarks.backends [--edges 1000000] [--queries 20]
+
+A random DAG of Node objects is built as an nx.DiGraph and converted to a
+CSRGraph. Both are then timed on full ancestor and descendant queries from
+the same random nodes and on a topological sort, and their memory is
+measured with tracemalloc. The csr backend of Graph keeps the nx.DiGraph as
+its write model and rebuilds the CSRGraph after writes, so its footprint is
+the total_memory_mb of both, and rebuild_seconds (timed without tracemalloc,
+which slows build_seconds down) is the cost of a rebuild.
+"""
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+import networkx as nx
+
+from benchmarks.cycle_check import random_dag_edges
+from data_version_graph.csr import CSRGraph
+from data_version_graph.nodes import Node
+
+
+def traced(build: Callable[[], Any]) -> tuple[Any, float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, size / 1024 / 1024
+
+
+def timed(run: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    edges = random_dag_edges(args.edges)
+    nodes = [Node(f"table_{i}") for i in range(max(max(edge) for edge in edges) + 1)]
+
+    graph, nx_build, nx_mb = traced(
+        lambda: nx.DiGraph((nodes[u], nodes[v]) for u, v in edges)
+    )
+    csr, csr_build, csr_mb = traced(lambda: CSRGraph.from_networkx(graph))
+
+    rng = random.Random(1)
+    sample = rng.sample(list(graph), args.queries)
+    results: dict[str, Any] = {
+        "nodes": graph.number_of_nodes(),
+        "edges": graph.number_of_edges(),
+        "networkx": {"build_seconds": round(nx_build, 3), "memory_mb": round(nx_mb, 1)},
+        "csr": {
+            "build_seconds": round(csr_build, 3),
+            # Includes the node list and id map alongside the arrays.
+            "memory_mb": round(csr_mb, 1),
+            "array_mb": round(csr.nbytes / 1024 / 1024, 1),
+            "total_memory_mb": round(nx_mb + csr_mb, 1),
+            "rebuild_seconds": round(timed(lambda: CSRGraph.from_networkx(graph)), 3),
+        },
+    }
+    queries = {
+        "ancestors": (nx.ancestors, csr.ancestors),
+        "descendants": (nx.descendants, csr.descendants),
+    }
+    for query, (nx_query, csr_query) in queries.items():
+        for node in sample:
+            assert nx_query(graph, node) == csr_query(node)
+        results["networkx"][f"{query}_ms"] = round(
+            1000 * timed(lambda: [nx_query(graph, n) for n in sample]) / len(sample), 2
+        )
+        results["csr"][f"{query}_ms"] = round(
+            1000 * timed(lambda: [csr_query(n) for n in sample]) / len(sample), 2
+        )
+    results["networkx"]["topological_sort_seconds"] = round(
+        timed(lambda: list(nx.topological_sort(graph))), 3
+    )
+    results["csr"]["topological_sort_seconds"] = round(timed(csr.topological_sort), 3)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark edge-insertion cycle checks against a full acyclicity test.
+
+Usage:
+    python -m benchmarks.cycle_check [--edges 100000] [--candidates 200]
+
+A random DAG with the requested number of edges is built, then the same set of
+candidate edges (some of which would close a cycle) is checked with the
+previous whole-graph test and with the incremental TopologicalOrder.
+"""
+
+import argparse
+import json
+import random
+import time
+
+import networkx as nx
+
+from data_version_graph.topological_order import TopologicalOrder
+
+EDGES_PER_NODE = 4
+
+
+def random_dag_edges(n_edges: int, *, seed: int = 0) -> list[tuple[int, int]]:
+    rng = random.Random(seed)
+    n_nodes = max(2, n_edges // EDGES_PER_NODE)
+    # Ranks are shuffled so insertion order does not follow the topological
+    # order, which is the case that makes the incremental structure reorder.
+    rank = list(range(n_nodes))
+    rng.shuffle(rank)
+
+    edges: set[tuple[int, int]] = set()
+    while len(edges) < n_edges:
+        low = rng.randrange(n_nodes - 1)
+        high = rng.randrange(low + 1, n_nodes)
+        edges.add((rank[low], rank[high]))
+    ordered = list(edges)
+    rng.shuffle(ordered)
+    return ordered
+
+
+def full_check(graph: nx.DiGraph, from_node: int, to_node: int) -> bool:
+    graph.add_edge(from_node, to_node)
+    is_cyclic = not nx.is_directed_acyclic_graph(graph)
+    graph.remove_edge(from_node, to_node)
+    return is_cyclic
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--edges", type=int, default=100_000)
+    parser.add_argument("--candidates", type=int, default=200)
+    args = parser.parse_args()
+
+    edges = random_dag_edges(args.edges)
+    graph = nx.DiGraph()
+    order = TopologicalOrder(graph)
+
+    # Incremental ingestion of the whole DAG, one checked edge at a time.
+    start = time.perf_counter()
+    for from_node, to_node in edges:
+        if not order.creates_cycle(from_node, to_node):
+            graph.add_edge(from_node, to_node)
+            order.add_edge(from_node, to_node)
+    ingest_seconds = time.perf_counter() - start
+
+    rng = random.Random(1)
+    nodes = list(graph.nodes)
+    candidates = [
+        (rng.choice(nodes), rng.choice(nodes)) for _ in range(args.candidates)
+    ]
+
+    start = time.perf_counter()
+    expected = [full_check(graph, *edge) for edge in candidates]
+    full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [order.creates_cycle(*edge) for edge in candidates]
+    incremental_seconds = time.perf_counter() - start
+
+    assert actual == expected
+    print(
+        json.dumps(
+            {
+                "nodes": graph.number_of_nodes(),
+                "edges": graph.number_of_edges(),
+                "candidates": len(candidates),
+                "cyclic_candidates": sum(expected),
+                "full_check_ms_per_edge": round(
+                    1000 * full_seconds / len(candidates), 3
+                ),
+                "incremental_ms_per_edge": round(
+                    1000 * incremental_seconds / len(candidates), 3
+                ),
+                "incremental_ingest_seconds": round(ingest_seconds, 3),
+            }
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
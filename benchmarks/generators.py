@@ -0,0 +1,165 @@
+"""Synthetic lineage graphs for the benchmark suite.
+
+Each generator returns a SyntheticGraph with the shape of a real lineage
+graph:
+
+* fan_out: Cloud Storage objects, each loaded into many BigQuery tables;
+* deep_chains: long chains of BigQuery tables, each built from the previous;
+* versioned: names with many versions, each built on a version of another
+  name, so that many nodes are stale;
+* mixed: all three at once, in the proportions of a typical warehouse.
+
+Nodes are generated in a topological order: every edge points from an
+earlier node to a later one.
+"""
+
+import random
+from dataclasses import dataclass, field
+from typing import Callable
+
+from sqlalchemy import create_engine, insert
+
+from data_version_graph.database import Base, EdgeModel, NodeModel
+from data_version_graph.nodes import (
+    BigQueryTable,
+    GoogleCloudStorageObject,
+    Node,
+    PostgresTable,
+)
+
+INSERT_CHUNK_SIZE = 50_000
+
+
+@dataclass
+class SyntheticGraph:
+    nodes: list[Node] = field(default_factory=list)
+    edges: list[tuple[Node, Node]] = field(default_factory=list)
+
+    def extend(self, other: "SyntheticGraph") -> None:
+        self.nodes.extend(other.nodes)
+        self.edges.extend(other.edges)
+
+
+def fan_out(
+    n_nodes: int, *, fan: int = 50, prefix: str = "gcs", seed: int = 0
+) -> SyntheticGraph:
+    rng = random.Random(seed)
+    graph = SyntheticGraph()
+    n_sources = max(1, n_nodes // (fan + 1))
+    for i in range(n_sources):
+        source = GoogleCloudStorageObject(
+            f"{prefix}_bucket/object_{i}", size=rng.randrange(1 << 30)
+        )
+        graph.nodes.append(source)
+        for j in range(fan):
+            table = BigQueryTable(
+                f"{prefix}_raw.table_{i}_{j}", rows=rng.randrange(1 << 20)
+            )
+            graph.nodes.append(table)
+            graph.edges.append((source, table))
+    return graph
+
+
+def deep_chains(
+    n_nodes: int, *, length: int = 200, prefix: str = "chain", seed: int = 0
+) -> SyntheticGraph:
+    rng = random.Random(seed)
+    graph = SyntheticGraph()
+    for i in range(max(1, n_nodes // length)):
+        previous = None
+        for j in range(length):
+            table = BigQueryTable(f"{prefix}_{i}.step_{j}", rows=rng.randrange(1 << 20))
+            graph.nodes.append(table)
+            if previous is not None:
+                graph.edges.append((previous, table))
+            previous = table
+    return graph
+
+
+def versioned(
+    n_nodes: int,
+    *,
+    versions: int = 20,
+    dependencies: int = 3,
+    prefix: str = "versioned",
+    seed: int = 0,
+) -> SyntheticGraph:
+    # Each version of a name depends on some version of a few names defined
+    # before it. Dependencies are picked at random among the versions that
+    # exist, so most nodes end up built on an outdated version.
+    rng = random.Random(seed)
+    graph = SyntheticGraph()
+    n_names = max(1, n_nodes // versions)
+    defined: list[list[Node]] = []
+    for i in range(n_names):
+        node_versions = [
+            PostgresTable(f"{prefix}.table_{i}", version=version)
+            for version in range(1, versions + 1)
+        ]
+        graph.nodes.extend(node_versions)
+        if defined:
+            for node in node_versions:
+                for upstream in rng.sample(defined, min(dependencies, len(defined))):
+                    graph.edges.append((rng.choice(upstream), node))
+        defined.append(node_versions)
+    return graph
+
+
+def mixed(n_nodes: int, *, seed: int = 0) -> SyntheticGraph:
+    graph = SyntheticGraph()
+    graph.extend(fan_out(n_nodes * 4 // 10, seed=seed))
+    graph.extend(deep_chains(n_nodes * 3 // 10, seed=seed + 1))
+    graph.extend(versioned(n_nodes * 3 // 10, seed=seed + 2))
+    # Staging tables read from the raw tables loaded from Cloud Storage.
+    rng = random.Random(seed + 3)
+    raw = [node for node in graph.nodes if node.name.startswith("gcs_raw.")]
+    chain_starts = [node for node in graph.nodes if node.name.endswith(".step_0")]
+    for start in chain_starts:
+        for upstream in rng.sample(raw, min(2, len(raw))):
+            graph.edges.append((upstream, start))
+    return graph
+
+
+SHAPES: dict[str, Callable[..., SyntheticGraph]] = {
+    "fan_out": fan_out,
+    "deep_chains": deep_chains,
+    "versioned": versioned,
+    "mixed": mixed,
+}
+
+
+def populate(database_url: str, graph: SyntheticGraph) -> None:
+    # Writes the rows directly, as loading them through Graph is what some of
+    # the scenarios measure.
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    node_ids = {node: i for i, node in enumerate(graph.nodes, start=1)}
+    with engine.begin() as connection:
+        for start in range(0, len(graph.nodes), INSERT_CHUNK_SIZE):
+            connection.execute(
+                insert(NodeModel),
+                [
+                    {
+                        "id": node_ids[node],
+                        "ntype": node.ntype,
+                        "name": node.name,
+                        "version": node.version,
+                        "properties": dict(node.properties),
+                    }
+                    for node in graph.nodes[start : start + INSERT_CHUNK_SIZE]
+                ],
+            )
+        for start in range(0, len(graph.edges), INSERT_CHUNK_SIZE):
+            connection.execute(
+                insert(EdgeModel),
+                [
+                    {
+                        "from_node_id": node_ids[from_node],
+                        "to_node_id": node_ids[to_node],
+                    }
+                    for from_node, to_node in graph.edges[
+                        start : start + INSERT_CHUNK_SIZE
+                    ]
+                ],
+            )
+    engine.dispose()
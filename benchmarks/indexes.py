@@ -0,0 +1,87 @@
+"""Benchmark mutation latency against table size, with and without indexes.
+
+Usage:
+    python -m benchmarks.indexes [--edges 1000 10000 100000] [--samples 200]
+
+For every size the same database is measured twice: once as created, and
+once after dropping the (name, version) and edge endpoint indexes.
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from collections.abc import Callable, Iterable
+
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.load_graph import populate
+from data_version_graph.database import Base
+from data_version_graph.graph import Graph
+
+
+def drop_indexes(engine: Engine) -> None:
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(connection, checkfirst=True)
+
+
+def measure(database_url: str, samples: int) -> dict:
+    session = sessionmaker(bind=create_engine(database_url))()
+    graph = Graph(session=session)
+    rng = random.Random(0)
+    nodes = rng.sample(list(graph.graph.nodes), samples)
+    edges = rng.sample(list(graph.graph.edges), samples)
+
+    def per_call_ms(calls: Iterable[Callable[[], object]]) -> float:
+        start = time.perf_counter()
+        for call in calls:
+            call()
+        return round(1000 * (time.perf_counter() - start) / samples, 3)
+
+    result = {
+        "get_db_node_ms": per_call_ms(
+            lambda node=node: graph._get_db_node(node.name, version=node.version)
+            for node in nodes
+        ),
+        "remove_edge_ms": per_call_ms(
+            lambda edge=edge: graph.remove_edge(*edge) for edge in edges
+        ),
+        "add_edge_ms": per_call_ms(
+            lambda edge=edge: graph.add_edge(*edge) for edge in edges
+        ),
+    }
+    session.close()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--edges", type=int, nargs="+", default=[1_000, 10_000, 100_000]
+    )
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n_edges in args.edges:
+            database_url = f"sqlite:///{os.path.join(tmpdir, f'{n_edges}.db')}"
+            populate(database_url, n_edges)
+            samples = min(args.samples, n_edges // 4)
+
+            indexed = measure(database_url, samples)
+            drop_indexes(create_engine(database_url))
+            unindexed = measure(database_url, samples)
+            print(
+                json.dumps(
+                    {"edges": n_edges, "indexed": indexed, "unindexed": unindexed}
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
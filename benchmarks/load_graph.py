@@ -0,0 +1,148 @@
+"""Benchmark cold-start loading of a Graph from an existing database.
+
+Usage:
+    python -m benchmarks.load_graph [--edges 10000 100000 1000000]
+
+Every size is populated into its own SQLite file and then loaded in a fresh
+interpreter, so the reported peak RSS belongs to that load alone. Each size
+is loaded twice: from the tables, and from a snapshot of them.
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, insert
+
+from data_version_graph.database import Base, EdgeModel, NodeModel, create_database
+from data_version_graph.graph import Graph
+from data_version_graph.snapshot import write_snapshot
+
+NODE_TYPES = ("BigQueryTable", "PostgresTable", "GoogleCloudStorageObject")
+EDGES_PER_NODE = 4
+INSERT_CHUNK_SIZE = 50_000
+
+
+def populate(database_url: str, n_edges: int, *, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    n_nodes = max(2, n_edges // EDGES_PER_NODE)
+
+    engine = create_engine(database_url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        for start in range(0, n_nodes, INSERT_CHUNK_SIZE):
+            connection.execute(
+                insert(NodeModel),
+                [
+                    {
+                        "id": i + 1,
+                        "ntype": NODE_TYPES[i % len(NODE_TYPES)],
+                        "name": f"table_{i // 3}",
+                        "version": i % 3 + 1,
+                    }
+                    for i in range(start, min(start + INSERT_CHUNK_SIZE, n_nodes))
+                ],
+            )
+
+        # Edges always point from a lower to a higher id, so the graph is a DAG.
+        seen: set[tuple[int, int]] = set()
+        while len(seen) < n_edges:
+            chunk = []
+            while len(chunk) < INSERT_CHUNK_SIZE and len(seen) < n_edges:
+                from_id = rng.randint(1, n_nodes - 1)
+                to_id = rng.randint(from_id + 1, n_nodes)
+                if (from_id, to_id) not in seen:
+                    seen.add((from_id, to_id))
+                    chunk.append({"from_node_id": from_id, "to_node_id": to_id})
+            connection.execute(insert(EdgeModel), chunk)
+    engine.dispose()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss survives exec() on Linux, so it would include the parent that
+    # populated the database; VmHWM is reset for every new process image.
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def load(database_url: str, snapshot_path: Optional[str] = None) -> dict:
+    rss_before = peak_rss_mb()
+    session = create_database(database_url)()
+
+    start = time.perf_counter()
+    graph = Graph(session=session, snapshot_path=snapshot_path)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "nodes": graph.graph.number_of_nodes(),
+        "edges": graph.graph.number_of_edges(),
+        "load_seconds": round(elapsed, 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--edges", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--load", help=argparse.SUPPRESS)
+    parser.add_argument("--snapshot", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load:
+        print(json.dumps(load(args.load, args.snapshot)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for n_edges in args.edges:
+            database_url = f"sqlite:///{os.path.join(tmpdir, f'{n_edges}.db')}"
+            populate(database_url, n_edges)
+            snapshot_path = os.path.join(tmpdir, f"{n_edges}.snapshot")
+            write_snapshot(create_database(database_url)(), snapshot_path)
+            for source, extra in (
+                ("tables", []),
+                ("snapshot", ["--snapshot", snapshot_path]),
+            ):
+                output = subprocess.run(
+                    [
+                        sys.executable,
+                        "-m",
+                        "benchmarks.load_graph",
+                        "--load",
+                        database_url,
+                    ]
+                    + extra,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                print(
+                    json.dumps(
+                        {
+                            "target_edges": n_edges,
+                            "source": source,
+                            **json.loads(output),
+                        }
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
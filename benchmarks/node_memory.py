@@ -0,0 +1,73 @@
+"""Benchmark the memory footprint of Node objects.
+
+Usage:
+    python -m benchmarks.node_memory [--nodes 100000 1000000]
+
+Reports the bytes allocated per node, measured with tracemalloc, for the
+previous dict-based layout and for the current __slots__ layout, created
+through NodeFactory as the graph loader creates them.
+"""
+
+import argparse
+import gc
+import json
+import tracemalloc
+from collections.abc import Callable
+
+from data_version_graph.node_factory import NodeFactory
+
+NODE_TYPES = ("BigQueryTable", "PostgresTable", "GoogleCloudStorageObject")
+VERSIONS_PER_NAME = 3
+
+
+class DictNode:
+    """The Node layout before __slots__: a __dict__ and a dict per instance."""
+
+    def __init__(self, name: str, version: int = 1, **properties) -> None:
+        self.name = str(name)
+        self.version = int(version)
+        self.properties = properties
+
+
+def _name(i: int) -> str:
+    # Built at runtime, as names read from the database are, so that equal
+    # names are separate string objects unless they get interned.
+    return "".join(["table_", str(i // VERSIONS_PER_NAME)])
+
+
+def bytes_per_node(n_nodes: int, create: Callable[[int], object]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    nodes = [create(i) for i in range(n_nodes)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del nodes
+    return size / n_nodes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    layouts: dict[str, Callable[[int], object]] = {
+        "dict": lambda i: DictNode(
+            _name(i), version=i % VERSIONS_PER_NAME + 1, properties={}
+        ),
+        "slots": lambda i: NodeFactory.create(
+            NODE_TYPES[i % len(NODE_TYPES)],
+            name=_name(i),
+            version=i % VERSIONS_PER_NAME + 1,
+        ),
+    }
+    for n_nodes in args.nodes:
+        result: dict[str, object] = {"nodes": n_nodes}
+        for layout, create in layouts.items():
+            result[f"{layout}_bytes_per_node"] = round(
+                bytes_per_node(n_nodes, create), 1
+            )
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,536 @@
+"""Benchmark suite: Graph operations and Flask routes on a synthetic graph.
+
+Usage:
+    python -m benchmarks.suite [--shape mixed] [--nodes 10000]
+                               [--iterations 500] [--rounds 3]
+                               [--scenario NAME ...]
+                               [--output results.json]
+                               [--baseline baseline.json] [--threshold 0.25]
+
+A synthetic lineage graph (see benchmarks.generators) is written to a SQLite
+file and loaded into a Graph, which also backs the Flask app. Every scenario
+is timed op by op, --rounds times, with the SQL statements it runs counted on
+the engine, and then run again, fewer times, under tracemalloc for its peak
+memory. Each op counts with the best of its rounds, which filters out most of
+the interference from the rest of the machine. Scenarios that write run last,
+so that reads all see the generated graph. The SQLite file is throwaway, so
+it is written without fsync and keeps its rollback journal in memory: the
+cost of file system syncs varies from run to run.
+
+The results are printed as JSON. With --baseline, each scenario is compared
+with the same scenario in an earlier results file, and the exit status is 1
+if any got slower, ran more queries or used more memory than the threshold
+allows; changes within the noise floors below never count.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.generators import SHAPES, SyntheticGraph, populate
+from data_version_graph.app import app as flask_app
+from data_version_graph.database import create_database
+from data_version_graph.graph import Graph
+from data_version_graph.nodes import Node
+
+# Iterations of the memory pass, and of scenarios too slow for the full count.
+MEMORY_ITERATIONS = 50
+SLOW_ITERATIONS = 5
+
+# Rendering the whole graph is skipped above this many nodes, as the layout
+# would dominate the run.
+RENDER_MAX_NODES = 1_000
+
+BULK_SIZE = 100
+
+# Changes in peak memory below this many KiB are noise.
+MEMORY_NOISE_KIB = 64
+
+# Changes in latency below this many milliseconds are noise: sub-millisecond
+# ops vary by more than any threshold between two runs of the same code.
+LATENCY_NOISE_MS = 0.1
+
+# Timed passes of every scenario; each op counts with its best time.
+ROUNDS = 3
+
+
+@dataclass
+class Context:
+    synthetic: SyntheticGraph
+    sessionmaker: sessionmaker
+    graph: Graph
+    client: FlaskClient
+    rng: random.Random
+    names: Any  # itertools.count of fresh node names
+    queries: list[int]
+
+    def random_node(self) -> Node:
+        return self.rng.choice(self.synthetic.nodes)
+
+    def random_forward_pair(self) -> tuple[Node, Node]:
+        # Generated nodes are in topological order, so an edge from an earlier
+        # to a later one never closes a cycle.
+        first, second = sorted(self.rng.sample(range(len(self.synthetic.nodes)), 2))
+        return self.synthetic.nodes[first], self.synthetic.nodes[second]
+
+    def new_node(self) -> Node:
+        return Node(f"benchmark.new_{next(self.names)}")
+
+
+Op = Callable[[], Any]
+Scenario = Callable[[Context, int], list[Op]]
+
+
+def node_json(node: Node) -> dict:
+    return {"ntype": node.ntype, "name": node.name, "version": node.version}
+
+
+def get(ctx: Context, url: str) -> Op:
+    def op() -> None:
+        response = ctx.client.get(url)
+        response.close()
+        if response.status_code >= 500:
+            raise RuntimeError(f"GET {url}: {response.status_code}")
+
+    return op
+
+
+def post(ctx: Context, url: str, body: Any) -> Op:
+    def op() -> None:
+        response = ctx.client.post(url, json=body)
+        if response.status_code >= 500:
+            raise RuntimeError(f"POST {url}: {response.status_code}")
+
+    return op
+
+
+def load_graph(ctx: Context, n: int) -> list[Op]:
+    def op() -> None:
+        session = ctx.sessionmaker()
+        Graph(session=session)
+        session.close()
+
+    return [op] * min(n, SLOW_ITERATIONS)
+
+
+def get_node(ctx: Context, n: int) -> list[Op]:
+    nodes = [ctx.random_node() for _ in range(n)]
+    return [
+        lambda node=node: ctx.graph.get_node(node.name, version=node.version)
+        for node in nodes
+    ]
+
+
+def get_latest_version(ctx: Context, n: int) -> list[Op]:
+    names = [ctx.random_node().name for _ in range(n)]
+    return [lambda name=name: ctx.graph.get_latest_version(name) for name in names]
+
+
+def is_cyclic_with_edge(ctx: Context, n: int) -> list[Op]:
+    pairs = [(ctx.random_node(), ctx.random_node()) for _ in range(n)]
+    return [lambda pair=pair: ctx.graph.is_cyclic_with_edge(*pair) for pair in pairs]
+
+
+def rebuild_plan(ctx: Context, n: int) -> list[Op]:
+    nodes = [ctx.random_node() for _ in range(min(n, MEMORY_ITERATIONS))]
+    return [lambda node=node: ctx.graph.rebuild_plan([node]) for node in nodes]
+
+
+def add_node(ctx: Context, n: int) -> list[Op]:
+    nodes = [ctx.new_node() for _ in range(n)]
+    return [lambda node=node: ctx.graph.add_node(node) for node in nodes]
+
+
+def add_edge(ctx: Context, n: int) -> list[Op]:
+    # Includes the cycle check that add_edge makes first.
+    pairs = [ctx.random_forward_pair() for _ in range(n)]
+    return [lambda pair=pair: ctx.graph.add_edge(*pair) for pair in pairs]
+
+
+def remove_node(ctx: Context, n: int) -> list[Op]:
+    nodes = ctx.rng.sample(list(ctx.graph.graph.nodes), n)
+    return [lambda node=node: ctx.graph.remove_node(node) for node in nodes]
+
+
+def remove_nodes(ctx: Context, n: int) -> list[Op]:
+    nodes = list(ctx.graph.graph.nodes)
+    batches = [ctx.rng.sample(nodes, min(BULK_SIZE, len(nodes))) for _ in range(n)]
+    return [lambda batch=batch: ctx.graph.remove_nodes(batch) for batch in batches]
+
+
+def remove_all_versions(ctx: Context, n: int) -> list[Op]:
+    names = sorted({node.name for node in ctx.graph.graph.nodes})
+    return [
+        lambda name=name: ctx.graph.remove_all_versions(name)
+        for name in ctx.rng.sample(names, min(n, len(names)))
+    ]
+
+
+def route_frontpage(ctx: Context, n: int) -> list[Op]:
+    return [get(ctx, "/")] * n
+
+
+def route_metrics(ctx: Context, n: int) -> list[Op]:
+    return [get(ctx, "/metrics")] * n
+
+
+def route_cache_stats(ctx: Context, n: int) -> list[Op]:
+    return [get(ctx, "/cache/stats")] * n
+
+
+def route_refresh_graph(ctx: Context, n: int) -> list[Op]:
+    if ctx.graph.graph.number_of_nodes() > RENDER_MAX_NODES:
+        return []
+    # The first request renders; the others are served from its image.
+    return [post(ctx, "/refresh-graph", None)] * min(n, SLOW_ITERATIONS)
+
+
+def route_refresh_graph_status(ctx: Context, n: int) -> list[Op]:
+    return [get(ctx, "/refresh-graph/unknown")] * n
+
+
+def route_render(ctx: Context, n: int) -> list[Op]:
+    nodes = [ctx.random_node() for _ in range(min(n, SLOW_ITERATIONS))]
+    return [
+        get(ctx, f"/graph/render?name={node.name}&version={node.version}&depth=1")
+        for node in nodes
+    ]
+
+
+def route_get_node(ctx: Context, n: int) -> list[Op]:
+    nodes = [ctx.random_node() for _ in range(n)]
+    return [get(ctx, f"/nodes/get?name={node.name}") for node in nodes]
+
+
+def route_lineage(direction: str) -> Scenario:
+    def scenario(ctx: Context, n: int) -> list[Op]:
+        nodes = [ctx.random_node() for _ in range(n)]
+        return [
+            get(ctx, f"/lineage/{direction}?name={node.name}&version={node.version}")
+            for node in nodes
+        ]
+
+    return scenario
+
+
+def route_stale(ctx: Context, n: int) -> list[Op]:
+    return [get(ctx, "/lineage/stale")] * min(n, SLOW_ITERATIONS)
+
+
+def route_export(ctx: Context, n: int) -> list[Op]:
+    return [get(ctx, "/graph/export")] * min(n, SLOW_ITERATIONS)
+
+
+def route_rebuild_plan(ctx: Context, n: int) -> list[Op]:
+    nodes = [ctx.random_node() for _ in range(min(n, MEMORY_ITERATIONS))]
+    return [
+        post(ctx, "/lineage/rebuild-plan", {"nodes": [node_json(node)]})
+        for node in nodes
+    ]
+
+
+def route_add_node(ctx: Context, n: int) -> list[Op]:
+    return [post(ctx, "/nodes/add", node_json(ctx.new_node())) for _ in range(n)]
+
+
+def route_add_edge(ctx: Context, n: int) -> list[Op]:
+    pairs = [ctx.random_forward_pair() for _ in range(n)]
+    return [
+        post(
+            ctx,
+            "/edges/add",
+            {"upstream": node_json(from_node), "downstream": node_json(to_node)},
+        )
+        for from_node, to_node in pairs
+    ]
+
+
+def route_remove_edge(ctx: Context, n: int) -> list[Op]:
+    edges = ctx.rng.sample(list(ctx.graph.graph.edges), n)
+    return [
+        post(
+            ctx,
+            "/edges/remove",
+            {"upstream": node_json(from_node), "downstream": node_json(to_node)},
+        )
+        for from_node, to_node in edges
+    ]
+
+
+def route_remove_node(ctx: Context, n: int) -> list[Op]:
+    nodes = ctx.rng.sample(list(ctx.graph.graph.nodes), n)
+    return [post(ctx, "/nodes/remove", node_json(node)) for node in nodes]
+
+
+def route_nodes_bulk(ctx: Context, n: int) -> list[Op]:
+    return [
+        post(ctx, "/nodes/bulk", [node_json(ctx.new_node()) for _ in range(BULK_SIZE)])
+        for _ in range(max(1, n // BULK_SIZE))
+    ]
+
+
+def route_edges_bulk(ctx: Context, n: int) -> list[Op]:
+    return [
+        post(
+            ctx,
+            "/edges/bulk",
+            [
+                {"upstream": node_json(from_node), "downstream": node_json(to_node)}
+                for from_node, to_node in (
+                    ctx.random_forward_pair() for _ in range(BULK_SIZE)
+                )
+            ],
+        )
+        for _ in range(max(1, n // BULK_SIZE))
+    ]
+
+
+# In run order: reads first, then writes, removals last.
+SCENARIOS: dict[str, Scenario] = {
+    "load_graph": load_graph,
+    "get_node": get_node,
+    "get_latest_version": get_latest_version,
+    "is_cyclic_with_edge": is_cyclic_with_edge,
+    "rebuild_plan": rebuild_plan,
+    "route GET /": route_frontpage,
+    "route GET /nodes/get": route_get_node,
+    "route GET /lineage/upstream": route_lineage("upstream"),
+    "route GET /lineage/downstream": route_lineage("downstream"),
+    "route GET /lineage/dependencies": route_lineage("dependencies"),
+    "route GET /lineage/stale": route_stale,
+    "route POST /lineage/rebuild-plan": route_rebuild_plan,
+    "route GET /graph/export": route_export,
+    "route GET /graph/render": route_render,
+    "route POST /refresh-graph": route_refresh_graph,
+    "route GET /refresh-graph/<job_id>": route_refresh_graph_status,
+    "route GET /metrics": route_metrics,
+    "route GET /cache/stats": route_cache_stats,
+    "add_node": add_node,
+    "add_edge": add_edge,
+    "route POST /nodes/add": route_add_node,
+    "route POST /edges/add": route_add_edge,
+    "route POST /nodes/bulk": route_nodes_bulk,
+    "route POST /edges/bulk": route_edges_bulk,
+    "route POST /edges/remove": route_remove_edge,
+    "route POST /nodes/remove": route_remove_node,
+    "remove_node": remove_node,
+    "remove_nodes": remove_nodes,
+    "remove_all_versions": remove_all_versions,
+}
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    # Nearest-rank percentile of sorted values.
+    index = max(0, min(len(values) - 1, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+def measure(
+    ctx: Context, scenario: Scenario, iterations: int, rounds: int = ROUNDS
+) -> Optional[dict]:
+    timings: list[list[float]] = []
+    queries = ctx.queries[0]
+    for _ in range(rounds):
+        ops = scenario(ctx, iterations)
+        if not ops:
+            return None
+        latencies = []
+        for op in ops:
+            start = time.perf_counter()
+            op()
+            latencies.append(time.perf_counter() - start)
+        timings.append(latencies)
+    queries = ctx.queries[0] - queries
+
+    ops = scenario(ctx, min(iterations, MEMORY_ITERATIONS))
+    tracemalloc.start()
+    for op in ops:
+        op()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Each op counts with its best time over the rounds, so that an op is only
+    # slow if it was slow every time.
+    latencies = sorted(map(min, zip(*timings)))
+    total = sum(latencies)
+    return {
+        "iterations": len(latencies),
+        "rounds": rounds,
+        "latency_ms": {
+            "mean": round(total / len(latencies) * 1000, 4),
+            "p50": round(percentile(latencies, 0.5) * 1000, 4),
+            "p95": round(percentile(latencies, 0.95) * 1000, 4),
+            "p99": round(percentile(latencies, 0.99) * 1000, 4),
+            "max": round(latencies[-1] * 1000, 4),
+        },
+        "ops_per_second": round(len(latencies) / total, 1) if total else None,
+        "queries_per_op": round(queries / sum(map(len, timings)), 3),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> dict:
+    # Ratios of each scenario to the baseline, and the metrics that regressed.
+    comparison = {}
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        entry: dict[str, Any] = {"regressions": []}
+        for metric, current, previous in (
+            ("p50", result["latency_ms"]["p50"], before["latency_ms"]["p50"]),
+            ("p95", result["latency_ms"]["p95"], before["latency_ms"]["p95"]),
+            ("queries_per_op", result["queries_per_op"], before["queries_per_op"]),
+            ("peak_memory_kib", result["peak_memory_kib"], before["peak_memory_kib"]),
+        ):
+            entry[f"{metric}_ratio"] = (
+                round(current / previous, 3) if previous else None
+            )
+            if metric == "peak_memory_kib" and current - previous < MEMORY_NOISE_KIB:
+                continue
+            if metric in ("p50", "p95") and current - previous < LATENCY_NOISE_MS:
+                continue
+            if current > previous * (1 + threshold) and current > 0:
+                entry["regressions"].append(metric)
+        comparison[name] = entry
+    return comparison
+
+
+def without_fsync(connection: sqlite3.Connection, record: Any) -> None:
+    connection.execute("PRAGMA synchronous=OFF")
+    connection.execute("PRAGMA journal_mode=MEMORY")
+
+
+def run(
+    shape: str,
+    n_nodes: int,
+    iterations: int,
+    scenarios: list[str],
+    *,
+    seed: int = 0,
+    rounds: int = ROUNDS,
+) -> dict:
+    synthetic = SHAPES[shape](n_nodes, seed=seed)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'graph.db')}"
+        populate(database_url, synthetic)
+        Session = create_database(database_url)
+        event.listen(Session.kw["bind"], "connect", without_fsync)
+        # Connections opened by create_database() predate the listener.
+        Session.kw["bind"].dispose()
+        queries = [0]
+
+        def count(*args: Any) -> None:
+            queries[0] += 1
+
+        event.listen(Session.kw["bind"], "before_cursor_execute", count)
+        graph = Graph(session=Session())
+        flask_app.app.config["GRAPH"] = graph
+        flask_app.app.static_folder = tmpdir
+        ctx = Context(
+            synthetic=synthetic,
+            sessionmaker=Session,
+            graph=graph,
+            client=flask_app.app.test_client(),
+            rng=random.Random(seed),
+            names=itertools.count(),
+            queries=queries,
+        )
+
+        results = {}
+        for name in SCENARIOS:
+            if name in scenarios:
+                result = measure(ctx, SCENARIOS[name], iterations, rounds)
+                if result is not None:
+                    results[name] = result
+        graph.session.close()
+        Session.kw["bind"].dispose()
+
+    return {
+        "meta": {
+            "shape": shape,
+            "nodes": len(synthetic.nodes),
+            "edges": len(synthetic.edges),
+            "iterations": iterations,
+            "rounds": rounds,
+            "seed": seed,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--shape", choices=sorted(SHAPES), default="mixed")
+    parser.add_argument("--nodes", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=ROUNDS,
+        help=f"timed passes per scenario, of which the best counts (default {ROUNDS})",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=list(SCENARIOS),
+        help="run only these scenarios (repeatable)",
+    )
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed relative increase over the baseline (default 0.25)",
+    )
+    args = parser.parse_args()
+
+    report = run(
+        args.shape,
+        args.nodes,
+        args.iterations,
+        args.scenario or list(SCENARIOS),
+        seed=args.seed,
+        rounds=args.rounds,
+    )
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        report["comparison"] = compare(
+            report["results"], baseline["results"], args.threshold
+        )
+        regressed = any(entry["regressions"] for entry in report["comparison"].values())
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""Whole-graph analytics, evaluated in parallel worker processes.
+
+Analyses that visit every node are CPU-bound Python loops, which a single
+process runs one core at a time. GraphAnalytics encodes the graph once into
+flat integer arrays:
+
+* CSR adjacency in both directions: the successors of node i are
+  indices[indptr[i]:indptr[i + 1]], its predecessors
+  rev_indices[rev_indptr[i]:rev_indptr[i + 1]];
+* name_ids, numbering the name of every node, and latest, the node holding
+  the latest version of every name;
+* order, the nodes grouped by weakly connected component, largest first.
+
+The arrays are laid out in one block of shared memory that worker processes
+map on start-up, so no networkx objects are pickled. Each worker evaluates a
+partition of order, a slice made of whole components unless a component is
+too large to balance the load on its own, and the results are merged by node
+in the calling process. With one worker, or on platforms without shared
+memory, the same code runs serially in the calling process.
+
+The encoding is taken under the graph's read lock, so results reflect the
+graph as it was when GraphAnalytics was created.
+"""
+
+import logging
+import os
+from array import array
+from collections.abc import Callable, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Optional
+
+import networkx as nx
+
+from data_version_graph import array_layout
+from data_version_graph.graph import Graph
+from data_version_graph.metrics import timed
+from data_version_graph.nodes import Node
+
+logger = logging.getLogger(__name__)
+
+# Below this many nodes, analyses run serially unless workers are given:
+# starting the processes would take longer than the analysis.
+PARALLEL_MIN_NODES = 10_000
+
+# Partitions per worker, so that workers which finish early take on more.
+PARTITIONS_PER_WORKER = 4
+
+# Array sections in buffer order, with their array typecodes.
+SECTIONS: tuple[array_layout.Section, ...] = (
+    ("indptr", "q"),
+    ("indices", "i"),
+    ("rev_indptr", "q"),
+    ("rev_indices", "i"),
+    ("name_ids", "i"),
+    ("latest", "i"),
+    ("order", "i"),
+)
+
+Arrays = Mapping[str, Any]
+Analysis = Callable[[Arrays, int, int], Any]
+
+
+def _lengths(counts: Mapping[str, int]) -> Callable[[str], int]:
+    return {
+        "indptr": counts["nodes"] + 1,
+        "indices": counts["edges"],
+        "rev_indptr": counts["nodes"] + 1,
+        "rev_indices": counts["edges"],
+        "name_ids": counts["nodes"],
+        "latest": counts["names"],
+        "order": counts["nodes"],
+    }.__getitem__
+
+
+def _views(buffer: memoryview, counts: Mapping[str, int]) -> dict[str, memoryview]:
+    return dict(array_layout.views(buffer, SECTIONS, _lengths(counts)))
+
+
+def _adjacency(
+    nodes: list[Node], ids: dict[Node, int], adjacency: Any
+) -> tuple[array, array]:
+    indptr = array("q", [0])
+    indices = array("i")
+    for node in nodes:
+        indices.extend([ids[neighbour] for neighbour in adjacency[node]])
+        indptr.append(len(indices))
+    return indptr, indices
+
+
+class GraphEncoding:
+    """A Graph as the flat arrays described in the module docstring."""
+
+    def __init__(self, graph: Graph) -> None:
+        with graph.lock.read():
+            self.nodes: list[Node] = list(graph.graph)
+            ids = {node: i for i, node in enumerate(self.nodes)}
+            names: dict[str, int] = {}
+            name_ids = array("i")
+            latest = array("i")
+            for i, node in enumerate(self.nodes):
+                name_id = names.setdefault(node.name, len(names))
+                name_ids.append(name_id)
+                if name_id == len(latest):
+                    latest.append(i)
+                elif node.version > self.nodes[latest[name_id]].version:
+                    latest[name_id] = i
+
+            indptr, indices = _adjacency(self.nodes, ids, graph.graph.succ)
+            rev_indptr, rev_indices = _adjacency(self.nodes, ids, graph.graph.pred)
+            components = sorted(
+                nx.weakly_connected_components(graph.graph), key=len, reverse=True
+            )
+
+        self.components = [len(component) for component in components]
+        order = array("i")
+        for component in components:
+            order.extend([ids[node] for node in component])
+        self.arrays: dict[str, array] = {
+            "indptr": indptr,
+            "indices": indices,
+            "rev_indptr": rev_indptr,
+            "rev_indices": rev_indices,
+            "name_ids": name_ids,
+            "latest": latest,
+            "order": order,
+        }
+        self.counts = {
+            "nodes": len(self.nodes),
+            "edges": len(indices),
+            "names": len(latest),
+        }
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def nbytes(self) -> int:
+        return array_layout.nbytes(SECTIONS, _lengths(self.counts))
+
+    def write(self, buffer: memoryview) -> None:
+        array_layout.write(buffer, SECTIONS, self.arrays)
+
+    def partitions(self, size: int) -> list[tuple[int, int]]:
+        # Slices of order of about size nodes. Components are kept whole,
+        # except those larger than size, which are cut into slices of size.
+        partitions = []
+        start = position = 0
+        for length in self.components:
+            end = position + length
+            if end - start > size and position > start:
+                partitions.append((start, position))
+                start = position
+            while end - start > size:
+                partitions.append((start, start + size))
+                start += size
+            position = end
+        if start < position:
+            partitions.append((start, position))
+        return partitions
+
+
+# The encoding as mapped by a worker process, set up by _attach().
+_shared: Optional[shared_memory.SharedMemory] = None
+_arrays: dict[str, memoryview] = {}
+
+
+def _attach(name: str, counts: dict[str, int]) -> None:
+    global _shared
+    _shared = shared_memory.SharedMemory(name=name)
+    # buf is only None once the shared memory is closed.
+    assert _shared.buf is not None
+    _arrays.update(_views(_shared.buf, counts))
+
+
+def _evaluate_partition(analysis: Analysis, start: int, stop: int) -> Any:
+    return analysis(_arrays, start, stop)
+
+
+def _downstream_counts(arrays: Arrays, start: int, stop: int) -> array:
+    # The number of nodes downstream of each node of the partition, found by
+    # a depth-first search from each. Nodes are marked with the number of the
+    # search that reached them, so the marks are never reset.
+    indptr = arrays["indptr"]
+    indices = arrays["indices"]
+    seen = [0] * (len(indptr) - 1)
+    counts = array("q")
+    for search, node in enumerate(arrays["order"][start:stop], start=1):
+        seen[node] = search
+        stack = [node]
+        count = 0
+        while stack:
+            current = stack.pop()
+            for successor in indices[indptr[current] : indptr[current + 1]]:
+                if seen[successor] != search:
+                    seen[successor] = search
+                    count += 1
+                    stack.append(successor)
+        counts.append(count)
+    return counts
+
+
+def _orphans(arrays: Arrays, start: int, stop: int) -> list[int]:
+    indptr = arrays["indptr"]
+    name_ids = arrays["name_ids"]
+    latest = arrays["latest"]
+    return [
+        node
+        for node in arrays["order"][start:stop]
+        if latest[name_ids[node]] != node and indptr[node] == indptr[node + 1]
+    ]
+
+
+def _stale_dependencies(
+    arrays: Arrays, start: int, stop: int
+) -> list[tuple[int, int, int]]:
+    # (node, outdated dependency, latest version of the dependency) triples.
+    rev_indptr = arrays["rev_indptr"]
+    rev_indices = arrays["rev_indices"]
+    name_ids = arrays["name_ids"]
+    latest = arrays["latest"]
+    stale = []
+    for node in arrays["order"][start:stop]:
+        for dependency in rev_indices[rev_indptr[node] : rev_indptr[node + 1]]:
+            newest = latest[name_ids[dependency]]
+            if newest != dependency:
+                stale.append((node, dependency, newest))
+    return stale
+
+
+class GraphAnalytics:
+    """Whole-graph analytics over a GraphEncoding, run in worker processes.
+
+    workers defaults to the number of CPUs, or to 1 (serial) for graphs of
+    fewer than PARALLEL_MIN_NODES nodes. Used as a context manager, the
+    worker processes and shared memory are kept across analyses; otherwise
+    every analysis starts and stops its own.
+    """
+
+    def __init__(self, graph: Graph, *, workers: Optional[int] = None) -> None:
+        self.encoding = GraphEncoding(graph)
+        if workers is None:
+            workers = (
+                os.cpu_count() or 1 if len(self.encoding) >= PARALLEL_MIN_NODES else 1
+            )
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self._shared: Optional[shared_memory.SharedMemory] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "GraphAnalytics":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @property
+    def parallel(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        if self.workers == 1 or self._executor is not None:
+            return
+        try:
+            self._shared = shared_memory.SharedMemory(
+                create=True, size=max(1, self.encoding.nbytes)
+            )
+            assert self._shared.buf is not None
+            self.encoding.write(self._shared.buf)
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                initializer=_attach,
+                initargs=(self._shared.name, self.encoding.counts),
+            )
+        except (OSError, ImportError, NotImplementedError):
+            # e.g. no /dev/shm, or no working semaphores for the pool.
+            logger.warning("Worker processes unavailable, running serially")
+            self.close()
+            self.workers = 1
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._shared is not None:
+            self._shared.close()
+            self._shared.unlink()
+            self._shared = None
+
+    def _evaluate(self, analysis: Analysis) -> list[tuple[int, int, Any]]:
+        # Returns (start, stop, result) for every partition, in order.
+        started = not self.parallel
+        if started:
+            self.start()
+        try:
+            n_partitions = self.workers * PARTITIONS_PER_WORKER
+            size = max(1, -(-len(self.encoding) // n_partitions))
+            partitions = self.encoding.partitions(size)
+            if self._executor is None:
+                return [
+                    (start, stop, analysis(self.encoding.arrays, start, stop))
+                    for start, stop in partitions
+                ]
+            futures = [
+                self._executor.submit(_evaluate_partition, analysis, start, stop)
+                for start, stop in partitions
+            ]
+            return [
+                (start, stop, future.result())
+                for (start, stop), future in zip(partitions, futures)
+            ]
+        finally:
+            if started:
+                self.close()
+
+    @timed
+    def downstream_counts(self) -> dict[Node, int]:
+        # Maps every node to the number of nodes downstream of it: how much
+        # of the graph a change to it affects.
+        nodes = self.encoding.nodes
+        order = self.encoding.arrays["order"]
+        counts = {}
+        for start, stop, partition_counts in self._evaluate(_downstream_counts):
+            for node, count in zip(order[start:stop], partition_counts):
+                counts[nodes[node]] = count
+        return counts
+
+    @timed
+    def orphans(self) -> list[Node]:
+        # Versions superseded by a later version of their name that nothing
+        # depends on, which can be removed without affecting any lineage.
+        nodes = self.encoding.nodes
+        orphans = [
+            nodes[node]
+            for _, _, partition_orphans in self._evaluate(_orphans)
+            for node in partition_orphans
+        ]
+        return sorted(orphans, key=lambda node: (node.name, node.version))
+
+    @timed
+    def stale_report(self) -> dict[Node, dict[Node, Node]]:
+        # Maps every node built on an outdated version of a dependency to
+        # those dependencies, each with the latest version of its name.
+        nodes = self.encoding.nodes
+        report: dict[Node, dict[Node, Node]] = {}
+        for _, _, stale in self._evaluate(_stale_dependencies):
+            for node, dependency, newest in stale:
+                report.setdefault(nodes[node], {})[nodes[dependency]] = nodes[newest]
+        return report
@@ -1,39 +1,444 @@
+import functools
+import os
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent import futures
+from typing import Any, Optional, Union
+
 import networkx as nx
 import werkzeug
 from flask import (
     Flask,
     Response,
+    g,
     jsonify,
+    make_response,
     redirect,
     render_template,
     request,
+    send_file,
+    stream_with_context,
     url_for,
 )
-
+from sqlalchemy.orm import scoped_session
+
+from data_version_graph import metrics
+from data_version_graph.app.rendering import GraphRenderer, to_agraph
+from data_version_graph.app.response_cache import (
+    RESPONSE_CACHE_BYTES,
+    CachedResponse,
+    ResponseCache,
+)
+from data_version_graph.app.serializers import node_to_json, sort_nodes
+from data_version_graph.app.streaming import (
+    MALFORMED,
+    NDJSON_MIMETYPES,
+    iter_chunks,
+    iter_gzip,
+    iter_json_array,
+    iter_ndjson,
+)
 from data_version_graph.app.validators import Validate
 from data_version_graph.database import create_database
-from data_version_graph.graph import Graph
+from data_version_graph.graph import DIRECTIONS, Graph
 from data_version_graph.node_factory import NodeFactory
+from data_version_graph.nodes import Node
 
 app = Flask(__name__)
 
+RENDER_FORMATS = {"svg": "image/svg+xml", "png": "image/png"}
+
+
+def init_graph(flask_app: Flask) -> Graph:
+    # Requests are served from a thread-local session taken from the engine's
+    # connection pool, while the in-memory graph is shared between threads.
+    Session = scoped_session(
+        create_database(
+            flask_app.config["SQLALCHEMY_DATABASE_URI"],
+            **flask_app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+        )
+    )
+    # Workers started together load the same snapshot file, when configured,
+    # and only read the rows written after it.
+    graph = Graph(session=Session, snapshot_path=flask_app.config.get("GRAPH_SNAPSHOT"))
+    # Workers sharing a database pick up each other's writes from the change
+    # log every GRAPH_SYNC_INTERVAL seconds, when set.
+    sync_interval = flask_app.config.get("GRAPH_SYNC_INTERVAL")
+    if sync_interval:
+        graph.start_sync(float(sync_interval))
+    if flask_app.config.get("METRICS_ENABLED"):
+        metrics.enable()
+    flask_app.config["GRAPH"] = graph
+    return graph
+
+
+@app.before_request
+def start_request_timer() -> None:
+    if metrics.ENABLED:
+        g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_duration(response: Response) -> Response:
+    start = g.pop("request_start", None)
+    if start is not None:
+        # The rule rather than the path, to keep the number of series bounded.
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            request.method,
+            route,
+            str(response.status_code),
+        )
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def export_metrics() -> Response:
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.teardown_appcontext
+def remove_session(exception: Optional[BaseException]) -> None:
+    graph: Optional[Graph] = app.config.get("GRAPH")
+    if graph is not None and isinstance(graph.session, scoped_session):
+        graph.session.remove()
+
+
+def resolve_node(graph: Graph, name: str, version: Optional[int]) -> Optional[Node]:
+    # Requests that leave out the version refer to the latest one.
+    if version is None:
+        return graph.get_latest_version(name)
+    return graph.get_node(name, version=version)
+
+
+_extensions_lock = threading.Lock()
+
+
+def get_renderer() -> GraphRenderer:
+    with _extensions_lock:
+        renderer = app.extensions.get("graph_renderer")
+        if renderer is None:
+            renderer = GraphRenderer(os.path.join(str(app.static_folder), "images"))
+            app.extensions["graph_renderer"] = renderer
+        return renderer
+
+
+def get_response_cache() -> ResponseCache:
+    with _extensions_lock:
+        cache = app.extensions.get("response_cache")
+        if cache is None:
+            cache = ResponseCache(
+                app.config.get("RESPONSE_CACHE_BYTES", RESPONSE_CACHE_BYTES)
+            )
+            app.extensions["response_cache"] = cache
+        return cache
+
+
+def cached_response(view: Callable[..., Any]) -> Callable[..., Any]:
+    # Serves repeated reads of an unchanged graph from the response cache,
+    # keyed on the route, the query string and the graph revision. Responses
+    # carry an ETag, and requests whose If-None-Match matches it get a 304.
+    @functools.wraps(view)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        cache = get_response_cache()
+        if not cache.max_bytes:
+            return view(*args, **kwargs)
+
+        graph: Graph = app.config["GRAPH"]
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        # The read lock keeps the revision and the response consistent.
+        with graph.lock.read():
+            revision = graph.revision
+            entry = cache.get(key, revision)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                entry = cache.put(key, revision, response.get_data(), response.mimetype)
+        return cached_reply(entry)
+
+    return wrapper
+
+
+def cached_reply(entry: CachedResponse) -> Response:
+    if request.if_none_match.contains_weak(entry.etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.body, mimetype=entry.mimetype)
+    response.set_etag(entry.etag)
+    return response
+
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats() -> tuple[Response, int]:
+    graph: Graph = app.config["GRAPH"]
+    properties = graph.properties
+    return jsonify(
+        {
+            "responses": get_response_cache().stats(),
+            "properties": {
+                "entries": len(properties),
+                "size": properties.size,
+                "max_bytes": properties.max_bytes,
+                "hits": properties.hits,
+                "misses": properties.misses,
+            },
+            "status": 200,
+        }
+    ), 200
+
 
 @app.route("/")
 def frontpage() -> str:
-    return render_template(
-        "frontpage.html", url=f"{app.static_folder}/images/graph.png"
+    latest = get_renderer().latest()
+    filename = (
+        "images/graph.png" if latest is None else f"images/{os.path.basename(latest)}"
     )
+    return render_template("frontpage.html", url=url_for("static", filename=filename))
 
 
 # Route to refresh the graph
 @app.route("/refresh-graph", methods=["POST"])
-def refresh_graph() -> werkzeug.wrappers.response.Response:
+def refresh_graph() -> Union[werkzeug.wrappers.response.Response, tuple[Response, int]]:
     graph: Graph = app.config["GRAPH"]
-    nx.nx_agraph.to_agraph(graph.graph).draw(
-        f"{app.static_folder}/images/graph.png", prog="dot", args="-Nshape=box"
-    )
+    renderer = get_renderer()
+
+    with graph.lock.read():
+        job_id = renderer.job_id("graph", graph.revision)
+        # An unchanged graph is served from the image drawn for its revision.
+        if renderer.status(job_id) == "done":
+            return redirect(url_for("frontpage"))
+        # Only the node and edge lists are copied under the lock; the rest of
+        # the conversion runs on the renderer's threads.
+        nodes = list(graph.graph.nodes(data="color"))
+        edges = list(graph.graph.edges)
+        renderer.submit(
+            job_id, lambda: to_agraph(nodes, edges), revision=graph.revision
+        )
+
+    return jsonify(
+        {
+            "job_id": job_id,
+            "status": renderer.status(job_id),
+            "status_url": url_for("refresh_graph_status", job_id=job_id),
+        }
+    ), 202
+
+
+@app.route("/refresh-graph/<job_id>", methods=["GET"])
+def refresh_graph_status(job_id: str) -> tuple[Response, int]:
+    renderer = get_renderer()
+    status = renderer.status(job_id)
+    if status is None:
+        return jsonify({"message": "Job not found.", "status": 404}), 404
+
+    body = {"job_id": job_id, "status": status}
+    path = renderer.result(job_id)
+    if path is not None:
+        body["url"] = url_for("static", filename=f"images/{os.path.basename(path)}")
+    return jsonify(body), 200
+
+
+@app.route("/graph/render", methods=["GET"])
+def render_subgraph() -> Union[Response, tuple[Response, int]]:
+    name = request.args.get("name")
+    version = request.args.get("version", type=int)
+    direction = request.args.get("direction", "both")
+    depth = request.args.get("depth", type=int)
+    fmt = request.args.get("format", "svg")
+
+    if (
+        name is None
+        or direction not in DIRECTIONS
+        or (depth is not None and depth < 0)
+        or fmt not in RENDER_FORMATS
+    ):
+        return jsonify({"message": "Invalid request.", "status": 400}), 400
+
+    graph: Graph = app.config["GRAPH"]
+    renderer = get_renderer()
+    with graph.lock.read():
+        node = resolve_node(graph, name, version)
+        if node is None:
+            return jsonify({"message": "Node not found.", "status": 404}), 404
+
+        job_id = renderer.job_id(
+            "subgraph", node.name, node.version, direction, depth, fmt, graph.revision
+        )
+        # The subgraph is only copied out for an image not drawn yet; it is
+        # converted and laid out on the renderer's threads.
+        path = renderer.result(job_id)
+        if path is None:
+            subgraph = graph.subgraph(node, direction=direction, depth=depth)
+            future = renderer.submit(
+                job_id,
+                lambda: nx.nx_agraph.to_agraph(subgraph),
+                name="subgraph",
+                fmt=fmt,
+                revision=graph.revision,
+            )
+
+    if path is None:
+        try:
+            path = future.result(timeout=app.config.get("RENDER_TIMEOUT", 10))
+        except futures.TimeoutError:
+            return jsonify(
+                {
+                    "job_id": job_id,
+                    "status": renderer.status(job_id),
+                    "status_url": url_for("refresh_graph_status", job_id=job_id),
+                }
+            ), 202
+    return send_file(path, mimetype=RENDER_FORMATS[fmt])
+
+
+@app.route("/nodes/get", methods=["GET"])
+@cached_response
+def get_node() -> tuple[Response, int]:
+    name = request.args.get("name")
+    version = request.args.get("version", type=int)
+
+    if name is None:
+        return jsonify({"message": "Invalid request.", "status": 400}), 400
+
+    graph: Graph = app.config["GRAPH"]
+    node = resolve_node(graph, name, version)
+
+    if node is None:
+        return jsonify({"message": "Node not found.", "status": 404}), 404
+    return jsonify({"node": node_to_json(node), "status": 200}), 200
+
+
+@app.route("/lineage/upstream", methods=["GET"])
+@cached_response
+def upstream() -> tuple[Response, int]:
+    return lineage("upstream")
+
+
+@app.route("/lineage/downstream", methods=["GET"])
+@cached_response
+def downstream() -> tuple[Response, int]:
+    return lineage("downstream")
+
+
+def lineage(direction: str) -> tuple[Response, int]:
+    name = request.args.get("name")
+    version = request.args.get("version", type=int)
+    depth = request.args.get("depth", type=int)
 
-    return redirect(url_for("frontpage"))
+    if name is None or (depth is not None and depth < 0):
+        return jsonify({"message": "Invalid request.", "status": 400}), 400
+
+    graph: Graph = app.config["GRAPH"]
+    with graph.lock.read():
+        node = resolve_node(graph, name, version)
+        if node is None:
+            return jsonify({"message": "Node not found.", "status": 404}), 404
+        if direction == "upstream":
+            nodes = graph.upstream(node, depth=depth)
+        else:
+            nodes = graph.downstream(node, depth=depth)
+
+    return jsonify(
+        {
+            "node": node_to_json(node),
+            direction: [node_to_json(node) for node in sort_nodes(nodes)],
+            "status": 200,
+        }
+    ), 200
+
+
+@app.route("/lineage/dependencies", methods=["GET"])
+@cached_response
+def dependencies() -> tuple[Response, int]:
+    name = request.args.get("name")
+    version = request.args.get("version", type=int)
+
+    if name is None:
+        return jsonify({"message": "Invalid request.", "status": 400}), 400
+
+    graph: Graph = app.config["GRAPH"]
+    with graph.lock.read():
+        node = resolve_node(graph, name, version)
+        if node is None:
+            return jsonify({"message": "Node not found.", "status": 404}), 404
+        latest = graph.latest_dependencies(node)
+
+    return jsonify(
+        {
+            "node": node_to_json(node),
+            "dependencies": [
+                {
+                    "dependency": node_to_json(dependency),
+                    "latest": node_to_json(latest[dependency]),
+                    "stale": latest[dependency].version > dependency.version,
+                }
+                for dependency in sort_nodes(latest)
+            ],
+            "status": 200,
+        }
+    ), 200
+
+
+@app.route("/lineage/stale", methods=["GET"])
+@cached_response
+def stale() -> tuple[Response, int]:
+    graph: Graph = app.config["GRAPH"]
+    with graph.lock.read():
+        stale_nodes = graph.stale_nodes()
+        latest = {
+            dependency: graph.get_latest_version(dependency.name) or dependency
+            for outdated in stale_nodes.values()
+            for dependency in outdated
+        }
+
+    return jsonify(
+        {
+            "stale": [
+                {
+                    "node": node_to_json(node),
+                    "outdated": [
+                        {
+                            "dependency": node_to_json(dependency),
+                            "latest": node_to_json(latest[dependency]),
+                        }
+                        for dependency in sort_nodes(stale_nodes[node])
+                    ],
+                }
+                for node in sort_nodes(stale_nodes)
+            ],
+            "status": 200,
+        }
+    ), 200
+
+
+@app.route("/lineage/rebuild-plan", methods=["POST"])
+def rebuild_plan() -> tuple[Response, int]:
+    # Body: {"nodes": [{"name": ..., "version": ...}, ...], "cost": ...}, where
+    # a node without a version is its latest one and cost is optional.
+    data = request.get_json(silent=True)
+    if not Validate.rebuild_plan_request(data):
+        return jsonify({"message": "Invalid request.", "status": 400}), 400
+
+    graph: Graph = app.config["GRAPH"]
+    with graph.lock.read():
+        changed = []
+        for item in data["nodes"]:
+            node = resolve_node(graph, item["name"], item.get("version"))
+            if node is None:
+                return jsonify({"message": "Node not found.", "status": 404}), 404
+            changed.append(node)
+        waves = graph.rebuild_plan(changed, cost=data.get("cost"))
+
+    return jsonify(
+        {
+            "waves": [[node_to_json(node) for node in wave] for wave in waves],
+            "nodes": sum(len(wave) for wave in waves),
+            "status": 200,
+        }
+    ), 200
 
 
 @app.route("/nodes/add", methods=["POST"])
@@ -110,12 +515,114 @@ def remove_edge() -> tuple[Response, int]:
     return jsonify({"message": "Edge removed successfully", "status": 200}), 200
 
 
+@app.route("/graph/export", methods=["GET"])
+def export_graph() -> Response:
+    # The export is streamed with chunked transfer encoding while it is read
+    # from the database; ?gzip=1 compresses it on the fly.
+    graph: Graph = app.config["GRAPH"]
+    chunks = iter_chunks(graph.export())
+    headers = {"Content-Disposition": "attachment; filename=graph.ndjson"}
+    if request.args.get("gzip", default=False, type=parse_bool):
+        chunks = iter_gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(
+        stream_with_context(chunks), mimetype="application/x-ndjson", headers=headers
+    )
+
+
+def parse_bool(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+
+def iter_request_items() -> Iterator[Any]:
+    # Bulk bodies are parsed while they are read, as they can be very large.
+    if request.mimetype in NDJSON_MIMETYPES:
+        return iter_ndjson(request.stream)
+    return iter_json_array(request.stream)
+
+
+def node_from_json(data: Any) -> Node:
+    if data is MALFORMED or not Validate.node_request(data):
+        raise ValueError("Invalid request.")
+    data = dict(data)
+    return NodeFactory.create(data.pop("ntype"), **data)
+
+
+def edge_from_json(data: Any) -> tuple[Node, Node]:
+    if data is MALFORMED or not Validate.edge_request(data):
+        raise ValueError("Invalid request.")
+    return node_from_json(data["upstream"]), node_from_json(data["downstream"])
+
+
+def bulk_response(
+    results: list[dict], applied: int, status: int = 200, **extra: Any
+) -> tuple[Response, int]:
+    return jsonify(
+        {
+            "results": results,
+            "applied": applied,
+            "failed": len(results) - applied,
+            "status": status,
+            **extra,
+        }
+    ), status
+
+
+@app.route("/nodes/bulk", methods=["POST"])
+def add_nodes_bulk() -> tuple[Response, int]:
+    # Items are validated as they are parsed; invalid ones are reported and
+    # skipped, and the rest are added in a single transaction.
+    nodes: list[Node] = []
+    results: list[dict] = []
+    try:
+        for index, item in enumerate(iter_request_items()):
+            try:
+                nodes.append(node_from_json(item))
+            except (TypeError, ValueError) as error:
+                results.append({"index": index, "status": 400, "message": str(error)})
+            else:
+                results.append({"index": index, "status": 200})
+    except ValueError:
+        return jsonify({"message": "Invalid request.", "status": 400}), 400
+
+    graph: Graph = app.config["GRAPH"]
+    graph.add_nodes(nodes)
+
+    return bulk_response(results, len(nodes))
+
+
+@app.route("/edges/bulk", methods=["POST"])
+def add_edges_bulk() -> tuple[Response, int]:
+    # Like /nodes/bulk, with a single cycle check over all the valid edges.
+    edges: list[tuple[Node, Node]] = []
+    results: list[dict] = []
+    try:
+        for index, item in enumerate(iter_request_items()):
+            try:
+                edges.append(edge_from_json(item))
+            except (TypeError, ValueError) as error:
+                results.append({"index": index, "status": 400, "message": str(error)})
+            else:
+                results.append({"index": index, "status": 200})
+    except ValueError:
+        return jsonify({"message": "Invalid request.", "status": 400}), 400
+
+    graph: Graph = app.config["GRAPH"]
+    try:
+        graph.add_edges(edges)
+    except ValueError as error:
+        # The edges are applied together, so a cycle rejects all of them.
+        for result in results:
+            if result["status"] == 200:
+                result.update(status=409, message=str(error))
+        return bulk_response(results, 0, 409, message=str(error))
+
+    return bulk_response(results, len(edges))
+
+
 if __name__ == "__main__":
     app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///graph.db"  # pragma: no cover
     app.static_folder = "static"  # pragma: no cover
-    Session = create_database(app.config["SQLALCHEMY_DATABASE_URI"])  # pragma: no cover
-    session = Session()  # pragma: no cover
-    graph = Graph(session=session)  # pragma: no cover
-    app.config["GRAPH"] = graph  # pragma: no cover
+    init_graph(app)  # pragma: no cover
 
-    app.run(debug=True)  # pragma: no cover
+    app.run(debug=True, threaded=True)  # pragma: no cover
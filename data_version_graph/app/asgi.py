@@ -0,0 +1,221 @@
+"""ASGI entry point serving the read-only lineage API from an AsyncGraph.
+
+Each worker handles many concurrent lineage requests on one event loop.
+Responses match those of the Flask app. Run it with any ASGI server:
+
+    GRAPH_DATABASE_URL=sqlite+aiosqlite:///graph.db \\
+        uvicorn data_version_graph.app.asgi:app
+
+With GRAPH_SYNC_INTERVAL set, the graph picks up writes made through other
+workers from the change log every that many seconds.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+from collections.abc import Awaitable, Callable
+from typing import Any, Optional
+from urllib.parse import parse_qs
+
+from data_version_graph.app.serializers import node_to_json, sort_nodes
+from data_version_graph.async_graph import AsyncGraph
+from data_version_graph.database import create_async_database
+from data_version_graph.nodes import Node
+
+Scope = dict[str, Any]
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+Handler = Callable[[AsyncGraph, dict[str, str]], Awaitable[tuple[dict, int]]]
+
+logger = logging.getLogger(__name__)
+
+INVALID_REQUEST = ({"message": "Invalid request.", "status": 400}, 400)
+NODE_NOT_FOUND = ({"message": "Node not found.", "status": 404}, 404)
+
+
+def _int_arg(args: dict[str, str], key: str) -> Optional[int]:
+    # Like Flask's request.args.get(key, type=int): None when absent or invalid.
+    try:
+        return int(args[key])
+    except (KeyError, ValueError):
+        return None
+
+
+async def resolve_node(
+    graph: AsyncGraph, name: str, version: Optional[int]
+) -> Optional[Node]:
+    if version is None:
+        return await graph.get_latest_version(name)
+    return await graph.get_node(name, version=version)
+
+
+async def get_node(graph: AsyncGraph, args: dict[str, str]) -> tuple[dict, int]:
+    name = args.get("name")
+    if name is None:
+        return INVALID_REQUEST
+    node = await resolve_node(graph, name, _int_arg(args, "version"))
+    if node is None:
+        return NODE_NOT_FOUND
+    return {"node": node_to_json(node), "status": 200}, 200
+
+
+def lineage(direction: str) -> Handler:
+    async def handler(graph: AsyncGraph, args: dict[str, str]) -> tuple[dict, int]:
+        name = args.get("name")
+        depth = _int_arg(args, "depth")
+        if name is None or (depth is not None and depth < 0):
+            return INVALID_REQUEST
+        node = await resolve_node(graph, name, _int_arg(args, "version"))
+        if node is None:
+            return NODE_NOT_FOUND
+        if direction == "upstream":
+            nodes = await graph.upstream(node, depth=depth)
+        else:
+            nodes = await graph.downstream(node, depth=depth)
+        return {
+            "node": node_to_json(node),
+            direction: [node_to_json(node) for node in sort_nodes(nodes)],
+            "status": 200,
+        }, 200
+
+    return handler
+
+
+async def dependencies(graph: AsyncGraph, args: dict[str, str]) -> tuple[dict, int]:
+    name = args.get("name")
+    if name is None:
+        return INVALID_REQUEST
+    node = await resolve_node(graph, name, _int_arg(args, "version"))
+    if node is None:
+        return NODE_NOT_FOUND
+    latest = await graph.latest_dependencies(node)
+    return {
+        "node": node_to_json(node),
+        "dependencies": [
+            {
+                "dependency": node_to_json(dependency),
+                "latest": node_to_json(latest[dependency]),
+                "stale": latest[dependency].version > dependency.version,
+            }
+            for dependency in sort_nodes(latest)
+        ],
+        "status": 200,
+    }, 200
+
+
+ROUTES: dict[str, Handler] = {
+    "/nodes/get": get_node,
+    "/lineage/upstream": lineage("upstream"),
+    "/lineage/downstream": lineage("downstream"),
+    "/lineage/dependencies": dependencies,
+}
+
+
+class LineageApp:
+    """ASGI application over an AsyncGraph.
+
+    The graph is either given, or created from database_url when the server
+    starts (through the ASGI lifespan protocol).
+    """
+
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        *,
+        graph: Optional[AsyncGraph] = None,
+        sync_interval: Optional[float] = None,
+        **engine_options: Any,
+    ) -> None:
+        self.database_url = database_url
+        self.engine_options = engine_options
+        self.graph = graph
+        self.sync_interval = sync_interval
+        self._sync_task: Optional[asyncio.Task] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, send)
+
+    async def startup(self) -> None:
+        if self.graph is None:
+            if self.database_url is None:
+                raise ValueError("LineageApp needs a graph or a database_url")
+            sessionmaker = await create_async_database(
+                self.database_url, **self.engine_options
+            )
+            self.graph = await AsyncGraph.create(sessionmaker)
+        if self.sync_interval:
+            self._sync_task = asyncio.create_task(self._poll(self.sync_interval))
+
+    async def shutdown(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._sync_task
+            self._sync_task = None
+        if self.graph is not None:
+            await self.graph.close()
+
+    async def _poll(self, interval: float) -> None:
+        assert self.graph is not None
+        while True:
+            await asyncio.sleep(interval)
+            # As in Graph._poll(), a failed sync is logged and retried on the
+            # next tick, rather than ending the task.
+            try:
+                await self.graph.sync()
+            except Exception:
+                logger.exception("Failed to sync the graph")
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as error:
+                    await send(
+                        {"type": "lifespan.startup.failed", "message": str(error)}
+                    )
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope: Scope, send: Send) -> None:
+        handler = ROUTES.get(scope["path"])
+        if handler is None:
+            body, status = {"message": "Not found.", "status": 404}, 404
+        elif self.graph is None:
+            body, status = {"message": "Graph not loaded.", "status": 503}, 503
+        elif scope["method"] != "GET":
+            body, status = {"message": "Method not allowed.", "status": 405}, 405
+        else:
+            query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+            args = {key: values[0] for key, values in query.items()}
+            body, status = await handler(self.graph, args)
+
+        content = json.dumps(body).encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(content)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": content})
+
+
+app = LineageApp(
+    os.environ.get("GRAPH_DATABASE_URL", "sqlite+aiosqlite:///graph.db"),
+    sync_interval=float(os.environ.get("GRAPH_SYNC_INTERVAL", 0)) or None,
+)
@@ -0,0 +1,145 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Optional
+
+import networkx as nx
+
+
+def to_agraph(
+    nodes: Iterable[tuple[Any, Optional[str]]], edges: Iterable[tuple[Any, Any]]
+) -> Any:
+    # Graphviz graph of the nodes, each with its color, and the edges, which
+    # callers copy out of a Graph under its lock so that the conversion can
+    # run on a worker thread.
+    graph = nx.DiGraph()
+    graph.add_nodes_from((node, {"color": color}) for node, color in nodes)
+    graph.add_edges_from(edges)
+    return nx.nx_agraph.to_agraph(graph)
+
+
+class GraphRenderer:
+    """Renders Graphviz images on a background thread pool.
+
+    Every render is identified by a job id derived from what it depicts (for
+    example the graph revision), so repeating a request for an unchanged graph
+    returns the finished image, and duplicate requests while it is still being
+    drawn share the same job. Both the conversion to a Graphviz graph and the
+    layout run on the pool, so to_agraph must only read data that cannot
+    change meanwhile, such as a copy.
+    """
+
+    def __init__(
+        self, output_dir: str, *, max_workers: int = 2, max_jobs: int = 256
+    ) -> None:
+        self.output_dir = output_dir
+        self.max_jobs = max_jobs
+        # Revisions restart from zero in every process, so ids are salted to
+        # keep a new process from serving images drawn by an earlier one.
+        self._salt = uuid.uuid4().hex
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="graph-render"
+        )
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, Future[str]] = OrderedDict()
+        # The newest image of each name, with the revision it depicts.
+        self._latest: dict[str, tuple[int, str]] = {}
+
+    def job_id(self, *key: Any) -> str:
+        return hashlib.sha1(repr((self._salt, *key)).encode()).hexdigest()[:16]
+
+    def filename(self, job_id: str, fmt: str) -> str:
+        return f"graph-{job_id}.{fmt}"
+
+    def submit(
+        self,
+        job_id: str,
+        to_agraph: Callable[[], Any],
+        *,
+        name: str = "graph",
+        fmt: str = "png",
+        prog: str = "dot",
+        args: str = "-Nshape=box",
+        revision: int = 0,
+    ) -> Future[str]:
+        with self._lock:
+            existing = self._jobs.get(job_id)
+            if existing is not None and not (existing.done() and existing.exception()):
+                self._jobs.move_to_end(job_id)
+                return existing
+
+            future: Future[str] = Future()
+            self._jobs[job_id] = future
+            self._evict()
+
+        path = os.path.join(self.output_dir, self.filename(job_id, fmt))
+        future.add_done_callback(lambda done: self._on_done(name, revision, path, done))
+        self._executor.submit(self._run, future, to_agraph, path, fmt, prog, args)
+        return future
+
+    def status(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            future = self._jobs.get(job_id)
+        if future is None:
+            return None
+        if not future.done():
+            return "running" if future.running() else "pending"
+        return "failed" if future.exception() else "done"
+
+    def result(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            future = self._jobs.get(job_id)
+        if future is None or not future.done() or future.exception():
+            return None
+        return future.result()
+
+    def latest(self, name: str = "graph") -> Optional[str]:
+        latest = self._latest.get(name)
+        return None if latest is None else latest[1]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _run(
+        self, future: Future[str], to_agraph: Callable[[], Any], *args: str
+    ) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(self._draw(to_agraph(), *args))
+        except BaseException as error:
+            future.set_exception(error)
+
+    def _draw(self, agraph: Any, path: str, fmt: str, prog: str, args: str) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Draw to a temporary file first, so a half-written image is never
+        # served and concurrent renders cannot overwrite each other.
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        agraph.draw(tmp_path, format=fmt, prog=prog, args=args)
+        os.replace(tmp_path, path)
+        return path
+
+    def _on_done(
+        self, name: str, revision: int, path: str, future: Future[str]
+    ) -> None:
+        # Jobs finish in any order, so an image only replaces one of an older
+        # revision.
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self._lock:
+            latest = self._latest.get(name)
+            if latest is None or latest[0] <= revision:
+                self._latest[name] = (revision, path)
+
+    def _evict(self) -> None:
+        while len(self._jobs) > self.max_jobs:
+            _, future = self._jobs.popitem(last=False)
+            if future.done() and not future.exception():
+                path = future.result()
+                latest = {latest_path for _, latest_path in self._latest.values()}
+                if path not in latest and os.path.exists(path):
+                    os.remove(path)
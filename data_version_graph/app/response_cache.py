@@ -0,0 +1,90 @@
+import hashlib
+import threading
+from collections.abc import Hashable
+from typing import Optional
+
+from data_version_graph.lru import BoundedLRU
+
+# Default budget of the response cache, in bytes of response bodies.
+RESPONSE_CACHE_BYTES = 32 * 1024 * 1024
+
+# Approximate memory held by an entry besides its body.
+CACHE_ENTRY_BYTES = 200
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "mimetype")
+
+    def __init__(self, body: bytes, mimetype: Optional[str]) -> None:
+        self.body = body
+        # A hash of the body rather than of the cache key: revisions are only
+        # unique within a process, and clients may talk to several workers.
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.mimetype = mimetype
+
+
+class ResponseCache:
+    """LRU cache of serialized responses, keyed on the graph revision.
+
+    Entries are bounded by the total size of their bodies. Revisions only
+    increase, so entries of an older revision can never be hit again and are
+    dropped as soon as a newer revision is seen.
+    """
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_BYTES) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.revision: Optional[int] = None
+        self._lock = threading.Lock()
+        self._entries: BoundedLRU[Hashable, CachedResponse] = BoundedLRU(max_bytes)
+
+    @property
+    def max_bytes(self) -> int:
+        return self._entries.max_size
+
+    @property
+    def size(self) -> int:
+        return self._entries.size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_revision(self, revision: int) -> None:
+        if revision != self.revision:
+            self._entries.clear()
+            self.revision = revision
+
+    def get(self, key: Hashable, revision: int) -> Optional[CachedResponse]:
+        with self._lock:
+            self._check_revision(revision)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def put(
+        self, key: Hashable, revision: int, body: bytes, mimetype: Optional[str]
+    ) -> CachedResponse:
+        entry = CachedResponse(body, mimetype)
+        size = CACHE_ENTRY_BYTES + len(body)
+        with self._lock:
+            self._check_revision(revision)
+            # Bodies larger than the whole budget are returned but not kept.
+            self._entries.put(key, entry, size)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,11 @@
+from collections.abc import Iterable
+
+from data_version_graph.nodes import Node
+
+
+def node_to_json(node: Node) -> dict:
+    return {"ntype": node.ntype, "name": node.name, "version": node.version}
+
+
+def sort_nodes(nodes: Iterable[Node]) -> list[Node]:
+    return sorted(nodes, key=lambda node: (node.name, node.version, node.ntype))
@@ -0,0 +1,235 @@
+import codecs
+import json
+import re
+import zlib
+from collections.abc import Iterable, Iterator
+from typing import IO, Any, Optional
+
+# Bodies are read in chunks of this many bytes, so that large uploads are
+# parsed while they arrive instead of being buffered whole.
+READ_CHUNK_SIZE = 64 * 1024
+
+NDJSON_MIMETYPES = frozenset(
+    {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+)
+
+# Streamed responses are written in chunks of about this many bytes.
+WRITE_CHUNK_SIZE = 64 * 1024
+
+# Yielded in place of an NDJSON line that is not valid JSON; the lines around
+# it can still be parsed.
+MALFORMED = object()
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+_NUMBER_START = "-0123456789"
+# An item cut short by the end of a chunk fails to decode within this many
+# characters of the end, at the start of a partial token such as "-Infinit"
+# or "\ud8". Strings are the exception: they fail where they start.
+_PARTIAL_TOKEN_LENGTH = len("-Infinit")
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_SCALAR_END = re.compile(f"[{re.escape(_DELIMITERS)}]")
+
+
+class StreamParseError(ValueError):
+    pass
+
+
+def _truncated(error: json.JSONDecodeError) -> bool:
+    # Whether decoding failed for want of the next chunk, rather than on
+    # invalid JSON, which no amount of further data can fix.
+    return (
+        error.msg.startswith("Unterminated string")
+        or len(error.doc) - error.pos <= _PARTIAL_TOKEN_LENGTH
+    )
+
+
+class _ItemEnd:
+    """Tells, a chunk at a time, whether an item may be complete, so that it
+    is only decoded once it can be rather than again after every chunk.
+
+    Containers may end once their brackets balance, strings at their closing
+    quote, and other values at the next delimiter.
+    """
+
+    __slots__ = ("opening", "depth", "in_string", "escaped")
+
+    def __init__(self, opening: str) -> None:
+        self.opening = opening
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def found(self, text: str, start: int = 0) -> bool:
+        # Scans text[start:], which follows whatever was scanned before.
+        if not text:
+            return False
+        if self.opening not in '{["':
+            return _SCALAR_END.search(text, start) is not None
+        i = start
+        if self.escaped:
+            # The escape sequence was split by the end of the previous chunk.
+            self.escaped = False
+            i += 1
+        while True:
+            if self.in_string:
+                match = _STRING_SPECIAL.search(text, i)
+                if match is None:
+                    return False
+                i = match.end()
+                if match.group() == "\\":
+                    if i == len(text):
+                        self.escaped = True
+                        return False
+                    i += 1
+                    continue
+                self.in_string = False
+                if not self.depth:
+                    return True
+                continue
+            match = _STRUCTURE.search(text, i)
+            if match is None:
+                return False
+            i = match.end()
+            if match.group() == '"':
+                self.in_string = True
+            elif match.group() in "{[":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if not self.depth:
+                    return True
+
+
+def iter_ndjson(stream: IO[bytes]) -> Iterator[Any]:
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield MALFORMED
+
+
+def iter_json_array(
+    stream: IO[bytes], *, chunk_size: int = READ_CHUNK_SIZE
+) -> Iterator[Any]:
+    # Yields the items of a top-level JSON array one at a time. Only the item
+    # being decoded and the rest of the current chunk are held in memory.
+    chunks = iter(lambda: stream.read(chunk_size), b"")
+    # Chunks may split a multi-byte character, which the decoder carries over.
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    exhausted = False
+    expecting = "["
+
+    def read() -> Optional[str]:
+        # The text of the next chunk, or None once the stream is exhausted.
+        nonlocal exhausted
+        if exhausted:
+            return None
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            return decoder.decode(b"", final=True)
+        return decoder.decode(chunk)
+
+    def fill() -> bool:
+        nonlocal buffer, position
+        text = read()
+        if text is None:
+            return False
+        buffer = buffer[position:] + text
+        position = 0
+        return not exhausted
+
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE:
+            position += 1
+        if position == len(buffer):
+            if fill():
+                continue
+            if expecting == "end":
+                return
+            raise StreamParseError("Unexpected end of JSON array")
+
+        char = buffer[position]
+        if expecting == "[":
+            if char != "[":
+                raise StreamParseError("Expected a JSON array")
+            position += 1
+            expecting = "item or ]"
+        elif expecting in ("item or ]", ", or ]") and char == "]":
+            position += 1
+            expecting = "end"
+        elif expecting == ", or ]":
+            if char != ",":
+                raise StreamParseError(f"Expected ',' or ']' at {char!r}")
+            position += 1
+            expecting = "item"
+        elif expecting in ("item", "item or ]"):
+            item_end = _ItemEnd(char)
+            complete = item_end.found(buffer, position)
+            try:
+                item, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as error:
+                # Invalid items fail at once, rather than being decoded again
+                # after every chunk up to the end of the stream.
+                if complete or exhausted or not _truncated(error):
+                    raise StreamParseError("Invalid JSON in array") from error
+                item, end = None, None
+            # A number may be cut short by the end of a chunk ("1" of "1.5"),
+            # so it only counts once a delimiter follows it.
+            if char in _NUMBER_START and not (complete or exhausted):
+                end = None
+            if end is None:
+                if exhausted:
+                    raise StreamParseError("Invalid JSON in array")
+                # Reads on until the item can be complete, scanning only the
+                # new text, and decodes it once more. Joining the chunks once
+                # keeps large items from being copied after every chunk.
+                parts = [buffer[position:]]
+                while not complete:
+                    text = read()
+                    if text is None:
+                        break
+                    parts.append(text)
+                    complete = item_end.found(text)
+                buffer = "".join(parts)
+                position = 0
+                continue
+            yield item
+            position = end
+            expecting = ", or ]"
+        else:
+            raise StreamParseError("Unexpected data after JSON array")
+
+
+def iter_chunks(
+    lines: Iterable[str], *, chunk_size: int = WRITE_CHUNK_SIZE
+) -> Iterator[bytes]:
+    # Joins lines into chunks, so that a response is not written (and, with
+    # chunked transfer encoding, framed) one short line at a time.
+    chunk: list[str] = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(chunk).encode("utf-8")
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk).encode("utf-8")
+
+
+def iter_gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -1,17 +1,31 @@
-from typing import Optional
+from typing import Optional, TypeGuard
 
 
 class Validate:
     @staticmethod
     def node_request(data: Optional[dict]) -> bool:
-        if data is None:
+        if not isinstance(data, dict):
             return False
         return all(key in data for key in ["ntype", "name"])
 
     @staticmethod
     def edge_request(data: Optional[dict]) -> bool:
-        if data is None:
+        if not isinstance(data, dict):
             return False
         return all(key in data for key in ["upstream", "downstream"]) and all(
             Validate.node_request(data[key]) for key in data
         )
+
+    @staticmethod
+    def rebuild_plan_request(data: Optional[dict]) -> TypeGuard[dict]:
+        if not isinstance(data, dict) or not isinstance(data.get("nodes"), list):
+            return False
+        if not isinstance(data.get("cost"), (str, type(None))):
+            return False
+        return all(
+            isinstance(item, dict)
+            and isinstance(item.get("name"), str)
+            and isinstance(item.get("version"), (int, type(None)))
+            and not isinstance(item.get("version"), bool)
+            for item in data["nodes"]
+        )
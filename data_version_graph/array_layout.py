@@ -0,0 +1,60 @@
+"""Flat arrays laid out back to back in one buffer.
+
+Snapshot files and the shared memory of GraphAnalytics both hold a fixed
+sequence of sections, each an array of one typecode. Every section starts on
+an 8-byte boundary, so that it can be cast in place whatever its typecode.
+"""
+
+from array import array
+from collections.abc import Callable, Iterable, Iterator
+from typing import Literal
+
+Typecode = Literal["q", "Q", "i", "I", "H", "B"]
+Section = tuple[str, Typecode]
+
+
+def align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def layout(
+    sections: Iterable[Section], length: Callable[[str], int], offset: int = 0
+) -> Iterator[tuple[str, Typecode, int, int]]:
+    # (section, typecode, start, end) of every section, in bytes from the start
+    # of the buffer. Lengths are asked for one section at a time, so a length
+    # may depend on the contents of the sections before it.
+    for name, typecode in sections:
+        start = align(offset)
+        offset = start + length(name) * array(typecode).itemsize
+        yield name, typecode, start, offset
+
+
+def nbytes(sections: Iterable[Section], length: Callable[[str], int]) -> int:
+    end = 0
+    for _, _, _, end in layout(sections, length):
+        pass
+    return end
+
+
+def write(
+    buffer: memoryview,
+    sections: Iterable[Section],
+    arrays: dict[str, array],
+    offset: int = 0,
+) -> None:
+    for name, _, start, end in layout(sections, lambda name: len(arrays[name]), offset):
+        buffer[start:end] = memoryview(arrays[name]).cast("B")
+
+
+def views(
+    buffer: memoryview,
+    sections: Iterable[Section],
+    length: Callable[[str], int],
+    offset: int = 0,
+) -> Iterator[tuple[str, memoryview]]:
+    # The sections of buffer, cast in place, one at a time. Raises IndexError
+    # when buffer is too short to hold them.
+    for name, typecode, start, end in layout(sections, length, offset):
+        if end > len(buffer):
+            raise IndexError(f"Section {name} ends past the buffer")
+        yield name, buffer[start:end].cast(typecode)
@@ -0,0 +1,222 @@
+"""Graph for asyncio applications, on a SQLAlchemy AsyncSession.
+
+An AsyncGraph keeps the same in-memory graph as Graph, and runs Graph's
+database code through AsyncSession.run_sync(), so that an event loop is never
+blocked on a round trip. Lookups and lineage queries never touch the database
+and return without suspending, unless a write is in progress.
+"""
+
+import asyncio
+import sys
+from collections.abc import AsyncIterator, Callable, Iterable, Mapping, Sequence
+from contextlib import asynccontextmanager
+from typing import Any, Optional, TypeVar
+
+import networkx as nx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from data_version_graph.database import NodeModel, chunks, matching_pairs
+from data_version_graph.graph import Graph
+from data_version_graph.nodes import Node, NodeKey
+from data_version_graph.property_store import PREFETCH_CHUNK_SIZE
+
+T = TypeVar("T")
+
+
+class AsyncGraph:
+    """Asynchronous front end of a Graph.
+
+    Writes are serialized by an asyncio lock and readers wait while one is in
+    progress, which gives the same guarantees as Graph's reader/writer lock
+    within one event loop. Writes made inside batch() must be awaited from the
+    task that opened it.
+
+    Node properties are loaded with load_properties(): reading the properties
+    of a lazily loaded node that is not cached needs a database round trip,
+    which fails outside run_sync(): SQLAlchemy raises a StatementError for a
+    MissingGreenlet error.
+    """
+
+    def __init__(
+        self, sessionmaker: async_sessionmaker, session: AsyncSession, graph: Graph
+    ) -> None:
+        # Use AsyncGraph.create(), which loads the graph.
+        self.sessionmaker = sessionmaker
+        self.session = session
+        self.graph = graph
+        self._write_lock = asyncio.Lock()
+        self._writer: Optional[asyncio.Task] = None
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @classmethod
+    async def create(
+        cls, sessionmaker: async_sessionmaker, **options: Any
+    ) -> "AsyncGraph":
+        # Options are passed on to Graph.
+        session = sessionmaker()
+        graph = await session.run_sync(
+            lambda sync_session: Graph(sync_session, **options)
+        )
+        return cls(sessionmaker, session, graph)
+
+    async def close(self) -> None:
+        await self.session.close()
+
+    @property
+    def revision(self) -> int:
+        return self.graph.revision
+
+    @asynccontextmanager
+    async def _writing(self) -> AsyncIterator[None]:
+        task = asyncio.current_task()
+        if self._writer is task:
+            yield
+            return
+        async with self._write_lock:
+            self._writer = task
+            self._idle.clear()
+            try:
+                yield
+            finally:
+                self._writer = None
+                self._idle.set()
+
+    async def _readable(self) -> None:
+        # Checked again after every wake-up: another write may have started
+        # before this task was scheduled.
+        if self._writer is asyncio.current_task():
+            return
+        while not self._idle.is_set():
+            await self._idle.wait()
+
+    async def _write(self, method: Callable[..., T], *args: Any) -> T:
+        async with self._writing():
+            return await self.session.run_sync(lambda _: method(*args))
+
+    @asynccontextmanager
+    async def batch(self) -> AsyncIterator[None]:
+        # Same as Graph.batch(): the writes are flushed in one transaction when
+        # the outermost batch exits, or discarded if the block raises.
+        async with self._writing():
+            batch = self.graph.batch()
+            batch.__enter__()
+            try:
+                yield
+            except BaseException:
+                exc_info = sys.exc_info()
+                await self.session.run_sync(lambda _: batch.__exit__(*exc_info))
+                raise
+            await self.session.run_sync(lambda _: batch.__exit__(None, None, None))
+
+    async def add_node(self, node: Node) -> None:
+        await self._write(self.graph.add_node, node)
+
+    async def add_nodes(self, nodes: Iterable[Node]) -> None:
+        await self._write(self.graph.add_nodes, list(nodes))
+
+    async def remove_node(self, node: Node) -> None:
+        await self._write(self.graph.remove_node, node)
+
+    async def remove_nodes(self, nodes: Iterable[Node]) -> None:
+        await self._write(self.graph.remove_nodes, list(nodes))
+
+    async def remove_all_versions(self, name: str) -> None:
+        await self._write(self.graph.remove_all_versions, name)
+
+    async def add_edge(self, from_node: Node, to_node: Node) -> None:
+        await self._write(self.graph.add_edge, from_node, to_node)
+
+    async def add_edges(self, edges: Iterable[tuple[Node, Node]]) -> None:
+        await self._write(self.graph.add_edges, list(edges))
+
+    async def remove_edge(self, from_node: Node, to_node: Node) -> None:
+        await self._write(self.graph.remove_edge, from_node, to_node)
+
+    async def sync(self) -> int:
+        return await self._write(self.graph.sync)
+
+    async def is_cyclic_with_edge(self, from_node: Node, to_node: Node) -> bool:
+        await self._readable()
+        return self.graph.is_cyclic_with_edge(from_node, to_node)
+
+    async def get_node(self, name: str, *, version: int = 1) -> Optional[Node]:
+        await self._readable()
+        return self.graph.get_node(name, version=version)
+
+    async def get_latest_version(self, name: str) -> Optional[Node]:
+        await self._readable()
+        return self.graph.get_latest_version(name)
+
+    async def get_versions(
+        self, name: str, *, start: Optional[int] = None, end: Optional[int] = None
+    ) -> list[Node]:
+        await self._readable()
+        return self.graph.get_versions(name, start=start, end=end)
+
+    async def subgraph(
+        self, node: Node, *, direction: str = "both", depth: Optional[int] = None
+    ) -> nx.DiGraph:
+        await self._readable()
+        return self.graph.subgraph(node, direction=direction, depth=depth)
+
+    async def upstream(self, node: Node, *, depth: Optional[int] = None) -> frozenset:
+        await self._readable()
+        return self.graph.upstream(node, depth=depth)
+
+    async def downstream(self, node: Node, *, depth: Optional[int] = None) -> frozenset:
+        await self._readable()
+        return self.graph.downstream(node, depth=depth)
+
+    async def latest_dependencies(self, node: Node) -> dict[Node, Node]:
+        await self._readable()
+        return self.graph.latest_dependencies(node)
+
+    async def stale_nodes(self) -> dict[Node, frozenset[Node]]:
+        await self._readable()
+        return self.graph.stale_nodes()
+
+    async def topological_sort(self) -> list[Node]:
+        await self._readable()
+        return self.graph.topological_sort()
+
+    async def load_properties(
+        self, nodes: Iterable[Node]
+    ) -> dict[Node, Mapping[str, Any]]:
+        # Properties of the given nodes. Those not cached are fetched in chunks,
+        # each on its own session, all at once.
+        store = self.graph.properties
+        properties: dict[Node, Mapping[str, Any]] = {}
+        wanted: dict[NodeKey, Node] = {}
+        for node in nodes:
+            if not node.lazy_properties or node in store:
+                properties[node] = node.properties
+            else:
+                wanted[(node.name, node.version)] = node
+
+        fetched = await asyncio.gather(
+            *(
+                self._fetch_properties(chunk)
+                for chunk in chunks(sorted(wanted), PREFETCH_CHUNK_SIZE)
+            )
+        )
+        for rows in fetched:
+            for name, version, values in rows:
+                node = wanted.pop((name, version))
+                properties[node] = store.put(node, values)
+        # Nodes whose rows have been deleted meanwhile.
+        for node in wanted.values():
+            properties[node] = store.put(node, None)
+        return properties
+
+    async def _fetch_properties(
+        self, keys: Sequence[NodeKey]
+    ) -> list[tuple[str, int, Optional[dict[str, Any]]]]:
+        async with self.sessionmaker() as session:
+            rows = await session.execute(
+                select(NodeModel.name, NodeModel.version, NodeModel.properties).where(
+                    matching_pairs((NodeModel.name, NodeModel.version), keys)
+                )
+            )
+            return [tuple(row) for row in rows]
@@ -0,0 +1,111 @@
+import threading
+from collections.abc import Callable, Hashable
+
+import networkx as nx
+
+from data_version_graph.lru import BoundedLRU
+
+# Default budget of the cache, in nodes: the total size of the cached closures.
+CLOSURE_CACHE_SIZE = 2_000_000
+
+# Approximate cost of an entry besides its members, so that empty closures
+# still count against the budget.
+CLOSURE_ENTRY_SIZE = 8
+
+ANCESTORS = "ancestors"
+DESCENDANTS = "descendants"
+
+CLOSURES: dict[str, Callable[[nx.DiGraph, Hashable], set]] = {
+    ANCESTORS: nx.ancestors,
+    DESCENDANTS: nx.descendants,
+}
+
+
+def _cost(closure: frozenset) -> int:
+    return CLOSURE_ENTRY_SIZE + len(closure)
+
+
+class ClosureCache:
+    """Memoized ancestor and descendant sets of the nodes of a DAG.
+
+    When an edge or node changes, only the entries of nodes whose closure can
+    change are dropped: the descendant sets of the upstream cone and the
+    ancestor sets of the downstream cone. Entries of both directions share an
+    LRU budget bounded by the total size of the closures, so a long-lived
+    process answering impact queries cannot grow without limit.
+    """
+
+    def __init__(
+        self, graph: nx.DiGraph, *, max_size: int = CLOSURE_CACHE_SIZE
+    ) -> None:
+        self.graph = graph
+        # Lookups run concurrently under the graph's read lock.
+        self._lock = threading.Lock()
+        # Closures keyed on (direction, node).
+        self._entries: BoundedLRU[tuple[str, Hashable], frozenset] = BoundedLRU(
+            max_size
+        )
+
+    @property
+    def max_size(self) -> int:
+        return self._entries.max_size
+
+    @property
+    def size(self) -> int:
+        return self._entries.size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ancestors(self, node: Hashable) -> frozenset:
+        return self._get(ANCESTORS, node)
+
+    def descendants(self, node: Hashable) -> frozenset:
+        return self._get(DESCENDANTS, node)
+
+    def _get(self, direction: str, node: Hashable) -> frozenset:
+        with self._lock:
+            cached = self._entries.get((direction, node))
+            if cached is not None:
+                return cached
+
+        # Computed outside the lock: concurrent readers of the same node
+        # compute equal closures, and the last one stored wins.
+        closure = frozenset(CLOSURES[direction](self.graph, node))
+        with self._lock:
+            # Closures larger than the whole budget are returned but not kept.
+            self._entries.put((direction, node), closure, _cost(closure))
+        return closure
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate_edge(self, from_node: Hashable, to_node: Hashable) -> None:
+        # Adding or removing from_node -> to_node changes what from_node and
+        # its ancestors reach, and what reaches to_node and its descendants.
+        with self._lock:
+            upstream = self._entries.peek((ANCESTORS, from_node))
+            downstream = self._entries.peek((DESCENDANTS, to_node))
+            self._invalidate(DESCENDANTS, from_node, upstream)
+            self._invalidate(ANCESTORS, to_node, downstream)
+
+    def invalidate_node(self, node: Hashable) -> None:
+        self.invalidate_edge(node, node)
+
+    def _invalidate(
+        self, direction: str, node: Hashable, cone: "frozenset | None"
+    ) -> None:
+        self._entries.pop((direction, node))
+        # Walk whichever is smaller: the cone, when it is known, or the cache,
+        # whose entries are affected exactly when they contain node.
+        if cone is not None and len(cone) < len(self._entries):
+            for member in cone:
+                self._entries.pop((direction, member))
+        else:
+            for key in [
+                key
+                for key, closure in self._entries.items()
+                if key[0] == direction and node in closure
+            ]:
+                self._entries.pop(key)
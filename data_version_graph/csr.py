@@ -0,0 +1,137 @@
+from collections.abc import Hashable, Sequence
+from typing import Any, Optional
+
+import networkx as nx
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+NUMPY_AVAILABLE = np is not None
+
+
+class CSRGraph:
+    """Read-only DAG stored in NumPy compressed sparse row/column arrays.
+
+    Nodes are numbered 0..n-1. The successors of node i are
+    indices[indptr[i]:indptr[i + 1]] and its predecessors are
+    rev_indices[rev_indptr[i]:rev_indptr[i + 1]], so both directions are
+    traversed a whole BFS frontier at a time with vectorized gathers.
+    """
+
+    def __init__(self, nodes: Sequence[Hashable], sources: Any, targets: Any) -> None:
+        if np is None:  # pragma: no cover
+            raise ImportError(
+                "The csr backend requires numpy: pip install data-version-graph[csr]"
+            )
+        self.nodes = list(nodes)
+        self.ids = {node: i for i, node in enumerate(self.nodes)}
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        self.indptr, self.indices = self._compress(sources, targets)
+        self.rev_indptr, self.rev_indices = self._compress(targets, sources)
+
+    @classmethod
+    def from_networkx(cls, graph: nx.DiGraph) -> "CSRGraph":
+        nodes = list(graph)
+        ids = {node: i for i, node in enumerate(nodes)}
+        n_edges = graph.number_of_edges()
+        sources = np.fromiter(
+            (ids[from_node] for from_node, _ in graph.edges), np.int64, n_edges
+        )
+        targets = np.fromiter(
+            (ids[to_node] for _, to_node in graph.edges), np.int64, n_edges
+        )
+        return cls(nodes, sources, targets)
+
+    def _compress(self, sources: Any, targets: Any) -> tuple[Any, Any]:
+        order = np.lexsort((targets, sources))
+        counts = np.bincount(sources, minlength=len(self.nodes))
+        indptr = np.zeros(len(self.nodes) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return indptr, targets[order].astype(np.int32)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, node: object) -> bool:
+        return node in self.ids
+
+    @property
+    def number_of_edges(self) -> int:
+        return len(self.indices)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            array.nbytes
+            for array in (self.indptr, self.indices, self.rev_indptr, self.rev_indices)
+        )
+
+    def to_networkx(self) -> nx.DiGraph:
+        graph = nx.DiGraph()
+        graph.add_nodes_from(self.nodes)
+        sources = np.repeat(np.arange(len(self.nodes)), np.diff(self.indptr))
+        graph.add_edges_from(
+            (self.nodes[from_id], self.nodes[to_id])
+            for from_id, to_id in zip(sources.tolist(), self.indices.tolist())
+        )
+        return graph
+
+    def descendants(self, node: Hashable, *, depth: Optional[int] = None) -> frozenset:
+        return self._reachable(node, self.indptr, self.indices, depth)
+
+    def ancestors(self, node: Hashable, *, depth: Optional[int] = None) -> frozenset:
+        return self._reachable(node, self.rev_indptr, self.rev_indices, depth)
+
+    def _reachable(
+        self, node: Hashable, indptr: Any, indices: Any, depth: Optional[int]
+    ) -> frozenset:
+        start = self.ids[node]
+        visited = self._bfs(np.array([start]), indptr, indices, depth)
+        visited[start] = False
+        nodes = self.nodes
+        return frozenset([nodes[i] for i in np.flatnonzero(visited).tolist()])
+
+    def _bfs(
+        self, frontier: Any, indptr: Any, indices: Any, depth: Optional[int]
+    ) -> Any:
+        visited = np.zeros(len(self.nodes), dtype=bool)
+        visited[frontier] = True
+        level = 0
+        while frontier.size and (depth is None or level < depth):
+            neighbours = self._gather(frontier, indptr, indices)
+            neighbours = neighbours[~visited[neighbours]]
+            visited[neighbours] = True
+            frontier = np.unique(neighbours)
+            level += 1
+        return visited
+
+    def _gather(self, frontier: Any, indptr: Any, indices: Any) -> Any:
+        # Concatenates indices[indptr[i]:indptr[i + 1]] for every i in the
+        # frontier without a Python loop: each output slot is its row's start
+        # plus its offset within the row.
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            return indices[:0]
+        row_offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return indices[row_offsets + np.arange(total)]
+
+    def topological_sort(self) -> list:
+        # Kahn's algorithm, one level of the DAG per step.
+        in_degree = np.diff(self.rev_indptr)  # a new, writable array
+        frontier = np.flatnonzero(in_degree == 0)
+        order = []
+        while frontier.size:
+            order.append(frontier)
+            neighbours = self._gather(frontier, self.indptr, self.indices)
+            np.subtract.at(in_degree, neighbours, 1)
+            frontier = np.unique(neighbours[in_degree[neighbours] == 0])
+        ids = np.concatenate(order) if order else np.empty(0, dtype=np.int64)
+        if len(ids) != len(self.nodes):
+            raise ValueError("The graph contains a cycle")
+        nodes = self.nodes
+        return [nodes[i] for i in ids.tolist()]
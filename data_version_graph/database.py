@@ -1,34 +1,240 @@
-from typing import Any
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any, Optional, TypeVar, Union
 
-from sqlalchemy import JSON, Column, ForeignKey, Integer, String, create_engine
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy import (
+    JSON,
+    ColumnElement,
+    Connection,
+    Engine,
+    ForeignKey,
+    Index,
+    Insert,
+    Integer,
+    String,
+    and_,
+    bindparam,
+    create_engine,
+    delete,
+    func,
+    insert,
+    inspect,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import (
+    Mapped,
+    declarative_base,
+    mapped_column,
+    relationship,
+    sessionmaker,
+)
+from sqlalchemy.pool import StaticPool
 
 Base: Any = declarative_base()
 
+T = TypeVar("T")
+
 
 class NodeModel(Base):
     __tablename__ = "nodes"
+    __table_args__ = (Index("ix_nodes_name_version", "name", "version", unique=True),)
 
-    id = Column(Integer, primary_key=True)
-    ntype = Column(String, nullable=False)
-    name = Column(String, nullable=False)
-    version = Column(Integer, nullable=False)
-    properties = Column(JSON, nullable=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ntype: Mapped[str] = mapped_column(String, nullable=False)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Properties can hold large blobs (e.g. table schemas), so ORM queries
+    # leave them out unless asked; Graph reads them through a PropertyStore.
+    properties: Mapped[Optional[dict[str, Any]]] = mapped_column(
+        JSON, nullable=True, deferred=True
+    )
 
 
 class EdgeModel(Base):
     __tablename__ = "edges"
+    __table_args__ = (
+        Index(
+            "ix_edges_from_node_id_to_node_id",
+            "from_node_id",
+            "to_node_id",
+            unique=True,
+        ),
+        Index("ix_edges_to_node_id", "to_node_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    from_node_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("nodes.id"), nullable=False
+    )
+    to_node_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("nodes.id"), nullable=False
+    )
+
+    from_node: Mapped["NodeModel"] = relationship(
+        "NodeModel", foreign_keys=[from_node_id]
+    )
+    to_node: Mapped["NodeModel"] = relationship("NodeModel", foreign_keys=[to_node_id])
+
 
-    id = Column(Integer, primary_key=True)
-    from_node_id = Column(Integer, ForeignKey("nodes.id"), nullable=False)
-    to_node_id = Column(Integer, ForeignKey("nodes.id"), nullable=False)
+class ChangeModel(Base):
+    # Append-only log of the writes to the nodes and edges tables, in the order
+    # they were applied. Ids are sequence numbers: Graph.sync() replays the
+    # entries after the last one it has seen. Edge entries name their source
+    # node in name/version and their target in to_name/to_version.
+    __tablename__ = "changes"
+    # Without AUTOINCREMENT, SQLite may reuse the ids of deleted rows.
+    __table_args__ = {"sqlite_autoincrement": True}
 
-    from_node = relationship("NodeModel", foreign_keys=[from_node_id])
-    to_node = relationship("NodeModel", foreign_keys=[to_node_id])
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    operation: Mapped[str] = mapped_column(String, nullable=False)
+    ntype: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    to_name: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    to_version: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
 
 
-def create_database(database_url: str) -> sessionmaker:
-    engine = create_engine(database_url)
+def _engine_options(database_url: str, engine_options: dict[str, Any]) -> None:
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # An in-memory SQLite database only lives as long as its connection, so
+        # every thread has to share that single connection.
+        engine_options.setdefault("poolclass", StaticPool)
+        engine_options.setdefault("connect_args", {"check_same_thread": False})
+
+
+def create_database(database_url: str, **engine_options: Any) -> sessionmaker:
+    _engine_options(database_url, engine_options)
+    engine = create_engine(database_url, **engine_options)
     Base.metadata.create_all(engine)
+    migrate_database(engine)
 
     return sessionmaker(bind=engine)
+
+
+async def create_async_database(
+    database_url: str, **engine_options: Any
+) -> async_sessionmaker:
+    # Same as create_database(), for an async driver such as
+    # "sqlite+aiosqlite://" or "postgresql+asyncpg://".
+    _engine_options(database_url, engine_options)
+    engine = create_async_engine(database_url, **engine_options)
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(migrate_database)
+
+    return async_sessionmaker(bind=engine, expire_on_commit=False)
+
+
+def migrate_database(bind: Union[Engine, Connection]) -> None:
+    # create_all() skips tables that already exist, so databases created before
+    # the indexes were introduced are brought up to date here.
+    inspector = inspect(bind)
+    missing = [
+        index
+        for table in Base.metadata.sorted_tables
+        for index in table.indexes
+        if index.name not in {i["name"] for i in inspector.get_indexes(table.name)}
+    ]
+    if not missing:
+        return
+
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            _create_indexes(connection, missing)
+    else:
+        _create_indexes(bind, missing)
+
+
+def _create_indexes(connection: Connection, indexes: list[Index]) -> None:
+    _remove_duplicate_nodes(connection)
+    _remove_duplicate_edges(connection)
+    _unnest_properties(connection)
+    for index in indexes:
+        index.create(connection, checkfirst=True)
+
+
+def _remove_duplicate_nodes(connection: Any) -> None:
+    duplicates = connection.execute(
+        select(NodeModel.name, NodeModel.version, func.min(NodeModel.id))
+        .group_by(NodeModel.name, NodeModel.version)
+        .having(func.count() > 1)
+    )
+    for name, version, keep_id in duplicates.all():
+        duplicate_ids = select(NodeModel.id).where(
+            NodeModel.name == name,
+            NodeModel.version == version,
+            NodeModel.id != keep_id,
+        )
+        for column in (EdgeModel.from_node_id, EdgeModel.to_node_id):
+            connection.execute(
+                update(EdgeModel)
+                .where(column.in_(duplicate_ids))
+                .values({column.key: keep_id})
+            )
+        connection.execute(delete(NodeModel).where(NodeModel.id.in_(duplicate_ids)))
+
+
+def _remove_duplicate_edges(connection: Any) -> None:
+    keep_ids = select(func.min(EdgeModel.id)).group_by(
+        EdgeModel.from_node_id, EdgeModel.to_node_id
+    )
+    connection.execute(delete(EdgeModel).where(EdgeModel.id.not_in(keep_ids)))
+
+
+def _unnest_properties(connection: Any) -> None:
+    # Nodes used to be built with their properties passed as a single
+    # `properties` keyword, which stored them as {"properties": {...}}.
+    # Databases written then predate the indexes, so this runs once for them.
+    rows = connection.execute(
+        select(NodeModel.id, NodeModel.properties).where(
+            NodeModel.properties.is_not(None)
+        )
+    )
+    updates = [
+        {"node_id": node_id, "node_properties": properties["properties"] or None}
+        for node_id, properties in rows
+        if isinstance(properties, dict)
+        and properties.keys() == {"properties"}
+        and isinstance(properties["properties"], dict)
+    ]
+    if updates:
+        connection.execute(
+            update(NodeModel.__table__)
+            .where(NodeModel.id == bindparam("node_id"))
+            .values(properties=bindparam("node_properties")),
+            updates,
+        )
+
+
+def insert_ignoring_duplicates(model: Any, dialect_name: str) -> Optional[Insert]:
+    # INSERT statement that silently skips rows violating a unique index, or
+    # None when the dialect has no such clause and callers must filter first.
+    if dialect_name == "sqlite":
+        return sqlite.insert(model).on_conflict_do_nothing()
+    if dialect_name == "postgresql":
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect_name in ("mysql", "mariadb"):
+        return insert(model).prefix_with("IGNORE")
+    return None
+
+
+def matching_pairs(
+    columns: tuple[Any, Any], pairs: Iterable[tuple[Any, Any]]
+) -> ColumnElement[bool]:
+    # Rows whose two columns equal one of the pairs, as OR'd equalities rather
+    # than a row value IN: SQLite searches a two-column index for the former
+    # but scans it for the latter. Each pair binds two values.
+    first, second = columns
+    return or_(*(and_(first == a, second == b) for a, b in pairs))
+
+
+def chunks(values: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    # Consecutive slices of at most size values, to keep the number of values
+    # bound into a single statement below the limits of the database.
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
@@ -1,139 +1,793 @@
+import itertools
+import json
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from operator import itemgetter
 from typing import TYPE_CHECKING, Optional, Union
 
 import networkx as nx
-from sqlalchemy import Column
-from sqlalchemy.orm import Session
+from sqlalchemy import Column, Row, func, select
+from sqlalchemy.orm import Session, aliased, scoped_session
 
-from data_version_graph.database import EdgeModel, NodeModel
+from data_version_graph.closure_cache import CLOSURE_CACHE_SIZE, ClosureCache
+from data_version_graph.csr import NUMPY_AVAILABLE, CSRGraph
+from data_version_graph.database import ChangeModel, EdgeModel, NodeModel
+from data_version_graph.locks import ReadWriteLock
+from data_version_graph.metrics import timed
 from data_version_graph.node_factory import NodeFactory
-from data_version_graph.nodes import Node
+from data_version_graph.node_index import NodeIndex
+from data_version_graph.nodes import Node, NodeKey
+from data_version_graph.property_store import PROPERTIES_CACHE_BYTES, PropertyStore
+from data_version_graph.snapshot import Snapshot, SnapshotError, write_snapshot
+from data_version_graph.stale_index import StaleIndex
+from data_version_graph.topological_order import TopologicalOrder
+from data_version_graph.write_buffer import (
+    ADD_EDGE,
+    ADD_NODE,
+    REMOVE_EDGE,
+    REMOVE_NODE,
+    WriteBuffer,
+)
 
 if TYPE_CHECKING:
     from data_version_graph.nodes import Node  # pragma: no cover
 
+LOAD_BATCH_SIZE = 10_000
+
+# Edges read by import_stream() are added this many at a time, each batch with
+# one topological-order rebuild.
+IMPORT_BATCH_SIZE = 100_000
+
+DIRECTIONS = ("upstream", "downstream", "both")
+
+# Engines that can answer lineage queries. The graph is always kept in the
+# nx.DiGraph; with "csr" reads go to a CSRGraph of it, rebuilt after writes.
+# The CSRGraph is held on top of the nx.DiGraph, so "csr" costs memory rather
+# than saving it, and suits read-mostly graphs (see benchmarks/backends.py).
+BACKENDS = ("networkx", "csr")
+
+# After a write, the CSRGraph is rebuilt once this many times its last build
+# time has passed, so that rebuilds take up at most about a tenth of the time
+# under a steady stream of writes. Reads in between use the nx.DiGraph.
+CSR_REBUILD_FACTOR = 10
+
+# sync() reads the change log from this many ids below the newest entry it has
+# seen, to pick up entries committed out of id order: PostgreSQL hands out an
+# id when the row is inserted, not when its transaction commits.
+SYNC_LAG_WINDOW = 1000
+
+# Upper bound on the change log ids remembered past Graph.sequence. The
+# instance's own entries pile up there while entries of other writers sit in
+# between and sync() is not called; past the bound they are forgotten, and
+# sync() replays them, which is harmless.
+SEEN_CHANGES_LIMIT = 10_000
+
+_revisions = itertools.count()
+
+logger = logging.getLogger(__name__)
+
 
 class Graph:
-    def __init__(self, session: Session) -> None:
+    def __init__(
+        self,
+        session: Union[Session, scoped_session],
+        *,
+        properties_cache_bytes: int = PROPERTIES_CACHE_BYTES,
+        closure_cache_size: int = CLOSURE_CACHE_SIZE,
+        snapshot_path: Optional[str] = None,
+        backend: str = "networkx",
+    ) -> None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        if backend == "csr" and not NUMPY_AVAILABLE:
+            raise ImportError("The csr backend requires numpy")
+        self.backend = backend
         self.graph = nx.DiGraph()
         self.session = session
+        # Start-up loads this snapshot, when it is usable, plus newer rows.
+        self.snapshot_path = snapshot_path
+        # Node properties are left in the database until they are accessed.
+        self.properties = PropertyStore(session, max_bytes=properties_cache_bytes)
+        # Guards the in-memory graph: lookups share the read lock while every
+        # mutation takes the write lock, so one Graph can serve many threads.
+        self.lock = ReadWriteLock()
+        self._writes = WriteBuffer()
+        self._batch_depth = 0
+        self.revision = next(_revisions)
+        # Id of the last change log entry reflected in the graph. It is read
+        # before loading, so entries committed meanwhile are replayed by the
+        # next sync(), which is harmless, rather than missed.
+        self.sequence = self._last_sequence()
+        # Entries up to this id were loaded rather than seen one by one, so
+        # sync() does not read back below it.
+        self._sync_floor = self.sequence
+        # Ids of the change log entries after self.sequence - SYNC_LAG_WINDOW
+        # that the graph reflects: those replayed by sync(), and the
+        # instance's own.
+        self._seen_changes: set[int] = set()
+        self._sync_thread: Optional[threading.Thread] = None
+        self._sync_stop = threading.Event()
         self._load_graph()
+        self._topological_order = TopologicalOrder(self.graph)
+        self._index = NodeIndex(self.graph.nodes)
+        self._stale = StaleIndex(self.graph, self._index)
+        self._closures = ClosureCache(self.graph, max_size=closure_cache_size)
+        # The CSRGraph and the revision it was built from.
+        self._csr: Optional[tuple[CSRGraph, int]] = None
+        self._csr_next_build = 0.0
+        self._csr_lock = threading.Lock()
 
+    @timed
     def _load_graph(self) -> None:
-        # Load nodes from the database and add them to the graph.
-        nodes = self.session.query(NodeModel).all()
-        for node in nodes:
-            self.add_node(
-                NodeFactory.create(node.ntype, name=node.name, version=node.version)
-            )
+        if self.snapshot_path is not None and self._load_snapshot(self.snapshot_path):
+            return
+        nodes = self._load_nodes()
+        self._load_edges(nodes.get)
 
-        # Load edges from the database and add them to the graph.
-        edges = self.session.query(EdgeModel).all()
-        for edge in edges:
-            from_node = self._get_db_node_by_id(edge.from_node_id)
-            to_node = self._get_db_node_by_id(edge.to_node_id)
-            if from_node is not None and to_node is not None:
-                self.add_edge(
-                    NodeFactory.create(
-                        from_node.ntype, name=from_node.name, version=from_node.version
-                    ),
-                    NodeFactory.create(
-                        to_node.ntype, name=to_node.name, version=to_node.version
+    def _load_nodes(self, after_id: int = 0) -> dict[int, Node]:
+        # Load nodes from the database in a single streamed query, keeping an
+        # id -> Node map so edges can be resolved without further round trips.
+        nodes: dict[int, Node] = {}
+        node_rows = self.session.execute(
+            select(NodeModel.id, NodeModel.ntype, NodeModel.name, NodeModel.version)
+            .where(NodeModel.id > after_id)
+            .order_by(NodeModel.id)
+            .execution_options(yield_per=LOAD_BATCH_SIZE)
+        )
+        for rows in node_rows.partitions():
+            nodes.update(
+                zip(
+                    map(itemgetter(0), rows),
+                    NodeFactory.create_many(
+                        map(itemgetter(1, 2, 3), rows), properties=self.properties
                     ),
                 )
+            )
+        self.graph.add_nodes_from(
+            (node, {"color": node.color}) for node in nodes.values()
+        )
+        return nodes
+
+    def _load_edges(
+        self, resolve: Callable[[int], Optional[Node]], after_id: int = 0
+    ) -> None:
+        # Load edges the same way, skipping any whose endpoints no longer exist.
+        edge_rows = self.session.execute(
+            select(EdgeModel.from_node_id, EdgeModel.to_node_id)
+            .where(EdgeModel.id > after_id)
+            .order_by(EdgeModel.id)
+            .execution_options(yield_per=LOAD_BATCH_SIZE)
+        )
+        self.graph.add_edges_from(
+            (from_node, to_node)
+            for from_node, to_node in (
+                (resolve(from_id), resolve(to_id)) for from_id, to_id in edge_rows
+            )
+            if from_node is not None and to_node is not None
+        )
+
+    def _load_snapshot(self, path: str) -> bool:
+        # Builds the graph from a snapshot file and replays the rows added to
+        # the database since it was written, instead of reading every row.
+        # Returns False, to fall back to a full load, when there is no usable
+        # snapshot or rows it contains have been deleted since.
+        try:
+            snapshot = Snapshot(path)
+        except (OSError, SnapshotError):
+            return False
+        with snapshot:
+            if not snapshot.is_current(self.session):
+                return False
+            nodes = list(
+                NodeFactory.create_many(snapshot.nodes(), properties=self.properties)
+            )
+            self.graph.add_nodes_from((node, {"color": node.color}) for node in nodes)
+            self.graph.add_edges_from(
+                (nodes[from_position], nodes[to_position])
+                for from_position, to_position in snapshot.edges()
+            )
+
+            new_nodes = self._load_nodes(after_id=snapshot.max_node_id)
+
+            def resolve(node_id: int) -> Optional[Node]:
+                if node_id in new_nodes:
+                    return new_nodes[node_id]
+                position = snapshot.position(node_id)
+                return None if position is None else nodes[position]
+
+            self._load_edges(resolve, after_id=snapshot.max_edge_id)
+        return True
+
+    @timed
+    def save_snapshot(self, path: str) -> None:
+        # The read lock keeps a batch from flushing half its writes meanwhile.
+        with self.lock.read():
+            write_snapshot(self.session, path)
+
+    def _touch(self) -> None:
+        # Revisions come from a process-wide counter, so they increase with
+        # every change and are never shared by two Graph instances. Derived
+        # artefacts (rendered images, cached responses) are keyed on them.
+        self.revision = next(_revisions)
+
+    @timed
+    def _reload(self) -> None:
+        self._touch()
+        self.graph.clear()
+        self.sequence = self._last_sequence()
+        self._sync_floor = self.sequence
+        self._seen_changes.clear()
+        self._load_graph()
+        self._topological_order.rebuild()
+        self._index = NodeIndex(self.graph.nodes)
+        self._stale = StaleIndex(self.graph, self._index)
+        self._closures.clear()
+        self.properties.clear()
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        # Database writes made inside the block are buffered and flushed in a
+        # single transaction when the outermost batch exits. If the block
+        # raises, the pending writes are discarded and the in-memory graph is
+        # reloaded so that it matches the database again.
+        with self.lock.write():
+            self._batch_depth += 1
+            try:
+                yield
+            except BaseException:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._writes.clear()
+                    self.session.rollback()
+                    self._reload()
+                raise
+            self._batch_depth -= 1
+            self._flush_writes()
+
+    @timed
+    def _flush_writes(self) -> None:
+        if self._batch_depth > 0 or not self._writes:
+            return
+        try:
+            change_ids = self._writes.flush(self.session)
+        except Exception:
+            self._reload()
+            raise
+        # Entries that follow on from self.sequence move it forward; the rest
+        # come after entries of other writers, which sync() has yet to replay.
+        self._seen_changes.update(change_ids)
+        while self.sequence + 1 in self._seen_changes:
+            self.sequence += 1
+        if len(self._seen_changes) > SEEN_CHANGES_LIMIT:
+            self._prune_seen_changes(forget_own=True)
+
+    def _prune_seen_changes(self, forget_own: bool = False) -> None:
+        low = max(self._sync_floor, self.sequence - SYNC_LAG_WINDOW)
+        high = self.sequence if forget_own else None
+        self._seen_changes = {
+            change_id
+            for change_id in self._seen_changes
+            if change_id > low and (high is None or change_id <= high)
+        }
+
+    def _last_sequence(self) -> int:
+        return self.session.execute(select(func.max(ChangeModel.id))).scalar() or 0
+
+    @timed
+    def sync(self) -> int:
+        # Brings the graph up to date with writes made through other Graph
+        # instances (other workers or hosts) by replaying the change log, and
+        # returns the number of entries replayed. Entries the graph already
+        # reflects (its own writes, and those replayed before) are skipped
+        # until the first one it has not seen; from there on, every entry is
+        # replayed, so that the writes take effect in log order.
+        with self.lock.write():
+            # Ends the current transaction, which may predate the latest writes.
+            self.session.rollback()
+            low = max(self._sync_floor, self.sequence - SYNC_LAG_WINDOW)
+            change_ids = self.session.scalars(
+                select(ChangeModel.id)
+                .where(ChangeModel.id > low)
+                .order_by(ChangeModel.id)
+            )
+            first = next((i for i in change_ids if i not in self._seen_changes), None)
+            change_ids.close()
+            count = 0
+            if first is not None:
+                changes = self.session.execute(
+                    select(
+                        ChangeModel.id,
+                        ChangeModel.operation,
+                        ChangeModel.ntype,
+                        ChangeModel.name,
+                        ChangeModel.version,
+                        ChangeModel.to_name,
+                        ChangeModel.to_version,
+                    )
+                    .where(ChangeModel.id >= first)
+                    .order_by(ChangeModel.id)
+                    .execution_options(yield_per=LOAD_BATCH_SIZE)
+                )
+                applied = self._apply_changes(changes)
+                count = sum(i not in self._seen_changes for i in applied)
+                self._seen_changes.update(applied)
+                self.sequence = max(self.sequence, applied[-1])
+            self._prune_seen_changes()
+            self.session.rollback()
+            return count
+
+    def _apply_changes(self, changes: Iterable[Row]) -> list[int]:
+        # Applies logged writes to the in-memory graph only, and returns their
+        # ids. The graph may already reflect some of the writes but not the
+        # ones before them, so replaying them one by one could find cycles
+        # that never existed. Instead, every node and edge they touch is left
+        # as the last of them left it: removals go first, then additions.
+        change_ids: list[int] = []
+        # The last ADD_NODE of each node not removed since, the last
+        # REMOVE_NODE of each node, and the last write to each edge.
+        added: dict[NodeKey, Row] = {}
+        removed: dict[NodeKey, int] = {}
+        edges: dict[tuple[NodeKey, NodeKey], Row] = {}
+        for change in changes:
+            change_ids.append(change.id)
+            key = (change.name, change.version)
+            if change.operation == ADD_NODE:
+                added[key] = change
+            elif change.operation == REMOVE_NODE:
+                added.pop(key, None)
+                removed[key] = change.id
+            elif change.operation in (ADD_EDGE, REMOVE_EDGE):
+                if change.to_name is not None and change.to_version is not None:
+                    edges[(key, (change.to_name, change.to_version))] = change
+            else:
+                raise ValueError(f"Unknown change operation: {change.operation}")
+
+        def kept(edge: tuple[NodeKey, NodeKey], change: Row) -> bool:
+            # Removing a node also removes the edges added before.
+            return change.operation == ADD_EDGE and all(
+                removed.get(key, 0) < change.id for key in edge
+            )
+
+        def graph_edge(edge: tuple[NodeKey, NodeKey]) -> Optional[tuple[Node, Node]]:
+            from_node = self._index.get(*edge[0])
+            to_node = self._index.get(*edge[1])
+            if from_node is None or to_node is None:
+                return None
+            return from_node, to_node
 
+        for edge, change in edges.items():
+            nodes = graph_edge(edge)
+            if nodes is not None and not kept(edge, change):
+                if self.graph.has_edge(*nodes):
+                    self._remove_graph_edge(*nodes)
+        # A node added back after its removal is replaced too, which drops the
+        # edges it had before.
+        for key in removed:
+            node = self._index.get(*key)
+            if node is not None:
+                self._remove_graph_node(node)
+        for key, change in added.items():
+            if self._index.get(*key) is None:
+                row = (change.ntype, change.name, change.version)
+                (node,) = NodeFactory.create_many([row], properties=self.properties)
+                self._add_graph_node(node)
+        for edge, change in sorted(edges.items(), key=lambda item: item[1].id):
+            nodes = graph_edge(edge)
+            if nodes is None or not kept(edge, change) or self.graph.has_edge(*nodes):
+                continue
+            # Only possible if two writers raced to close a cycle.
+            if self._topological_order.creates_cycle(*nodes):
+                raise ValueError(f"Change {change.id} would create a cycle")
+            self._add_graph_edge(*nodes)
+        return change_ids
+
+    def start_sync(self, interval: float) -> None:
+        # Calls sync() every interval seconds from a daemon thread. The graph
+        # should use a scoped_session, as the thread needs its own session.
+        if self._sync_thread is not None:
+            return
+        self._sync_stop.clear()
+        self._sync_thread = threading.Thread(
+            target=self._poll, args=(interval,), name="graph-sync", daemon=True
+        )
+        self._sync_thread.start()
+
+    def stop_sync(self) -> None:
+        if self._sync_thread is None:
+            return
+        self._sync_stop.set()
+        self._sync_thread.join()
+        self._sync_thread = None
+
+    def _poll(self, interval: float) -> None:
+        try:
+            while not self._sync_stop.wait(interval):
+                try:
+                    self.sync()
+                except Exception:
+                    logger.exception("Failed to sync the graph")
+        finally:
+            if isinstance(self.session, scoped_session):
+                self.session.remove()
+
+    @timed
     def add_node(self, node: "Node") -> None:
         if not isinstance(node, Node):
             raise TypeError("Only instances of Node can be added to the graph")
+        with self.lock.write():
+            node = self._index.canonical(node)
+            self._add_graph_node(node)
+            self._add_db_node(node)
+
+    def _add_graph_node(self, node: "Node") -> None:
+        if node not in self.graph:
+            self._touch()
         self.graph.add_node(node, color=node.color)
-        self._add_db_node(node)
+        self._topological_order.add_node(node)
+        self._index.add(node)
+        self._stale.add_node(node)
 
     def _add_db_node(self, node: "Node") -> None:
-        db_node = NodeModel(
-            ntype=node.ntype,
-            name=node.name,
-            version=node.version,
-            properties=node.properties,
-        )
-        self.session.add(db_node)  # add the node to the database
-        self.session.commit()
+        self._writes.add_node(node)
+        self._flush_writes()
+
+    @timed
+    def add_nodes(self, nodes: Iterable["Node"]) -> None:
+        with self.batch():
+            for node in nodes:
+                self.add_node(node)
 
+    @timed
     def remove_node(self, node: "Node") -> None:
         if not isinstance(node, Node):
             raise TypeError("Only instances of Node can be removed from the graph")
-        if node not in self.graph.nodes:
-            return
+        with self.lock.write():
+            if node not in self.graph.nodes:
+                return
+            node = self._index.canonical(node)
+            self._remove_graph_node(node)
+            self._remove_db_node(node)
+
+    @timed
+    def remove_nodes(self, nodes: Iterable["Node"]) -> None:
+        # Removes the nodes and their edges, deleting the rows in one
+        # transaction. Nodes not in the graph are skipped.
+        nodes = list(nodes)
+        if not all(isinstance(node, Node) for node in nodes):
+            raise TypeError("Only instances of Node can be removed from the graph")
+        with self.batch():
+            # Removing versions oldest first keeps the latest version in place
+            # until the end, so the stale index is not recomputed for each of
+            # the newer versions that would otherwise become the latest.
+            removed = sorted(
+                {self._index.canonical(node) for node in nodes if node in self.graph},
+                key=lambda node: (node.name, node.version),
+            )
+            # Fetches the properties of lazily loaded nodes in one query per
+            # chunk rather than one per node.
+            self.properties.prefetch(node for node in removed if node.lazy_properties)
+            for node in removed:
+                self._remove_graph_node(node)
+                self._writes.remove_node(node)
+
+    @timed
+    def remove_all_versions(self, name: str) -> None:
+        with self.batch():
+            self.remove_nodes(self._index.versions(name))
+
+    def _remove_graph_node(self, node: "Node") -> None:
+        # Once its row is deleted, a removed node can no longer load its
+        # properties, so it takes a copy along in case it is added back.
+        if node.lazy_properties:
+            node.properties = node.properties
+            self.properties.discard(node)
+        self._touch()
+        self._closures.invalidate_node(node)
+        self._stale.remove_node(node)
         self.graph.remove_node(node)
-        self._remove_db_node(node)
+        self._topological_order.remove_node(node)
+        self._index.remove(node)
 
     def _remove_db_node(self, node: "Node") -> None:
-        db_node = self._get_db_node(node.name, version=node.version)
-        if db_node is not None:
-            self.session.delete(db_node)
-            self.session.commit()
+        self._writes.remove_node(node)
+        self._flush_writes()
 
+    @timed
     def add_edge(self, from_node: "Node", to_node: "Node") -> None:
         if not all(isinstance(node, Node) for node in (from_node, to_node)):
             raise TypeError("Only instances of Node can be added to the graph")
-        if self.is_cyclic_with_edge(from_node, to_node):
-            raise ValueError("Adding this edge would create a cycle")
+        with self.lock.write():
+            from_node = self._index.canonical(from_node)
+            to_node = self._index.canonical(to_node)
+            if self.is_cyclic_with_edge(from_node, to_node):
+                raise ValueError("Adding this edge would create a cycle")
 
-        # This check ensures that the nodes are in the graph before adding the edge.
-        for node in (from_node, to_node):
-            if self._get_db_node(node.name, version=node.version) is None:
-                self.add_node(node)
+            # This check ensures the nodes are in the graph before adding the edge.
+            for node in (from_node, to_node):
+                if node not in self.graph:
+                    self._add_graph_node(node)
 
+            self._add_graph_edge(from_node, to_node)
+            self._add_db_edge(from_node, to_node)
+
+    def _add_graph_edge(self, from_node: "Node", to_node: "Node") -> None:
+        if not self.graph.has_edge(from_node, to_node):
+            self._touch()
         self.graph.add_edge(from_node, to_node)
-        self._add_db_edge(from_node, to_node)
+        self._topological_order.add_edge(from_node, to_node)
+        self._closures.invalidate_edge(from_node, to_node)
+        self._stale.add_edge(from_node, to_node)
 
     def _add_db_edge(self, from_node: "Node", to_node: "Node") -> None:
-        db_from_node = self._get_db_node(from_node.name, version=from_node.version)
-        db_to_node = self._get_db_node(to_node.name, version=to_node.version)
+        # Endpoints are queued as well; the flush only inserts missing rows.
+        self._writes.add_node(from_node)
+        self._writes.add_node(to_node)
+        self._writes.add_edge(from_node, to_node)
+        self._flush_writes()
+
+    @timed
+    def add_edges(self, edges: Iterable[tuple["Node", "Node"]]) -> None:
+        edges = list(edges)
+        if not all(isinstance(node, Node) for edge in edges for node in edge):
+            raise TypeError("Only instances of Node can be added to the graph")
 
-        if db_to_node is not None and db_from_node is not None:
-            db_edge = EdgeModel(from_node_id=db_from_node.id, to_node_id=db_to_node.id)
-            self.session.add(db_edge)  # add the edge to the database
-            self.session.commit()
+        with self.lock.write():
+            edges = [
+                (self._index.canonical(from_node), self._index.canonical(to_node))
+                for from_node, to_node in edges
+            ]
+            new_nodes = [
+                node
+                for node in dict.fromkeys(node for edge in edges for node in edge)
+                if node not in self.graph
+            ]
+            new_edges = [
+                edge for edge in dict.fromkeys(edges) if edge not in self.graph.edges
+            ]
+            for node in new_nodes:
+                self._add_graph_node(node)
+            self.graph.add_edges_from(new_edges)
+            self._closures.clear()
+            self._touch()
 
+            # One acyclicity check over the whole batch instead of one per edge.
+            try:
+                self._topological_order.rebuild()
+            except ValueError:
+                self.graph.remove_edges_from(new_edges)
+                for node in new_nodes:
+                    self._remove_graph_node(node)
+                raise ValueError("Adding these edges would create a cycle") from None
+            for from_node, to_node in new_edges:
+                self._stale.add_edge(from_node, to_node)
+
+            with self.batch():
+                for from_node, to_node in edges:
+                    self._add_db_edge(from_node, to_node)
+
+    @timed
     def remove_edge(self, from_node: "Node", to_node: "Node") -> None:
         if not all(isinstance(node, Node) for node in (from_node, to_node)):
             raise TypeError("Only instances of Node can be removed from the graph")
-        if (from_node, to_node) not in self.graph.edges:
-            return
+        with self.lock.write():
+            if (from_node, to_node) not in self.graph.edges:
+                return
+            self._remove_graph_edge(from_node, to_node)
+            self._remove_db_edge(from_node, to_node)
+
+    def _remove_graph_edge(self, from_node: "Node", to_node: "Node") -> None:
+        self._touch()
         self.graph.remove_edge(from_node, to_node)
-        self._remove_db_edge(from_node, to_node)
+        self._closures.invalidate_edge(from_node, to_node)
+        self._stale.remove_edge(from_node, to_node)
 
     def _remove_db_edge(self, from_node: "Node", to_node: "Node") -> None:
-        db_from_node = self._get_db_node(from_node.name, version=from_node.version)
-        db_to_node = self._get_db_node(to_node.name, version=to_node.version)
-
-        if db_to_node is not None and db_from_node is not None:
-            db_edge = self._get_db_edge(db_from_node, db_to_node)
-            if db_edge:
-                self.session.delete(db_edge)
-                self.session.commit()
+        self._writes.remove_edge(from_node, to_node)
+        self._flush_writes()
 
+    @timed
     def is_cyclic_with_edge(self, from_node: "Node", to_node: "Node") -> bool:
-        self.graph.add_edge(from_node, to_node)
-        is_cyclic = not nx.is_directed_acyclic_graph(self.graph)
-        self.graph.remove_edge(from_node, to_node)
-        return is_cyclic
+        with self.lock.read():
+            return self._topological_order.creates_cycle(from_node, to_node)
+
+    @timed
+    def subgraph(
+        self, node: "Node", *, direction: str = "both", depth: Optional[int] = None
+    ) -> nx.DiGraph:
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown direction: {direction}")
+        with self.lock.read():
+            if node not in self.graph:
+                raise KeyError(node)
+            nodes = {node}
+            csr = self._csr_graph()
+            if direction in ("upstream", "both"):
+                if csr is not None:
+                    nodes.update(csr.ancestors(node, depth=depth))
+                else:
+                    nodes.update(self._walk(node, self.graph.predecessors, depth))
+            if direction in ("downstream", "both"):
+                if csr is not None:
+                    nodes.update(csr.descendants(node, depth=depth))
+                else:
+                    nodes.update(self._walk(node, self.graph.successors, depth))
+            return self.graph.subgraph(nodes).copy()
+
+    def _csr_graph(self) -> Optional[CSRGraph]:
+        # The CSRGraph of the current revision, or None for the caller to use
+        # the nx.DiGraph: with the networkx backend, while a rebuild is not yet
+        # due (see CSR_REBUILD_FACTOR), or while another reader rebuilds it.
+        # Callers hold the read lock, so the graph cannot change meanwhile.
+        if self.backend != "csr":
+            return None
+        csr = self._csr
+        if csr is not None and csr[1] == self.revision:
+            return csr[0]
+        if time.monotonic() < self._csr_next_build:
+            return None
+        if not self._csr_lock.acquire(blocking=False):
+            return None
+        try:
+            if self._csr is None or self._csr[1] != self.revision:
+                start = time.monotonic()
+                self._csr = (CSRGraph.from_networkx(self.graph), self.revision)
+                end = time.monotonic()
+                self._csr_next_build = end + CSR_REBUILD_FACTOR * (end - start)
+            return self._csr[0]
+        finally:
+            self._csr_lock.release()
+
+    def _walk(
+        self,
+        node: "Node",
+        neighbours: Callable[["Node"], Iterable["Node"]],
+        depth: Optional[int],
+    ) -> set["Node"]:
+        # Breadth-first search from node, excluding it, at most depth hops out.
+        seen = {node}
+        frontier = [node]
+        level = 0
+        while frontier and (depth is None or level < depth):
+            next_frontier = []
+            for current in frontier:
+                for neighbour in neighbours(current):
+                    if neighbour not in seen:
+                        seen.add(neighbour)
+                        next_frontier.append(neighbour)
+            frontier = next_frontier
+            level += 1
+        seen.discard(node)
+        return seen
+
+    @timed
+    def upstream(
+        self, node: "Node", *, depth: Optional[int] = None
+    ) -> frozenset["Node"]:
+        with self.lock.read():
+            if node not in self.graph:
+                raise KeyError(node)
+            csr = self._csr_graph()
+            if csr is not None:
+                return csr.ancestors(node, depth=depth)
+            if depth is None:
+                return self._closures.ancestors(node)
+            return frozenset(self._walk(node, self.graph.predecessors, depth))
+
+    @timed
+    def downstream(
+        self, node: "Node", *, depth: Optional[int] = None
+    ) -> frozenset["Node"]:
+        with self.lock.read():
+            if node not in self.graph:
+                raise KeyError(node)
+            csr = self._csr_graph()
+            if csr is not None:
+                return csr.descendants(node, depth=depth)
+            if depth is None:
+                return self._closures.descendants(node)
+            return frozenset(self._walk(node, self.graph.successors, depth))
+
+    @timed
+    def latest_dependencies(self, node: "Node") -> dict["Node", "Node"]:
+        # Maps every direct upstream dependency of node to the latest version
+        # of its name, which is the dependency itself when it is up to date.
+        with self.lock.read():
+            if node not in self.graph:
+                raise KeyError(node)
+            return {
+                dependency: self._index.latest(dependency.name) or dependency
+                for dependency in self.graph.predecessors(node)
+            }
 
+    @timed
+    def stale_nodes(self) -> dict["Node", frozenset["Node"]]:
+        # Maps every node built on an outdated version of a dependency to
+        # those dependencies.
+        with self.lock.read():
+            return dict(self._stale.items())
+
+    @timed
+    def rebuild_plan(
+        self, changed_nodes: Iterable["Node"], *, cost: Optional[str] = None
+    ) -> list[list["Node"]]:
+        # Groups the changed nodes and everything downstream of them into
+        # waves: each node comes in the wave after the last of its affected
+        # dependencies, so the nodes of a wave can be rebuilt concurrently.
+        # Within a wave, nodes are ordered by the critical path below them,
+        # longest first, using the numeric `cost` property of each node (0
+        # when missing) or, without `cost`, a cost of 1 per node. Only the
+        # affected cone is visited.
+        with self.lock.read():
+            changed = [self._index.canonical(node) for node in changed_nodes]
+            for node in changed:
+                if node not in self.graph:
+                    raise KeyError(node)
+            # The descendants of a node downstream of another are already in.
+            cone: set[Node] = set()
+            for node in changed:
+                if node not in cone:
+                    cone.update(self.downstream(node))
+            cone.update(changed)
+            order = sorted(cone, key=self._topological_order.position)
+
+            levels: dict[Node, int] = {}
+            for node in order:
+                levels[node] = max(
+                    (
+                        levels[dependency] + 1
+                        for dependency in self.graph.predecessors(node)
+                        if dependency in levels
+                    ),
+                    default=0,
+                )
+
+            if cost is not None:
+                self.prefetch_properties(order)
+            remaining: dict[Node, float] = {}
+            for node in reversed(order):
+                remaining[node] = _node_cost(node, cost) + max(
+                    (remaining[dependent] for dependent in self.graph.successors(node)),
+                    default=0,
+                )
+
+        waves: list[list[Node]] = [
+            [] for _ in range(max(levels.values(), default=-1) + 1)
+        ]
+        for node in order:
+            waves[levels[node]].append(node)
+        for wave in waves:
+            wave.sort(key=lambda node: (-remaining[node], node.name, node.version))
+        return waves
+
+    @timed
+    def topological_sort(self) -> list["Node"]:
+        with self.lock.read():
+            csr = self._csr_graph()
+            if csr is not None:
+                return csr.topological_sort()
+            return sorted(self.graph, key=self._topological_order.position)
+
+    @timed
     def get_node(self, name: str, *, version: int = 1) -> Optional["Node"]:
-        for node in self.graph.nodes:
-            if isinstance(node, Node) and node.name == name and node.version == version:
-                return node
-        return None
+        with self.lock.read():
+            return self._index.get(name, version)
 
+    @timed
     def _get_db_node(self, name: str, *, version: int = 1) -> Optional[NodeModel]:
         return (
             self.session.query(NodeModel).filter_by(name=name, version=version).first()
         )
 
+    @timed
     def _get_db_node_by_id(
         self, node_id: Union[int, Column[int]]
     ) -> Optional[NodeModel]:
         return self.session.query(NodeModel).filter_by(id=node_id).first()
 
+    @timed
     def _get_db_edge(
         self, from_node: NodeModel, to_node: NodeModel
     ) -> Optional[EdgeModel]:
@@ -143,9 +797,122 @@ class Graph:
             .first()
         )
 
+    @timed
     def get_latest_version(self, name: str) -> Optional[Node]:
-        nodes: list[Node] = [node for node in self.graph.nodes if node.name == name]
-        if not nodes:
-            return None
+        with self.lock.read():
+            return self._index.latest(name)
+
+    @timed
+    def get_versions(
+        self, name: str, *, start: Optional[int] = None, end: Optional[int] = None
+    ) -> list[Node]:
+        with self.lock.read():
+            return self._index.versions(name, start=start, end=end)
+
+    @timed
+    def prefetch_properties(self, nodes: Iterable["Node"]) -> None:
+        # Loads the properties of many nodes in a few queries, for callers that
+        # are about to read them all; they are then served from the cache.
+        self.properties.prefetch(node for node in nodes if node.lazy_properties)
+
+    @timed
+    def export(self) -> Iterator[str]:
+        # Streams the graph as NDJSON lines: every node, then every edge, each
+        # sorted by (name, version) so that equal graphs export identically.
+        # Rows are read straight from the database in batches, so memory use
+        # does not grow with the graph and properties skip the cache.
+        node_rows = self.session.execute(
+            select(
+                NodeModel.ntype, NodeModel.name, NodeModel.version, NodeModel.properties
+            )
+            .order_by(NodeModel.name, NodeModel.version)
+            .execution_options(yield_per=LOAD_BATCH_SIZE)
+        )
+        for ntype, name, version, properties in node_rows:
+            yield _json_line(
+                {
+                    "type": "node",
+                    "ntype": ntype,
+                    "name": name,
+                    "version": version,
+                    "properties": properties or {},
+                }
+            )
+
+        from_node, to_node = aliased(NodeModel), aliased(NodeModel)
+        edge_rows = self.session.execute(
+            select(
+                from_node.ntype,
+                from_node.name,
+                from_node.version,
+                to_node.ntype,
+                to_node.name,
+                to_node.version,
+            )
+            .select_from(EdgeModel)
+            .join(from_node, EdgeModel.from_node_id == from_node.id)
+            .join(to_node, EdgeModel.to_node_id == to_node.id)
+            .order_by(from_node.name, from_node.version, to_node.name, to_node.version)
+            .execution_options(yield_per=LOAD_BATCH_SIZE)
+        )
+        for row in edge_rows:
+            yield _json_line(
+                {
+                    "type": "edge",
+                    "upstream": {"ntype": row[0], "name": row[1], "version": row[2]},
+                    "downstream": {"ntype": row[3], "name": row[4], "version": row[5]},
+                }
+            )
+
+    @timed
+    def import_stream(self, lines: Iterable[Union[str, bytes]]) -> None:
+        # Loads lines in the format written by export() (e.g. from an open,
+        # possibly gzipped, file) in a single transaction. Edges are added in
+        # chunks, each with one cycle check; if any line is invalid or closes
+        # a cycle, nothing is imported.
+        with self.batch():
+            edges: list[tuple[Node, Node]] = []
+            for number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                    if item["type"] == "node":
+                        self.add_node(_node_from_json(item))
+                    elif item["type"] == "edge":
+                        edges.append(
+                            (
+                                _node_from_json(item["upstream"]),
+                                _node_from_json(item["downstream"]),
+                            )
+                        )
+                    else:
+                        raise ValueError(f"Unknown item type: {item['type']}")
+                except (KeyError, TypeError, ValueError) as error:
+                    raise ValueError(f"Invalid line {number}: {error}") from error
+                if len(edges) >= IMPORT_BATCH_SIZE:
+                    self.add_edges(edges)
+                    edges = []
+            self.add_edges(edges)
+
+
+def _node_cost(node: Node, cost: Optional[str]) -> float:
+    if cost is None:
+        return 1
+    value = node.properties.get(cost)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return 0
+
+
+def _json_line(item: dict) -> str:
+    return json.dumps(item, separators=(",", ":")) + "\n"
+
 
-        return max(nodes, key=lambda node: node.version)
+def _node_from_json(item: dict) -> Node:
+    return NodeFactory.create(
+        item["ntype"],
+        name=item["name"],
+        version=item.get("version", 1),
+        properties=item.get("properties"),
+    )
@@ -0,0 +1,62 @@
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Optional
+
+
+class ReadWriteLock:
+    """Writer-preferring reader/writer lock.
+
+    Any number of threads may hold the read lock at once, while the write lock
+    is exclusive. Both locks are reentrant, and the thread holding the write
+    lock may also take the read lock. Upgrading a read lock to a write lock is
+    not supported, as two upgrading readers would deadlock.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition(threading.Lock())
+        self._readers: dict[int, int] = {}
+        self._writer: Optional[int] = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        thread_id = threading.get_ident()
+        with self._condition:
+            if self._writer != thread_id and thread_id not in self._readers:
+                while self._writer is not None or self._waiting_writers:
+                    self._condition.wait()
+            self._readers[thread_id] = self._readers.get(thread_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers[thread_id] -= 1
+                if not self._readers[thread_id]:
+                    del self._readers[thread_id]
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        thread_id = threading.get_ident()
+        with self._condition:
+            if self._writer != thread_id:
+                if thread_id in self._readers:
+                    raise RuntimeError("Cannot upgrade a read lock to a write lock")
+                self._waiting_writers += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._condition.wait()
+                finally:
+                    self._waiting_writers -= 1
+                self._writer = thread_id
+            self._writer_depth += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer_depth -= 1
+                if not self._writer_depth:
+                    self._writer = None
+                    self._condition.notify_all()
@@ -0,0 +1,73 @@
+"""Size-bounded LRU mapping.
+
+The closure cache, the property store and the response cache of the app each
+keep their most recently used values within a budget of nodes or bytes; they
+share this bookkeeping.
+"""
+
+from collections import OrderedDict
+from collections.abc import Hashable, Iterator
+from typing import Generic, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class BoundedLRU(Generic[K, V]):
+    """Mapping that drops its least recently used entries once the total size
+    of its values exceeds max_size.
+
+    Sizes are whatever the caller measures values in (bytes, nodes), and are
+    given when a value is stored. Not thread-safe: the caches built on it
+    hold their own locks.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.size = 0
+        self._entries: OrderedDict[K, tuple[V, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def get(self, key: K) -> Optional[V]:
+        # Marks the entry as the most recently used.
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def peek(self, key: K) -> Optional[V]:
+        entry = self._entries.get(key)
+        return None if entry is None else entry[0]
+
+    def put(self, key: K, value: V, size: int) -> None:
+        self.pop(key)
+        # Values larger than the whole budget are not kept.
+        if size > self.max_size:
+            return
+        self._entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_size:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+    def pop(self, key: K) -> Optional[V]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.size -= entry[1]
+        return entry[0]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def items(self) -> Iterator[tuple[K, V]]:
+        # Least recently used first.
+        for key, (value, _) in self._entries.items():
+            yield key, value
@@ -0,0 +1,265 @@
+"""Timing histograms and counters, exported in the Prometheus text format.
+
+Instrumentation is off until enable() is called. While it is off, a timed()
+function costs one global lookup per call, and no SQLAlchemy event listener
+is installed.
+
+Every timed call is recorded under its qualified name (e.g. "Graph.add_edge").
+SQL statements are counted against the outermost timed call running in the
+same thread or task, so an N+1 query pattern shows as a growing ratio of
+graph_sql_queries_total to graph_operation_seconds_count for one operation.
+"""
+
+import contextvars
+import functools
+import inspect
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any, Optional, TypeVar, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds, in seconds, of histogram buckets. They start far below the
+# Prometheus defaults, as most graph operations run in memory.
+BUCKETS = (
+    0.00001,
+    0.00005,
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+)
+
+LabelValues = tuple[str, ...]
+
+ENABLED = False
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield (
+                f"{self.name}{_format_labels(self.labels, labels)} "
+                f"{_format_value(value)}"
+            )
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...],
+        buckets: tuple[float, ...] = BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # Per label values: a count per bucket (not cumulative, the last one
+        # being +Inf), the sum and the count of observations.
+        self._values: dict[LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            state[0][index] += 1
+            state[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return 0 if state is None else sum(state[0])
+
+    def sum(self, *labels: str) -> float:
+        state = self._values.get(labels)
+        return 0.0 if state is None else state[1][0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = sorted(
+                (labels, (list(counts), total[0]))
+                for labels, (counts, total) in self._values.items()
+            )
+        names = (*self.labels, "le")
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket"
+                    f"{_format_labels(names, (*labels, _format_value(bound)))} "
+                    f"{cumulative}"
+                )
+            formatted = _format_labels(self.labels, labels)
+            yield f"{self.name}_sum{formatted} {_format_value(total)}"
+            yield f"{self.name}_count{formatted} {cumulative}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Union[Counter, Histogram]] = {}
+
+    def counter(
+        self, name: str, documentation: str, labels: tuple[str, ...] = ()
+    ) -> Counter:
+        metric = self._metrics.setdefault(name, Counter(name, documentation, labels))
+        if not isinstance(metric, Counter):
+            raise TypeError(f"Metric {name!r} is not a counter")
+        return metric
+
+    def histogram(
+        self, name: str, documentation: str, labels: tuple[str, ...] = ()
+    ) -> Histogram:
+        metric = self._metrics.setdefault(name, Histogram(name, documentation, labels))
+        if not isinstance(metric, Histogram):
+            raise TypeError(f"Metric {name!r} is not a histogram")
+        return metric
+
+    def clear(self) -> None:
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self) -> str:
+        lines = [line for metric in self._metrics.values() for line in metric.collect()]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+OPERATION_SECONDS = REGISTRY.histogram(
+    "graph_operation_seconds",
+    "Duration of graph operations and database helpers.",
+    ("operation",),
+)
+SQL_QUERIES = REGISTRY.counter(
+    "graph_sql_queries_total",
+    "SQL statements executed, by the outermost operation running them.",
+    ("operation",),
+)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Duration of HTTP requests, by route.",
+    ("method", "route", "status"),
+)
+
+# The outermost timed operation of the current thread or task.
+_operation: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "operation", default=None
+)
+
+
+def _count_query(*args: Any) -> None:
+    SQL_QUERIES.inc(_operation.get() or "none")
+
+
+def enable() -> None:
+    global ENABLED
+    if not ENABLED:
+        event.listen(Engine, "before_cursor_execute", _count_query)
+        ENABLED = True
+
+
+def disable() -> None:
+    global ENABLED
+    if ENABLED:
+        event.remove(Engine, "before_cursor_execute", _count_query)
+        ENABLED = False
+
+
+def timed(func: F) -> F:
+    name = func.__qualname__
+
+    if inspect.isgeneratorfunction(func):
+        # Times the whole iteration. Queries run between items are counted
+        # against whatever the consumer is doing, as the generator may be
+        # suspended anywhere.
+        @functools.wraps(func)
+        def generator_wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not ENABLED:
+                return (yield from func(*args, **kwargs))
+            start = time.perf_counter()
+            try:
+                return (yield from func(*args, **kwargs))
+            finally:
+                OPERATION_SECONDS.observe(time.perf_counter() - start, name)
+
+        return generator_wrapper  # type: ignore[return-value]
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not ENABLED:
+            return func(*args, **kwargs)
+        token = _operation.set(name) if _operation.get() is None else None
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            OPERATION_SECONDS.observe(time.perf_counter() - start, name)
+            if token is not None:
+                _operation.reset(token)
+
+    return wrapper  # type: ignore[return-value]
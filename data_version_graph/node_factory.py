@@ -1,16 +1,47 @@
+import threading
+from collections.abc import Iterable, Iterator, Sequence
+from importlib.metadata import entry_points
 from typing import Any, Optional, Union
 
 from sqlalchemy import Column
 
-from data_version_graph.nodes import (
-    BigQueryTable,
-    GoogleCloudStorageObject,
-    Node,
-    PostgresTable,
-)
+from data_version_graph.nodes import NODE_TYPES, Node, PropertyLoader
+
+# Packages providing node types of their own declare them under this group,
+# e.g. `s3 = "my_package.nodes:S3Object"`. Defining the Node subclass is what
+# registers it, so loading the entry point is all discovery has to do.
+ENTRY_POINT_GROUP = "data_version_graph.node_types"
+
+_discovery_lock = threading.Lock()
+_discovered = False
+
+
+def discover_node_types() -> None:
+    global _discovered
+    with _discovery_lock:
+        if _discovered:
+            return
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            node_class = entry_point.load()
+            if not (isinstance(node_class, type) and issubclass(node_class, Node)):
+                raise TypeError(
+                    f"Entry point {entry_point.name!r} is not a subclass of Node"
+                )
+        _discovered = True
 
 
 class NodeFactory:
+    @staticmethod
+    def node_class(node_type: Union[str, Column[str]]) -> type[Node]:
+        node_class = NODE_TYPES.get(node_type)  # type: ignore[arg-type]
+        if node_class is None:
+            # Unknown types may come from a package that is not imported yet.
+            discover_node_types()
+            node_class = NODE_TYPES.get(node_type)  # type: ignore[arg-type]
+            if node_class is None:
+                raise ValueError(f"Unknown node type: {node_type}")
+        return node_class
+
     @staticmethod
     def create(
         node_type: Union[str, Column[str]],
@@ -19,17 +50,34 @@ class NodeFactory:
         version: Union[int, Column[int]] = 1,
         properties: Optional[dict[str, Any]] = None,
     ) -> Node:
-        properties = {} if properties is None else properties
-
-        if node_type == "Node":
-            return Node(name, version=version)
-        elif node_type == "BigQueryTable":
-            return BigQueryTable(name, version=version, properties=properties)
-        elif node_type == "PostgresTable":
-            return PostgresTable(name, version=version, properties=properties)
-        elif node_type == "GoogleCloudStorageObject":
-            return GoogleCloudStorageObject(
-                name, version=version, properties=properties
-            )
-        else:
-            raise ValueError(f"Unknown node type: {node_type}")
+        node = NodeFactory.node_class(node_type)(name, version)
+        # Assigned rather than passed as keywords, which would clash with
+        # properties called "name" or "version".
+        if properties:
+            node.properties = dict(properties)
+        return node
+
+    @staticmethod
+    def create_many(
+        rows: Iterable[Sequence[Any]],
+        *,
+        properties: Optional[PropertyLoader] = None,
+    ) -> Iterator[Node]:
+        # Rows are (ntype, name, version) or (ntype, name, version, properties)
+        # tuples, as read from the nodes table. Classes are resolved once per
+        # ntype and nodes are built positionally.
+        # Nodes built from 3-tuples load their properties from `properties`.
+        node_classes: dict[Any, type[Node]] = {}
+        for row in rows:
+            node_class = node_classes.get(row[0])
+            if node_class is None:
+                node_class = node_classes[row[0]] = NodeFactory.node_class(row[0])
+            node = node_class(row[1], row[2])
+            if len(row) > 3:
+                if row[3]:
+                    node.properties = dict(row[3])
+            elif properties is not None:
+                # The setter takes loaders, which older mypy cannot tell from
+                # the getter's type.
+                node.properties = properties  # type: ignore[assignment, unused-ignore]
+            yield node
@@ -0,0 +1,79 @@
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Iterable
+from typing import Optional
+
+from data_version_graph.nodes import Node
+
+
+class NodeIndex:
+    """In-memory (name, version) index over the nodes of a Graph.
+
+    Versions are kept sorted per name, so the latest version is the last entry
+    and version ranges are resolved with a bisection.
+    """
+
+    def __init__(self, nodes: Iterable[Node] = ()) -> None:
+        self._nodes: dict[tuple[str, int], Node] = {}
+        self._versions: dict[str, list[int]] = {}
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node: object) -> bool:
+        if not isinstance(node, Node):
+            return False
+        return (node.name, node.version) in self._nodes
+
+    def add(self, node: Node) -> None:
+        key = (node.name, node.version)
+        if key in self._nodes:
+            return
+        self._nodes[key] = node
+        insort(self._versions.setdefault(node.name, []), node.version)
+
+    def remove(self, node: Node) -> None:
+        key = (node.name, node.version)
+        indexed = self._nodes.get(key)
+        if indexed is None or indexed.ntype != node.ntype:
+            return
+        del self._nodes[key]
+
+        versions = self._versions[node.name]
+        del versions[bisect_left(versions, node.version)]
+        if not versions:
+            del self._versions[node.name]
+
+    def canonical(self, node: Node) -> Node:
+        # The indexed node stands in for any equal node of the same type, so
+        # that the graph keeps one object per (ntype, name, version).
+        indexed = self._nodes.get((node.name, node.version))
+        if indexed is None or indexed.ntype != node.ntype:
+            return node
+        return indexed
+
+    def get(self, name: str, version: int) -> Optional[Node]:
+        return self._nodes.get((name, version))
+
+    def latest(self, name: str) -> Optional[Node]:
+        versions = self._versions.get(name)
+        if not versions:
+            return None
+        return self._nodes[(name, versions[-1])]
+
+    def previous(self, name: str, version: int) -> Optional[Node]:
+        # The highest version of name below version, if any.
+        versions = self._versions.get(name, [])
+        position = bisect_left(versions, version)
+        if position == 0:
+            return None
+        return self._nodes[(name, versions[position - 1])]
+
+    def versions(
+        self, name: str, *, start: Optional[int] = None, end: Optional[int] = None
+    ) -> list[Node]:
+        versions = self._versions.get(name, [])
+        low = 0 if start is None else bisect_left(versions, start)
+        high = len(versions) if end is None else bisect_right(versions, end)
+        return [self._nodes[(name, version)] for version in versions[low:high]]
@@ -1,20 +1,71 @@
-from typing import Union
+import sys
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Union
 
 from sqlalchemy import Column
 
+# Shared by every node created without properties, so that large graphs do not
+# allocate an empty dict per node. It is read-only, as it belongs to them all.
+EMPTY_PROPERTIES: Mapping[str, Any] = MappingProxyType({})
+
+# (name, version): what identifies a node in the database.
+NodeKey = tuple[str, int]
+
+
+class PropertyLoader(ABC):
+    """Source of the properties of nodes that are loaded on first access."""
+
+    @abstractmethod
+    def load(self, node: "Node") -> Mapping[str, Any]: ...
+
+
+# Every node class by ntype. Subclasses of Node register themselves when they
+# are defined, so new storage types need no changes to NodeFactory.
+NODE_TYPES: "dict[str, type[Node]]" = {}
+
 
 class Node:
+    # Nodes are created by the million when a graph is loaded, so they carry
+    # no per-instance __dict__.
+    __slots__ = ("name", "version", "_properties")
+
     color = "black"
 
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        NODE_TYPES[cls.__name__] = cls
+
     def __init__(
         self,
         name: Union[str, Column[str]],
         version: Union[int, Column[int]] = 1,
         **properties,
     ) -> None:
-        self.name = str(name)
+        # Every version of a table repeats its name, so names are interned.
+        self.name = sys.intern(str(name))
         self.version = int(version)
-        self.properties = properties
+        self._properties: Union[Mapping[str, Any], PropertyLoader] = (
+            properties or EMPTY_PROPERTIES
+        )
+
+    @property
+    def properties(self) -> Mapping[str, Any]:
+        # Nodes read from the database share a PropertyLoader instead of their
+        # properties, which are only fetched when they are asked for.
+        properties = self._properties
+        if isinstance(properties, PropertyLoader):
+            return properties.load(self)
+        return properties
+
+    @properties.setter
+    def properties(self, properties: Union[Mapping[str, Any], PropertyLoader]) -> None:
+        self._properties = properties
+
+    @property
+    def lazy_properties(self) -> bool:
+        return isinstance(self._properties, PropertyLoader)
 
     @property
     def ntype(self) -> str:
@@ -34,13 +85,22 @@ class Node:
         return hash((self.__class__.__name__, self.name, self.version))
 
 
+NODE_TYPES[Node.__name__] = Node
+
+
 class BigQueryTable(Node):
+    __slots__ = ()
+
     color = "#4285F4"
 
 
 class PostgresTable(Node):
+    __slots__ = ()
+
     color = "#0064a5"
 
 
 class GoogleCloudStorageObject(Node):
+    __slots__ = ()
+
     color = "#DB4437"
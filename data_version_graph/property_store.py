@@ -0,0 +1,128 @@
+import json
+import threading
+from collections.abc import Iterable, Mapping
+from types import MappingProxyType
+from typing import Any, Union
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, scoped_session
+
+from data_version_graph.database import NodeModel, chunks, matching_pairs
+from data_version_graph.lru import BoundedLRU
+from data_version_graph.metrics import timed
+from data_version_graph.nodes import EMPTY_PROPERTIES, Node, NodeKey, PropertyLoader
+
+# Default budget of the properties cache, in bytes of serialized JSON.
+PROPERTIES_CACHE_BYTES = 64 * 1024 * 1024
+
+# Approximate memory held by a cache entry besides its value, so that entries
+# of nodes without properties still count against the budget.
+CACHE_ENTRY_BYTES = 100
+
+# Upper bound on the number of nodes matched by a single query.
+PREFETCH_CHUNK_SIZE = 250
+
+
+def _size(properties: Union[dict[str, Any], None]) -> int:
+    # The serialized size is a stable, cheap stand-in for the memory a value
+    # holds, and is what the database returned for it in the first place.
+    if not properties:
+        return CACHE_ENTRY_BYTES
+    return CACHE_ENTRY_BYTES + len(
+        json.dumps(properties, separators=(",", ":"), default=str)
+    )
+
+
+class PropertyStore(PropertyLoader):
+    """Loads node properties from the database on first access.
+
+    Fetched properties are kept in an LRU cache bounded by their serialized
+    size, so a few nodes with large blobs cannot pin the memory of a graph.
+    Values are returned read-only, as they are shared by every caller.
+    """
+
+    def __init__(
+        self,
+        session: Union[Session, scoped_session],
+        *,
+        max_bytes: int = PROPERTIES_CACHE_BYTES,
+    ) -> None:
+        self.session = session
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._cache: BoundedLRU[NodeKey, Mapping[str, Any]] = BoundedLRU(max_bytes)
+
+    @property
+    def max_bytes(self) -> int:
+        return self._cache.max_size
+
+    @property
+    def size(self) -> int:
+        return self._cache.size
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def __contains__(self, node: object) -> bool:
+        if not isinstance(node, Node):
+            return False
+        return (node.name, node.version) in self._cache
+
+    @timed
+    def load(self, node: Node) -> Mapping[str, Any]:
+        key = (node.name, node.version)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        properties = self.session.execute(
+            select(NodeModel.properties).where(
+                NodeModel.name == node.name, NodeModel.version == node.version
+            )
+        ).scalar()
+        return self._store(key, properties)
+
+    @timed
+    def prefetch(self, nodes: Iterable[Node]) -> None:
+        with self._lock:
+            wanted = {
+                (node.name, node.version)
+                for node in nodes
+                if (node.name, node.version) not in self._cache
+            }
+        for chunk in chunks(sorted(wanted), PREFETCH_CHUNK_SIZE):
+            rows = self.session.execute(
+                select(NodeModel.name, NodeModel.version, NodeModel.properties).where(
+                    matching_pairs((NodeModel.name, NodeModel.version), chunk)
+                )
+            )
+            for name, version, properties in rows:
+                self._store((name, version), properties)
+
+    def put(
+        self, node: Node, properties: Union[dict[str, Any], None]
+    ) -> Mapping[str, Any]:
+        # Caches properties the caller fetched itself, e.g. asynchronously.
+        return self._store((node.name, node.version), properties)
+
+    def discard(self, node: Node) -> None:
+        with self._lock:
+            self._cache.pop((node.name, node.version))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def _store(
+        self, key: NodeKey, properties: Union[dict[str, Any], None]
+    ) -> Mapping[str, Any]:
+        value = MappingProxyType(properties) if properties else EMPTY_PROPERTIES
+        size = _size(properties)
+        with self._lock:
+            # Values larger than the whole budget are returned but not kept.
+            self._cache.put(key, value, size)
+        return value
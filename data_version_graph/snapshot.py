@@ -0,0 +1,306 @@
+"""Binary snapshots of the graph tables, for fast start-up.
+
+A snapshot holds the nodes and edges of the database, as of its high-water
+marks (the largest node and edge ids it contains, and the last entry of the
+change log), in flat arrays:
+
+* nodes, sorted by id: their ids, versions, ntypes (as indexes into a short
+  list of type names) and names (as indexes into a string table);
+* edges, as CSR adjacency: the successors of the node at position i are the
+  positions indices[indptr[i]:indptr[i + 1]].
+
+Snapshots are memory-mapped read-only, so the arrays are never copied and
+processes loading the same file share its pages.
+
+Usage:
+    python -m data_version_graph.snapshot DATABASE_URL PATH
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterator
+from typing import Any, Optional, Union
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, scoped_session
+
+from data_version_graph.array_layout import Section, layout, views
+from data_version_graph.database import (
+    ChangeModel,
+    EdgeModel,
+    NodeModel,
+    create_database,
+)
+from data_version_graph.write_buffer import REMOVE_EDGE, REMOVE_NODE
+
+MAGIC = b"DVGSNAP1"
+FORMAT_VERSION = 2
+
+_HEADER_LENGTH = struct.Struct("<Q")
+
+# Array sections in file order, with their array typecodes.
+SECTIONS: tuple[Section, ...] = (
+    ("node_ids", "q"),
+    ("node_versions", "q"),
+    ("node_ntypes", "H"),
+    ("node_names", "I"),
+    ("name_offsets", "Q"),
+    ("names", "B"),
+    ("indptr", "Q"),
+    ("indices", "I"),
+)
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def write_snapshot(session: Union[Session, scoped_session], path: str) -> None:
+    # Nodes and edges are read by separate statements, which under READ
+    # COMMITTED see different states of the database. So edges stop short of
+    # the first one to a node newer than those read, which keeps every row up
+    # to the high-water marks in the snapshot (or deleted since, which
+    # is_current() notices); loading it picks up the rest. The file is
+    # replaced atomically.
+    node_ids = array("q")
+    node_versions = array("q")
+    node_ntypes = array("H")
+    node_names = array("I")
+    ntypes: dict[str, int] = {}
+    names: dict[str, int] = {}
+    max_change_id = session.execute(select(func.max(ChangeModel.id))).scalar()
+    rows = session.execute(
+        select(NodeModel.id, NodeModel.ntype, NodeModel.name, NodeModel.version)
+        .order_by(NodeModel.id)
+        .execution_options(yield_per=10_000)
+    )
+    for node_id, ntype, name, version in rows:
+        node_ids.append(node_id)
+        node_versions.append(version)
+        node_ntypes.append(ntypes.setdefault(ntype, len(ntypes)))
+        node_names.append(names.setdefault(name, len(names)))
+
+    max_node_id = node_ids[-1] if node_ids else 0
+    positions = {node_id: position for position, node_id in enumerate(node_ids)}
+    successors: list[list[int]] = [[] for _ in node_ids]
+    max_edge_id = 0
+    n_edges = 0
+    n_edge_rows = 0
+    rows = session.execute(
+        select(EdgeModel.id, EdgeModel.from_node_id, EdgeModel.to_node_id)
+        .order_by(EdgeModel.id)
+        .execution_options(yield_per=10_000)
+    )
+    for edge_id, from_id, to_id in rows:
+        if max(from_id, to_id) > max_node_id:
+            break
+        max_edge_id = edge_id
+        n_edge_rows += 1
+        # Edges whose endpoints no longer exist are skipped, as on a load.
+        if from_id in positions and to_id in positions:
+            successors[positions[from_id]].append(positions[to_id])
+            n_edges += 1
+    session.rollback()
+
+    indptr = array("Q", [0])
+    indices = array("I")
+    for targets in successors:
+        indices.extend(sorted(targets))
+        indptr.append(len(indices))
+
+    encoded = [name.encode("utf-8") for name in names]
+    name_offsets = array("Q", [0])
+    for encoded_name in encoded:
+        name_offsets.append(name_offsets[-1] + len(encoded_name))
+
+    sections = {
+        "node_ids": node_ids,
+        "node_versions": node_versions,
+        "node_ntypes": node_ntypes,
+        "node_names": node_names,
+        "name_offsets": name_offsets,
+        "names": array("B", b"".join(encoded)),
+        "indptr": indptr,
+        "indices": indices,
+    }
+    header = {
+        "format": FORMAT_VERSION,
+        "nodes": len(node_ids),
+        "edges": n_edges,
+        "names": len(names),
+        "edge_rows": n_edge_rows,
+        "max_node_id": max_node_id,
+        "max_edge_id": max_edge_id,
+        "max_change_id": max_change_id or 0,
+        "ntypes": list(ntypes),
+        "byteorder": sys.byteorder,
+    }
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        encoded_header = json.dumps(header).encode()
+        file.write(MAGIC)
+        file.write(_HEADER_LENGTH.pack(len(encoded_header)))
+        file.write(encoded_header)
+        lengths = {name: len(values) for name, values in sections.items()}
+        for name, _, start, _ in layout(SECTIONS, lengths.__getitem__, file.tell()):
+            file.write(b"\0" * (start - file.tell()))
+            file.write(sections[name].tobytes())
+    os.replace(tmp_path, path)
+
+
+class Snapshot:
+    """A memory-mapped snapshot file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse()
+        except Exception:
+            self.close()
+            raise
+
+    def _parse(self) -> None:
+        self._view = view = memoryview(self._mmap)
+        if view[: len(MAGIC)] != MAGIC:
+            raise SnapshotError(f"Not a graph snapshot: {self.path}")
+        offset = len(MAGIC)
+        (length,) = _HEADER_LENGTH.unpack_from(view, offset)
+        offset += _HEADER_LENGTH.size
+        self.header: dict[str, Any] = json.loads(bytes(view[offset : offset + length]))
+        offset += length
+        if self.header.get("format") != FORMAT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot format: {self.header}")
+        if self.header["byteorder"] != sys.byteorder:
+            raise SnapshotError("Snapshot was written on another byte order")
+
+        n_nodes = self.header["nodes"]
+        lengths: dict[str, int] = {
+            "node_ids": n_nodes,
+            "node_versions": n_nodes,
+            "node_ntypes": n_nodes,
+            "node_names": n_nodes,
+            "name_offsets": self.header["names"] + 1,
+            "indptr": n_nodes + 1,
+            "indices": self.header["edges"],
+        }
+
+        def section_length(name: str) -> int:
+            # The names blob ends where the last name does.
+            if name == "names":
+                return int(self.arrays["name_offsets"][-1])
+            return lengths[name]
+
+        self.arrays: dict[str, memoryview] = {}
+        try:
+            for name, values in views(view, SECTIONS, section_length, offset):
+                self.arrays[name] = values
+        except IndexError:
+            raise SnapshotError(f"Truncated graph snapshot: {self.path}") from None
+
+    @property
+    def max_node_id(self) -> int:
+        return int(self.header["max_node_id"])
+
+    @property
+    def max_edge_id(self) -> int:
+        return int(self.header["max_edge_id"])
+
+    @property
+    def max_change_id(self) -> int:
+        return int(self.header["max_change_id"])
+
+    def __len__(self) -> int:
+        return int(self.header["nodes"])
+
+    def nodes(self) -> Iterator[tuple[str, str, int]]:
+        # (ntype, name, version) rows in position order, as NodeFactory takes.
+        ntypes = self.header["ntypes"]
+        offsets = self.arrays["name_offsets"]
+        blob = self.arrays["names"]
+        names: list[str] = [
+            bytes(blob[offsets[i] : offsets[i + 1]]).decode("utf-8")
+            for i in range(len(offsets) - 1)
+        ]
+        for ntype, name, version in zip(
+            self.arrays["node_ntypes"],
+            self.arrays["node_names"],
+            self.arrays["node_versions"],
+        ):
+            yield ntypes[ntype], names[name], version
+
+    def edges(self) -> Iterator[tuple[int, int]]:
+        # (from position, to position) pairs.
+        indptr = self.arrays["indptr"]
+        indices = self.arrays["indices"]
+        for position in range(len(indptr) - 1):
+            for target in indices[indptr[position] : indptr[position + 1]]:
+                yield position, target
+
+    def position(self, node_id: int) -> Optional[int]:
+        node_ids = self.arrays["node_ids"]
+        position = bisect_left(node_ids, node_id)
+        if position < len(node_ids) and node_ids[position] == node_id:
+            return position
+        return None
+
+    def is_current(self, session: Union[Session, scoped_session]) -> bool:
+        # The snapshot still describes everything up to its high-water marks
+        # unless some of those rows were deleted since. Removals through a
+        # Graph show in the change log. Other deletes show in the counts of
+        # rows up to the marks, unless rows added since took their ids, which
+        # SQLite reuses.
+        removed = session.execute(
+            select(func.count()).where(
+                ChangeModel.id > self.max_change_id,
+                ChangeModel.operation.in_((REMOVE_NODE, REMOVE_EDGE)),
+            )
+        ).scalar()
+        if removed:
+            return False
+        n_nodes = session.execute(
+            select(func.count()).where(NodeModel.id <= self.max_node_id)
+        ).scalar()
+        n_edges = session.execute(
+            select(func.count()).where(EdgeModel.id <= self.max_edge_id)
+        ).scalar()
+        return n_nodes == len(self) and n_edges == self.header["edge_rows"]
+
+    def close(self) -> None:
+        for values in getattr(self, "arrays", {}).values():
+            values.release()
+        self.arrays = {}
+        if hasattr(self, "_view"):
+            self._view.release()
+        self._mmap.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write a snapshot of a graph database."
+    )
+    parser.add_argument("database_url")
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    session = create_database(args.database_url)()
+    write_snapshot(session, args.path)
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
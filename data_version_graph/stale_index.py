@@ -0,0 +1,78 @@
+import networkx as nx
+
+from data_version_graph.node_index import NodeIndex
+from data_version_graph.nodes import Node
+
+
+class StaleIndex:
+    """Nodes built on an outdated version of one of their dependencies.
+
+    An edge u -> v makes v stale when a newer version of u's name exists. The
+    stale edges are found in one pass over the graph and then kept up to date
+    as nodes and edges change: a new latest version only affects the edges
+    out of the previous latest one, and the other way round on removal.
+    """
+
+    def __init__(self, graph: nx.DiGraph, index: NodeIndex) -> None:
+        self.graph = graph
+        self.index = index
+        self._stale: dict[Node, set[Node]] = {}
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        self._stale = {}
+        for from_node, to_node in self.graph.edges:
+            self.add_edge(from_node, to_node)
+
+    def __len__(self) -> int:
+        return len(self._stale)
+
+    def __contains__(self, node: object) -> bool:
+        return node in self._stale
+
+    def outdated(self, node: Node) -> frozenset[Node]:
+        # The dependencies of node that have a newer version.
+        return frozenset(self._stale.get(node, ()))
+
+    def items(self) -> list[tuple[Node, frozenset[Node]]]:
+        return [(node, frozenset(outdated)) for node, outdated in self._stale.items()]
+
+    def is_outdated(self, node: Node) -> bool:
+        latest = self.index.latest(node.name)
+        return latest is not None and latest.version > node.version
+
+    def add_edge(self, from_node: Node, to_node: Node) -> None:
+        if self.is_outdated(from_node):
+            self._stale.setdefault(to_node, set()).add(from_node)
+
+    def remove_edge(self, from_node: Node, to_node: Node) -> None:
+        outdated = self._stale.get(to_node)
+        if outdated is not None:
+            outdated.discard(from_node)
+            if not outdated:
+                del self._stale[to_node]
+
+    def add_node(self, node: Node) -> None:
+        # Called once node is indexed. If it is the new latest version, the
+        # dependants of the version it supersedes are now stale.
+        if self.index.latest(node.name) is not node:
+            return
+        previous = self.index.previous(node.name, node.version)
+        if previous is not None and previous in self.graph:
+            for successor in self.graph.successors(previous):
+                self._stale.setdefault(successor, set()).add(previous)
+
+    def remove_node(self, node: Node) -> None:
+        # Called while node is still in the graph and the index.
+        self._stale.pop(node, None)
+        if node not in self.graph:
+            return
+        for successor in self.graph.successors(node):
+            self.remove_edge(node, successor)
+        # Removing the latest version makes the previous one the latest, so
+        # its dependants are no longer stale.
+        if self.index.latest(node.name) is node:
+            previous = self.index.previous(node.name, node.version)
+            if previous is not None and previous in self.graph:
+                for successor in self.graph.successors(previous):
+                    self.remove_edge(previous, successor)
@@ -0,0 +1,103 @@
+from collections.abc import Callable, Hashable, Iterable
+
+import networkx as nx
+
+
+class TopologicalOrder:
+    """Online topological order of a DAG (Pearce & Kelly, 2006).
+
+    Every node is given an integer position such that each edge points from a
+    lower to a higher position. Inserting an edge only inspects and reorders
+    the nodes whose positions lie between its endpoints, so cycle checks no
+    longer need a traversal of the whole graph.
+    """
+
+    def __init__(self, graph: nx.DiGraph) -> None:
+        self.graph = graph
+        self._position: dict[Hashable, int] = {}
+        self._next_position = 0
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        try:
+            order = list(nx.topological_sort(self.graph))
+        except nx.NetworkXUnfeasible:
+            raise ValueError("The graph contains a cycle") from None
+        self._position = {node: position for position, node in enumerate(order)}
+        self._next_position = len(order)
+
+    def __contains__(self, node: Hashable) -> bool:
+        return node in self._position
+
+    def position(self, node: Hashable) -> int:
+        return self._position[node]
+
+    def add_node(self, node: Hashable) -> None:
+        if node not in self._position:
+            self._position[node] = self._next_position
+            self._next_position += 1
+
+    def remove_node(self, node: Hashable) -> None:
+        self._position.pop(node, None)
+
+    def creates_cycle(self, from_node: Hashable, to_node: Hashable) -> bool:
+        if len({from_node, to_node}) == 1:
+            return True
+        if from_node not in self._position or to_node not in self._position:
+            return False
+
+        upper_bound = self._position[from_node]
+        if self._position[to_node] > upper_bound:
+            return False
+        return from_node in self._forward(to_node, upper_bound)
+
+    def add_edge(self, from_node: Hashable, to_node: Hashable) -> None:
+        # The caller must already have checked creates_cycle for this edge.
+        self.add_node(from_node)
+        self.add_node(to_node)
+
+        lower_bound = self._position[to_node]
+        upper_bound = self._position[from_node]
+        if lower_bound > upper_bound:
+            return
+
+        forward = self._forward(to_node, upper_bound)
+        backward = self._backward(from_node, lower_bound)
+        self._reorder(backward, forward)
+
+    def _forward(self, start: Hashable, upper_bound: int) -> list[Hashable]:
+        # Nodes reachable from start that are not already after upper_bound.
+        return self._search(start, self.graph.successors, lambda p: p <= upper_bound)
+
+    def _backward(self, start: Hashable, lower_bound: int) -> list[Hashable]:
+        # Nodes that reach start and are not already before lower_bound.
+        return self._search(start, self.graph.predecessors, lambda p: p >= lower_bound)
+
+    def _search(
+        self,
+        start: Hashable,
+        neighbours: Callable[[Hashable], Iterable[Hashable]],
+        in_window: Callable[[int], bool],
+    ) -> list[Hashable]:
+        visited = {start}
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            if node not in self.graph:
+                continue
+            for neighbour in neighbours(node):
+                if neighbour not in visited and in_window(self._position[neighbour]):
+                    visited.add(neighbour)
+                    stack.append(neighbour)
+        return list(visited)
+
+    def _reorder(
+        self, backward: Iterable[Hashable], forward: Iterable[Hashable]
+    ) -> None:
+        # Everything that reaches from_node moves ahead of everything that is
+        # reachable from to_node, reusing the positions the two sets occupied.
+        backward = sorted(backward, key=self._position.__getitem__)
+        forward = sorted(forward, key=self._position.__getitem__)
+        positions = sorted(self._position[node] for node in (*backward, *forward))
+        for node, position in zip((*backward, *forward), positions):
+            self._position[node] = position
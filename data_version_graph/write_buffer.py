@@ -0,0 +1,308 @@
+from collections.abc import Iterable
+from typing import Any, Optional, Union
+
+from sqlalchemy import (
+    Select,
+    and_,
+    bindparam,
+    delete,
+    insert,
+    or_,
+    select,
+)
+from sqlalchemy.orm import Session, scoped_session
+
+from data_version_graph.database import (
+    ChangeModel,
+    EdgeModel,
+    NodeModel,
+    chunks,
+    insert_ignoring_duplicates,
+    matching_pairs,
+)
+from data_version_graph.metrics import timed
+from data_version_graph.nodes import Node, NodeKey
+
+# Upper bound on the number of values bound into a single IN clause.
+FLUSH_CHUNK_SIZE = 500
+
+# Operations recorded in the change log.
+ADD_NODE = "add_node"
+REMOVE_NODE = "remove_node"
+ADD_EDGE = "add_edge"
+REMOVE_EDGE = "remove_edge"
+
+
+def _key(node: Node) -> NodeKey:
+    return (node.name, node.version)
+
+
+def _change(
+    operation: str,
+    key: NodeKey,
+    to_key: Optional[NodeKey] = None,
+    *,
+    ntype: Optional[str] = None,
+) -> dict[str, Any]:
+    # Change log row; every row has every column, as executemany requires.
+    return {
+        "operation": operation,
+        "ntype": ntype,
+        "name": key[0],
+        "version": key[1],
+        "to_name": None if to_key is None else to_key[0],
+        "to_version": None if to_key is None else to_key[1],
+    }
+
+
+def _dialect_name(session: Union[Session, scoped_session]) -> str:
+    return session.get_bind().dialect.name
+
+
+def _node_ids_matching(prefix: str) -> Select[Any]:
+    return select(NodeModel.id).where(
+        NodeModel.name == bindparam(f"{prefix}_name"),
+        NodeModel.version == bindparam(f"{prefix}_version"),
+    )
+
+
+class WriteBuffer:
+    """Pending database writes of a Graph, flushed in a single transaction.
+
+    Deletes are applied before inserts, so removing and re-adding a node or an
+    edge within one flush leaves it in place. Removing a node also deletes the
+    edges to and from it. Inserts skip rows that already
+    exist, using INSERT ... ON CONFLICT DO NOTHING where the dialect has it.
+    Every flush appends its writes, in the order applied, to the change log in
+    the same transaction.
+    """
+
+    def __init__(self) -> None:
+        self._nodes_to_add: dict[NodeKey, Node] = {}
+        self._nodes_to_remove: dict[NodeKey, Node] = {}
+        self._edges_to_add: dict[tuple[NodeKey, NodeKey], None] = {}
+        self._edges_to_remove: dict[tuple[NodeKey, NodeKey], None] = {}
+
+    def __bool__(self) -> bool:
+        return bool(
+            self._nodes_to_add
+            or self._nodes_to_remove
+            or self._edges_to_add
+            or self._edges_to_remove
+        )
+
+    def clear(self) -> None:
+        self._nodes_to_add.clear()
+        self._nodes_to_remove.clear()
+        self._edges_to_add.clear()
+        self._edges_to_remove.clear()
+
+    def add_node(self, node: Node) -> None:
+        self._nodes_to_add.setdefault(_key(node), node)
+
+    def remove_node(self, node: Node) -> None:
+        self._nodes_to_add.pop(_key(node), None)
+        self._nodes_to_remove[_key(node)] = node
+
+    def add_edge(self, from_node: Node, to_node: Node) -> None:
+        self._edges_to_add[(_key(from_node), _key(to_node))] = None
+
+    def remove_edge(self, from_node: Node, to_node: Node) -> None:
+        edge = (_key(from_node), _key(to_node))
+        self._edges_to_add.pop(edge, None)
+        self._edges_to_remove[edge] = None
+
+    @timed
+    def flush(self, session: Union[Session, scoped_session]) -> list[int]:
+        # Returns the ids of the change log entries written, so that the
+        # caller can tell its own entries from those of other writers.
+        try:
+            self._delete_edges(session)
+            self._delete_nodes(session)
+            node_ids, nodes = self._insert_nodes(session)
+            edges = self._insert_edges(session, node_ids)
+            change_ids = self._log_changes(session, nodes, edges)
+            session.commit()
+            return change_ids
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.clear()
+
+    def _delete_edges(self, session: Union[Session, scoped_session]) -> None:
+        if not self._edges_to_remove:
+            return
+
+        statement = delete(EdgeModel.__table__).where(
+            and_(
+                EdgeModel.from_node_id.in_(_node_ids_matching("from")),
+                EdgeModel.to_node_id.in_(_node_ids_matching("to")),
+            )
+        )
+        session.execute(
+            statement,
+            [
+                {
+                    "from_name": from_key[0],
+                    "from_version": from_key[1],
+                    "to_name": to_key[0],
+                    "to_version": to_key[1],
+                }
+                for from_key, to_key in self._edges_to_remove
+            ],
+        )
+
+    def _delete_nodes(self, session: Union[Session, scoped_session]) -> None:
+        # A node takes its incident edges along, which are deleted first so
+        # that no edge row is left pointing at a missing node (or violates the
+        # foreign keys, where they are enforced). Both deletes are set based:
+        # one statement per chunk of node ids.
+        if not self._nodes_to_remove:
+            return
+
+        node_ids = sorted(select_node_ids(session, self._nodes_to_remove).values())
+        for chunk in chunks(node_ids, FLUSH_CHUNK_SIZE):
+            session.execute(
+                delete(EdgeModel.__table__).where(
+                    or_(
+                        EdgeModel.from_node_id.in_(chunk),
+                        EdgeModel.to_node_id.in_(chunk),
+                    )
+                )
+            )
+        for chunk in chunks(node_ids, FLUSH_CHUNK_SIZE):
+            session.execute(delete(NodeModel.__table__).where(NodeModel.id.in_(chunk)))
+
+    def _insert_nodes(
+        self, session: Union[Session, scoped_session]
+    ) -> tuple[dict[NodeKey, int], list[Node]]:
+        # Returns the ids of all the nodes to add, and the nodes actually
+        # inserted. Nodes that already have a row (lazily loaded ones, or the
+        # endpoints of an added edge) are neither inserted nor logged.
+        if not self._nodes_to_add:
+            return {}, []
+
+        node_ids = select_node_ids(session, self._nodes_to_add)
+        nodes = [
+            node for key, node in self._nodes_to_add.items() if key not in node_ids
+        ]
+        if not nodes:
+            return node_ids, []
+
+        # Another writer may insert the same node in the meantime; its row is
+        # skipped where the dialect can.
+        statement = insert_ignoring_duplicates(NodeModel, _dialect_name(session))
+        session.execute(
+            insert(NodeModel) if statement is None else statement,
+            [
+                {
+                    "ntype": node.ntype,
+                    "name": node.name,
+                    "version": node.version,
+                    # A lazily loaded node whose row another writer removed
+                    # comes back without its properties, which are gone.
+                    "properties": (
+                        None if node.lazy_properties else dict(node.properties)
+                    ),
+                }
+                for node in nodes
+            ],
+        )
+        node_ids.update(select_node_ids(session, map(_key, nodes)))
+        return node_ids, nodes
+
+    def _insert_edges(
+        self, session: Union[Session, scoped_session], node_ids: dict[NodeKey, int]
+    ) -> list[tuple[NodeKey, NodeKey]]:
+        # Returns the edges written, which excludes those whose endpoints were
+        # removed within the same flush.
+        if not self._edges_to_add:
+            return []
+
+        endpoints = {key for edge in self._edges_to_add for key in edge}
+        node_ids = {**select_node_ids(session, endpoints - node_ids.keys()), **node_ids}
+
+        edge_keys = [
+            (from_key, to_key)
+            for from_key, to_key in self._edges_to_add
+            if from_key in node_ids and to_key in node_ids
+        ]
+        edges = list(
+            dict.fromkeys(
+                (node_ids[from_key], node_ids[to_key]) for from_key, to_key in edge_keys
+            )
+        )
+        statement = insert_ignoring_duplicates(EdgeModel, _dialect_name(session))
+        if statement is None:
+            existing = select_edge_ids(session, edges)
+            edges = [edge for edge in edges if edge not in existing]
+            statement = insert(EdgeModel)
+        if edges:
+            session.execute(
+                statement,
+                [
+                    {"from_node_id": from_id, "to_node_id": to_id}
+                    for from_id, to_id in edges
+                ],
+            )
+        return edge_keys
+
+    def _log_changes(
+        self,
+        session: Union[Session, scoped_session],
+        nodes: list[Node],
+        edges: list[tuple[NodeKey, NodeKey]],
+    ) -> list[int]:
+        # Replaying the log in id order reproduces the tables, so entries are
+        # appended in the order of the writes above. Removals and edges that
+        # turned out to be no-ops are logged too; replaying them is harmless.
+        changes = [
+            _change(REMOVE_EDGE, from_key, to_key)
+            for from_key, to_key in self._edges_to_remove
+        ]
+        changes.extend(_change(REMOVE_NODE, key) for key in self._nodes_to_remove)
+        changes.extend(
+            _change(ADD_NODE, _key(node), ntype=node.ntype) for node in nodes
+        )
+        changes.extend(
+            _change(ADD_EDGE, from_key, to_key) for from_key, to_key in edges
+        )
+        if not changes:
+            return []
+        statement = insert(ChangeModel)
+        if session.get_bind().dialect.insert_executemany_returning:
+            return list(session.scalars(statement.returning(ChangeModel.id), changes))
+        # Without RETURNING for many rows (MySQL), each id is read on its own.
+        connection = session.connection()
+        return [connection.execute(statement, change).lastrowid for change in changes]
+
+
+def select_node_ids(
+    session: Union[Session, scoped_session], keys: Iterable[NodeKey]
+) -> dict[NodeKey, int]:
+    node_ids: dict[NodeKey, int] = {}
+    # Two bound values per key.
+    for chunk in chunks(sorted(set(keys)), FLUSH_CHUNK_SIZE // 2):
+        rows = session.execute(
+            select(NodeModel.id, NodeModel.name, NodeModel.version).where(
+                matching_pairs((NodeModel.name, NodeModel.version), chunk)
+            )
+        )
+        for node_id, name, version in rows:
+            node_ids[(name, version)] = node_id
+    return node_ids
+
+
+def select_edge_ids(
+    session: Union[Session, scoped_session], edges: Iterable[tuple[int, int]]
+) -> set[tuple[int, int]]:
+    existing: set[tuple[int, int]] = set()
+    for chunk in chunks(sorted(set(edges)), FLUSH_CHUNK_SIZE // 2):
+        rows = session.execute(
+            select(EdgeModel.from_node_id, EdgeModel.to_node_id).where(
+                matching_pairs((EdgeModel.from_node_id, EdgeModel.to_node_id), chunk)
+            )
+        )
+        existing.update((from_id, to_id) for from_id, to_id in rows)
+    return existing
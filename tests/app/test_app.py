@@ -1,8 +1,15 @@
+import gzip
+import json
 import os
+import threading
 
+from sqlalchemy.orm import scoped_session
+
+from data_version_graph import metrics
 from data_version_graph.app import app as flask_app
 from data_version_graph.database import create_database
 from data_version_graph.graph import Graph
+from data_version_graph.nodes import Node
 
 
 class TestFlaskApp:
@@ -29,11 +36,41 @@ class TestFlaskApp:
 
     def test_refresh_graph(self) -> None:
         response = self.app.post("/refresh-graph")
-        assert response.status_code == 302  # Redirect after updating Graph.
+        assert response.status_code == 202  # Rendering runs in the background.
+        job_id = response.json["job_id"]
+        assert response.json["status_url"] == f"/refresh-graph/{job_id}"
+
+        # duplicate requests for the same revision share the job.
+        response = self.app.post("/refresh-graph")
+        assert response.status_code in (202, 302)
+        if response.status_code == 202:
+            assert response.json["job_id"] == job_id
 
-        graph_path = os.path.join(flask_app.app.static_folder, "images/graph.png")
+        flask_app.get_renderer()._jobs[job_id].result(timeout=30)
+        response = self.app.get(f"/refresh-graph/{job_id}")
+        assert response.status_code == 200
+        assert response.json["status"] == "done"
+        assert response.json["url"] == f"/static/images/graph-{job_id}.png"
+
+        graph_path = os.path.join(
+            flask_app.app.static_folder, f"images/graph-{job_id}.png"
+        )
         assert os.path.exists(graph_path)
 
+        # an unchanged graph is served from the cached image.
+        response = self.app.post("/refresh-graph")
+        assert response.status_code == 302  # Redirect after updating Graph.
+        assert f"graph-{job_id}.png".encode() in self.app.get("/").data
+
+        # a changed graph is rendered again.
+        self.app.post("/nodes/add", json={"ntype": "Node", "name": "test"})
+        response = self.app.post("/refresh-graph")
+        assert response.status_code == 202
+        assert response.json["job_id"] != job_id
+
+        response = self.app.get("/refresh-graph/unknown")
+        assert response.status_code == 404
+
     def test_add_and_remove_node(self) -> None:
         # test invalid add request.
         response = self.app.post("/nodes/add", json={"node_name": "test_node"})
@@ -139,3 +176,399 @@ class TestFlaskApp:
         )
         assert response.status_code == 200
         assert b"Edge removed successfully" in response.data
+
+    def test_get_node(self) -> None:
+        self.app.post("/nodes/add", json={"ntype": "PostgresTable", "name": "test"})
+        self.app.post(
+            "/nodes/add", json={"ntype": "PostgresTable", "name": "test", "version": 2}
+        )
+
+        response = self.app.get("/nodes/get?name=test&version=1")
+        assert response.status_code == 200
+        assert response.json["node"] == {
+            "ntype": "PostgresTable",
+            "name": "test",
+            "version": 1,
+        }
+
+        # without a version the latest one is returned.
+        response = self.app.get("/nodes/get?name=test")
+        assert response.status_code == 200
+        assert response.json["node"]["version"] == 2
+
+        response = self.app.get("/nodes/get?name=test&version=3")
+        assert response.status_code == 404
+        assert b"Node not found" in response.data
+
+        response = self.app.get("/nodes/get")
+        assert response.status_code == 400
+
+    def test_init_graph(self) -> None:
+        graph = flask_app.init_graph(flask_app.app)
+        assert flask_app.app.config["GRAPH"] is graph
+        assert isinstance(graph.session, scoped_session)
+
+        response = self.app.post("/nodes/add", json={"ntype": "Node", "name": "test"})
+        assert response.status_code == 200
+        # the request's session is released once the request is over.
+        assert not graph.session.registry.has()
+
+    def test_concurrent_requests(self) -> None:
+        flask_app.init_graph(flask_app.app)
+        errors: list[BaseException] = []
+
+        def worker(index: int) -> None:
+            client = flask_app.app.test_client()
+            try:
+                for version in range(1, 6):
+                    response = client.post(
+                        "/edges/add",
+                        json={
+                            "upstream": {"ntype": "Node", "name": f"source_{index}"},
+                            "downstream": {
+                                "ntype": "Node",
+                                "name": f"target_{index}",
+                                "version": version,
+                            },
+                        },
+                    )
+                    assert response.status_code == 200
+                    response = client.get(f"/nodes/get?name=target_{index}")
+                    assert response.json["node"]["version"] == version
+            except BaseException as error:  # pragma: no cover
+                errors.append(error)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        graph = flask_app.app.config["GRAPH"]
+        assert graph.graph.number_of_nodes() == 8 * 6
+        assert graph.graph.number_of_edges() == 8 * 5
+
+    def test_render_subgraph(self) -> None:
+        for upstream, downstream in (("a", "b"), ("b", "c"), ("c", "d")):
+            self.app.post(
+                "/edges/add",
+                json={
+                    "upstream": {"ntype": "BigQueryTable", "name": upstream},
+                    "downstream": {"ntype": "BigQueryTable", "name": downstream},
+                },
+            )
+
+        response = self.app.get("/graph/render?name=b&direction=downstream&depth=1")
+        assert response.status_code == 200
+        assert response.mimetype == "image/svg+xml"
+        assert b"<svg" in response.data
+        assert b"BigQueryTable(name=&#39;c&#39;" in response.data
+        assert b"BigQueryTable(name=&#39;d&#39;" not in response.data
+
+        response = self.app.get("/graph/render?name=b&version=1&format=png")
+        assert response.status_code == 200
+        assert response.mimetype == "image/png"
+
+        # the same request is served from the cached image.
+        renderer = flask_app.get_renderer()
+        jobs = len(renderer._jobs)
+        response = self.app.get("/graph/render?name=b&version=1&format=png")
+        assert response.status_code == 200
+        assert len(renderer._jobs) == jobs
+
+        response = self.app.get("/graph/render?name=missing")
+        assert response.status_code == 404
+
+        for query in (
+            "",
+            "name=b&direction=sideways",
+            "name=b&depth=-1",
+            "name=b&format=gif",
+        ):
+            response = self.app.get(f"/graph/render?{query}")
+            assert response.status_code == 400
+
+    def test_render_subgraph_timeout(self) -> None:
+        flask_app.app.config["RENDER_TIMEOUT"] = 0
+        self.app.post("/nodes/add", json={"ntype": "Node", "name": "slow"})
+        try:
+            response = self.app.get("/graph/render?name=slow")
+        finally:
+            del flask_app.app.config["RENDER_TIMEOUT"]
+        if response.status_code == 202:
+            assert response.json["status_url"].startswith("/refresh-graph/")
+        else:
+            assert response.status_code == 200
+
+    def test_lineage(self) -> None:
+        for upstream, downstream in (("a", "b"), ("b", "c"), ("x", "c")):
+            self.app.post(
+                "/edges/add",
+                json={
+                    "upstream": {"ntype": "PostgresTable", "name": upstream},
+                    "downstream": {"ntype": "PostgresTable", "name": downstream},
+                },
+            )
+
+        response = self.app.get("/lineage/upstream?name=c")
+        assert response.status_code == 200
+        assert response.json["node"] == {
+            "ntype": "PostgresTable",
+            "name": "c",
+            "version": 1,
+        }
+        assert [node["name"] for node in response.json["upstream"]] == ["a", "b", "x"]
+
+        response = self.app.get("/lineage/upstream?name=c&version=1&depth=1")
+        assert [node["name"] for node in response.json["upstream"]] == ["b", "x"]
+
+        response = self.app.get("/lineage/downstream?name=a")
+        assert response.status_code == 200
+        assert [node["name"] for node in response.json["downstream"]] == ["b", "c"]
+
+        response = self.app.get("/lineage/downstream?name=missing")
+        assert response.status_code == 404
+        response = self.app.get("/lineage/downstream")
+        assert response.status_code == 400
+        response = self.app.get("/lineage/upstream?name=c&depth=-1")
+        assert response.status_code == 400
+
+    def test_add_nodes_bulk(self) -> None:
+        items = [
+            {"ntype": "BigQueryTable", "name": "a"},
+            {"ntype": "PostgresTable", "name": "b", "version": 2},
+            {"name": "missing_ntype"},
+            {"ntype": "Unknown", "name": "c"},
+            "not an object",
+        ]
+        response = self.app.post("/nodes/bulk", json=items)
+        assert response.status_code == 200
+        assert response.json["applied"] == 2
+        assert response.json["failed"] == 3
+        assert [result["status"] for result in response.json["results"]] == [
+            200,
+            200,
+            400,
+            400,
+            400,
+        ]
+        assert response.json["results"][3]["message"] == "Unknown node type: Unknown"
+
+        graph = flask_app.app.config["GRAPH"]
+        assert graph.get_node("a").ntype == "BigQueryTable"
+        assert graph.get_node("b", version=2).ntype == "PostgresTable"
+        assert graph.get_node("c") is None
+
+    def test_add_nodes_bulk_ndjson(self) -> None:
+        body = (
+            b'{"ntype": "Node", "name": "a"}\n{broken\n{"ntype": "Node", "name": "b"}\n'
+        )
+        response = self.app.post(
+            "/nodes/bulk", data=body, content_type="application/x-ndjson"
+        )
+        assert response.status_code == 200
+        assert [result["status"] for result in response.json["results"]] == [
+            200,
+            400,
+            200,
+        ]
+        graph = flask_app.app.config["GRAPH"]
+        assert graph.get_node("b") is not None
+
+    def test_add_nodes_bulk_invalid_body(self) -> None:
+        response = self.app.post(
+            "/nodes/bulk",
+            data=b'[{"ntype": "Node", "name": "a"}, ',
+            content_type="application/json",
+        )
+        assert response.status_code == 400
+        assert flask_app.app.config["GRAPH"].get_node("a") is None
+
+        response = self.app.post("/nodes/bulk", json={"ntype": "Node", "name": "a"})
+        assert response.status_code == 400
+
+    def test_add_edges_bulk(self) -> None:
+        def edge(upstream: str, downstream: str) -> dict:
+            return {
+                "upstream": {"ntype": "Node", "name": upstream},
+                "downstream": {"ntype": "Node", "name": downstream},
+            }
+
+        graph = flask_app.app.config["GRAPH"]
+        body = "\n".join(
+            json.dumps(item)
+            for item in [
+                edge("a", "b"),
+                edge("b", "c"),
+                {"upstream": {}},
+                edge("a", "c"),
+            ]
+        )
+        response = self.app.post(
+            "/edges/bulk", data=body, content_type="application/x-ndjson"
+        )
+        assert response.status_code == 200
+        assert response.json["applied"] == 3
+        assert response.json["results"][2]["status"] == 400
+        assert graph.downstream(graph.get_node("a")) == {
+            graph.get_node("b"),
+            graph.get_node("c"),
+        }
+
+        # one cycle rejects the whole request.
+        response = self.app.post("/edges/bulk", json=[edge("c", "d"), edge("c", "a")])
+        assert response.status_code == 409
+        assert response.json["applied"] == 0
+        assert [result["status"] for result in response.json["results"]] == [409, 409]
+        assert graph.get_node("d") is None
+        assert not graph.graph.has_edge(graph.get_node("c"), graph.get_node("a"))
+
+    def test_export_graph(self) -> None:
+        graph = flask_app.app.config["GRAPH"]
+        graph.add_edge(Node("a"), Node("b"))
+
+        response = self.app.get("/graph/export")
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == "application/x-ndjson"
+        assert response.data.decode() == "".join(graph.export())
+
+        response = self.app.get("/graph/export?gzip=1")
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(response.data).decode() == "".join(graph.export())
+
+    def test_rebuild_plan(self) -> None:
+        graph = flask_app.app.config["GRAPH"]
+        graph.add_edge(Node("raw"), Node("staged"))
+        graph.add_edge(Node("staged"), Node("report"))
+        graph.add_edge(Node("raw"), Node("audit", runtime=10))
+        graph.add_node(Node("raw", version=2))
+
+        response = self.app.post(
+            "/lineage/rebuild-plan",
+            json={"nodes": [{"name": "raw", "version": 1}], "cost": "runtime"},
+        )
+        assert response.status_code == 200
+        assert response.json["nodes"] == 4
+        assert [[node["name"] for node in wave] for wave in response.json["waves"]] == [
+            ["raw"],
+            ["audit", "staged"],
+            ["report"],
+        ]
+
+        # without a version, the latest one changed.
+        response = self.app.post(
+            "/lineage/rebuild-plan", json={"nodes": [{"name": "raw"}]}
+        )
+        assert response.json["waves"] == [
+            [{"ntype": "Node", "name": "raw", "version": 2}]
+        ]
+
+        response = self.app.post("/lineage/rebuild-plan", json={"nodes": "raw"})
+        assert response.status_code == 400
+        response = self.app.post(
+            "/lineage/rebuild-plan", json={"nodes": [{"name": "missing"}]}
+        )
+        assert response.status_code == 404
+
+    def test_cached_responses(self) -> None:
+        graph = flask_app.app.config["GRAPH"]
+        graph.add_edge(Node("a"), Node("b"))
+        cache = flask_app.get_response_cache()
+        hits = cache.hits
+
+        response = self.app.get("/lineage/downstream?name=a")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        assert [node["name"] for node in response.json["downstream"]] == ["b"]
+
+        response = self.app.get("/lineage/downstream?name=a")
+        assert response.status_code == 200
+        assert response.headers["ETag"] == etag
+        assert cache.hits == hits + 1
+
+        response = self.app.get(
+            "/lineage/downstream?name=a", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.data == b""
+
+        # a change to the graph makes for a new response.
+        graph.add_edge(Node("b"), Node("c"))
+        response = self.app.get(
+            "/lineage/downstream?name=a", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert [node["name"] for node in response.json["downstream"]] == ["b", "c"]
+
+        # errors are not cached.
+        assert self.app.get("/lineage/downstream?name=missing").status_code == 404
+        graph.add_node(Node("missing"))
+        assert self.app.get("/lineage/downstream?name=missing").status_code == 200
+
+        response = self.app.get("/cache/stats")
+        assert response.status_code == 200
+        assert response.json["responses"]["hits"] == cache.hits
+        assert set(response.json["properties"]) == {
+            "entries",
+            "size",
+            "max_bytes",
+            "hits",
+            "misses",
+        }
+
+    def test_stale_and_dependencies(self) -> None:
+        graph = flask_app.app.config["GRAPH"]
+        graph.add_edge(Node("source"), Node("report"))
+        graph.add_edge(Node("other"), Node("report"))
+        graph.add_node(Node("source", version=2))
+
+        response = self.app.get("/lineage/stale")
+        assert response.status_code == 200
+        assert response.json["stale"] == [
+            {
+                "node": {"ntype": "Node", "name": "report", "version": 1},
+                "outdated": [
+                    {
+                        "dependency": {"ntype": "Node", "name": "source", "version": 1},
+                        "latest": {"ntype": "Node", "name": "source", "version": 2},
+                    }
+                ],
+            }
+        ]
+
+        response = self.app.get("/lineage/dependencies?name=report")
+        assert response.status_code == 200
+        assert [
+            (item["dependency"]["name"], item["latest"]["version"], item["stale"])
+            for item in response.json["dependencies"]
+        ] == [("other", 1, False), ("source", 2, True)]
+
+        assert self.app.get("/lineage/dependencies").status_code == 400
+        assert self.app.get("/lineage/dependencies?name=missing").status_code == 404
+
+    def test_metrics(self) -> None:
+        metrics.REGISTRY.clear()
+        metrics.enable()
+        try:
+            self.app.get("/nodes/get?name=missing")
+            self.app.get("/lineage/upstream")
+            response = self.app.get("/metrics")
+        finally:
+            metrics.disable()
+            metrics.REGISTRY.clear()
+
+        assert response.status_code == 200
+        assert response.content_type == metrics.CONTENT_TYPE
+        body = response.get_data(as_text=True)
+        assert (
+            'http_request_duration_seconds_count{method="GET",route="/nodes/get",'
+            'status="404"} 1'
+        ) in body
+        assert 'route="/lineage/upstream",status="400"} 1' in body
+        assert (
+            'graph_operation_seconds_count{operation="Graph.get_latest_version"} 1'
+            in body
+        )
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import subprocess
+import sys
+
+import pytest
+
+from data_version_graph.app.asgi import LineageApp
+from data_version_graph.async_graph import AsyncGraph
+from data_version_graph.database import create_async_database
+from data_version_graph.nodes import Node
+
+pytest.importorskip("aiosqlite")
+
+
+async def request(app: LineageApp, path: str, query: str = "", method: str = "GET"):
+    messages = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query.encode(),
+    }
+    await app(scope, receive, send)
+    start, body = messages
+    assert (b"content-type", b"application/json") in start["headers"]
+    return start["status"], json.loads(body["body"])
+
+
+class TestLineageApp:
+    def run(self, tmp_path, test) -> None:
+        async def main() -> None:
+            sessionmaker = await create_async_database(
+                f"sqlite+aiosqlite:///{tmp_path / 'graph.db'}"
+            )
+            graph = await AsyncGraph.create(sessionmaker)
+            await graph.add_edge(Node("a"), Node("b"))
+            await graph.add_edge(Node("b"), Node("c"))
+            await graph.add_node(Node("a", version=2))
+            try:
+                await test(LineageApp(graph=graph))
+            finally:
+                await graph.close()
+                await sessionmaker.kw["bind"].dispose()
+
+        asyncio.run(main())
+
+    def test_lineage(self, tmp_path) -> None:
+        async def test(app: LineageApp) -> None:
+            status, body = await request(app, "/lineage/downstream", "name=a&version=1")
+            assert status == 200
+            assert body["node"] == {"ntype": "Node", "name": "a", "version": 1}
+            assert [node["name"] for node in body["downstream"]] == ["b", "c"]
+
+            status, body = await request(app, "/lineage/upstream", "name=c&depth=1")
+            assert status == 200
+            assert [node["name"] for node in body["upstream"]] == ["b"]
+
+            status, body = await request(app, "/lineage/dependencies", "name=b")
+            assert status == 200
+            assert body["dependencies"][0]["stale"] is True
+            assert body["dependencies"][0]["latest"]["version"] == 2
+
+            status, body = await request(app, "/nodes/get", "name=a")
+            assert (status, body["node"]["version"]) == (200, 2)
+
+        self.run(tmp_path, test)
+
+    def test_errors(self, tmp_path) -> None:
+        async def test(app: LineageApp) -> None:
+            assert (await request(app, "/lineage/upstream"))[0] == 400
+            assert (await request(app, "/lineage/upstream", "name=a&depth=-1"))[
+                0
+            ] == 400
+            assert (await request(app, "/lineage/upstream", "name=z"))[0] == 404
+            assert (await request(app, "/nodes/add"))[0] == 404
+            assert (await request(app, "/nodes/get", "name=a", method="POST"))[0] == 405
+
+        self.run(tmp_path, test)
+
+    def test_lifespan(self, tmp_path) -> None:
+        async def main() -> None:
+            url = f"sqlite+aiosqlite:///{tmp_path / 'graph.db'}"
+            app = LineageApp(url, sync_interval=0.01)
+            assert (await request(app, "/nodes/get", "name=a"))[0] == 503
+
+            messages = asyncio.Queue()
+            for message in ("lifespan.startup", "lifespan.shutdown"):
+                messages.put_nowait({"type": message})
+            sent = []
+
+            async def send(message: dict) -> None:
+                sent.append(message["type"])
+                if message["type"] == "lifespan.startup.complete":
+                    # another worker's write reaches the app's graph.
+                    writer = await AsyncGraph.create(await create_async_database(url))
+                    await writer.add_node(Node("a"))
+                    await writer.close()
+                    for _ in range(500):
+                        if await app.graph.get_node("a") is not None:
+                            break
+                        await asyncio.sleep(0.01)
+                    assert (await request(app, "/nodes/get", "name=a"))[0] == 200
+
+            await app({"type": "lifespan"}, messages.get, send)
+            assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+        asyncio.run(main())
+
+    def test_failed_sync_is_retried(self, tmp_path, caplog) -> None:
+        async def test(app: LineageApp) -> None:
+            calls = []
+            sync = app.graph.sync
+
+            async def flaky_sync() -> int:
+                calls.append(len(calls))
+                if len(calls) == 1:
+                    raise RuntimeError("database is locked")
+                return await sync()
+
+            app.graph.sync = flaky_sync
+            app.sync_interval = 0.01
+            await app.startup()
+            for _ in range(500):
+                if len(calls) > 1:
+                    break
+                await asyncio.sleep(0.01)
+            # shutdown() neither stops at nor re-raises the failure.
+            await app.shutdown()
+            assert len(calls) > 1
+
+        self.run(tmp_path, test)
+        assert "Failed to sync the graph" in caplog.text
+
+
+def test_import_leaves_out_the_flask_app() -> None:
+    code = (
+        "import sys, data_version_graph.app.asgi; "
+        "assert 'data_version_graph.app.app' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,139 @@
+import os
+import threading
+
+import networkx as nx
+import pytest
+
+from data_version_graph.app.rendering import GraphRenderer, to_agraph
+
+
+class SlowAGraph:
+    def __init__(self) -> None:
+        self.release = threading.Event()
+        self.draws = 0
+
+    def draw(self, path: str, *, format: str, prog: str, args: str) -> None:
+        self.release.wait(timeout=5)
+        self.draws += 1
+        with open(path, "w") as file:
+            file.write(format)
+
+
+class TestGraphRenderer:
+    def setup_method(self, method) -> None:
+        self.output_dir = os.path.join(
+            os.path.dirname(__file__), "static", "rendering", method.__name__
+        )
+        self.renderer = GraphRenderer(self.output_dir, max_jobs=2)
+
+    def teardown_method(self) -> None:
+        self.renderer.shutdown()
+
+    def test_job_id(self) -> None:
+        assert self.renderer.job_id("graph", 1) == self.renderer.job_id("graph", 1)
+        assert self.renderer.job_id("graph", 1) != self.renderer.job_id("graph", 2)
+        other = GraphRenderer(self.output_dir)
+        assert other.job_id("graph", 1) != self.renderer.job_id("graph", 1)
+        other.shutdown()
+
+    def test_submit_coalesces_duplicates(self) -> None:
+        agraph = SlowAGraph()
+        future = self.renderer.submit("job", lambda: agraph, fmt="svg")
+        assert self.renderer.submit("job", lambda: agraph) is future
+        assert self.renderer.status("job") in ("pending", "running")
+        assert self.renderer.result("job") is None
+        assert self.renderer.latest() is None
+
+        agraph.release.set()
+        path = future.result(timeout=5)
+        assert path == os.path.join(self.output_dir, "graph-job.svg")
+        assert os.path.exists(path)
+        assert agraph.draws == 1
+        assert self.renderer.status("job") == "done"
+        assert self.renderer.result("job") == path
+        assert self.renderer.latest() == path
+
+        # a finished job is not drawn again.
+        assert self.renderer.submit("job", lambda: agraph) is future
+        assert self.renderer.status("unknown") is None
+
+    def test_failed_job_is_retried(self) -> None:
+        class BrokenAGraph:
+            def draw(self, *args, **kwargs) -> None:
+                raise RuntimeError("dot failed")
+
+        future = self.renderer.submit("job", BrokenAGraph)
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+        assert self.renderer.status("job") == "failed"
+        assert self.renderer.result("job") is None
+
+        graph = nx.DiGraph([("a", "b")])
+        retry = self.renderer.submit("job", lambda: nx.nx_agraph.to_agraph(graph))
+        assert retry is not future
+        assert os.path.exists(retry.result(timeout=30))
+
+    def test_old_jobs_are_evicted(self) -> None:
+        agraph = SlowAGraph()
+        agraph.release.set()
+        paths = [
+            self.renderer.submit(job_id, lambda: agraph, name=job_id).result(timeout=5)
+            for job_id in ("a", "b")
+        ]
+        self.renderer._latest.clear()
+        self.renderer.submit("c", lambda: agraph).result(timeout=5)
+        assert self.renderer.status("a") is None
+        assert not os.path.exists(paths[0])
+        assert os.path.exists(paths[1])
+
+    def test_latest_follows_revisions(self) -> None:
+        old = SlowAGraph()
+        new = SlowAGraph()
+        new.release.set()
+        old_future = self.renderer.submit("old", lambda: old, revision=1)
+        new_path = self.renderer.submit("new", lambda: new, revision=2).result(
+            timeout=5
+        )
+        assert self.renderer.latest() == new_path
+
+        # an image of an older revision that finishes last does not replace it.
+        old.release.set()
+        old_future.result(timeout=5)
+        assert self.renderer.latest() == new_path
+
+    def test_conversion_runs_on_the_pool(self) -> None:
+        converting = threading.Event()
+        release = threading.Event()
+        agraph = SlowAGraph()
+        agraph.release.set()
+
+        def convert() -> SlowAGraph:
+            converting.set()
+            release.wait(timeout=5)
+            return agraph
+
+        # submit() returns while the graph is being converted, and the job is
+        # shared meanwhile.
+        future = self.renderer.submit("job", convert)
+        assert converting.wait(timeout=5)
+        assert self.renderer.status("job") == "running"
+        assert self.renderer.submit("job", convert) is future
+        assert self.renderer.submit("other", lambda: agraph).result(timeout=5)
+
+        release.set()
+        assert future.result(timeout=5).endswith("graph-job.png")
+        assert self.renderer.status("job") == "done"
+
+    def test_failed_conversion(self) -> None:
+        def convert() -> None:
+            raise RuntimeError("no graphviz")
+
+        future = self.renderer.submit("job", convert)
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+        assert self.renderer.status("job") == "failed"
+
+    def test_to_agraph(self) -> None:
+        agraph = to_agraph([("a", "red"), ("b", None)], [("a", "b")])
+        assert agraph.get_node("a").attr["color"] == "red"
+        assert agraph.has_edge("a", "b")
@@ -0,0 +1,51 @@
+import hashlib
+
+from data_version_graph.app.response_cache import CACHE_ENTRY_BYTES, ResponseCache
+
+
+class TestResponseCache:
+    def test_get_and_put(self) -> None:
+        cache = ResponseCache()
+        assert cache.get("a", 1) is None
+        entry = cache.put("a", 1, b"body", "application/json")
+        assert entry.etag == hashlib.sha1(b"body").hexdigest()
+        assert cache.get("a", 1) is entry
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert cache.size == CACHE_ENTRY_BYTES + 4
+
+    def test_new_revision_drops_entries(self) -> None:
+        cache = ResponseCache()
+        cache.put("a", 1, b"body", "application/json")
+        assert cache.get("a", 2) is None
+        assert len(cache) == 0
+        assert cache.size == 0
+
+    def test_eviction(self) -> None:
+        cache = ResponseCache(max_bytes=2 * (CACHE_ENTRY_BYTES + 10))
+        for key in "abc":
+            cache.put(key, 1, b"x" * 10, "application/json")
+        assert len(cache) == 2
+        assert cache.get("a", 1) is None
+        assert cache.get("b", 1) is not None
+
+        # b was used last, so c goes first.
+        cache.put("d", 1, b"x" * 10, "application/json")
+        assert cache.get("c", 1) is None
+        assert cache.get("b", 1) is not None
+
+        # bodies larger than the budget are not kept.
+        cache.put("e", 1, b"x" * 1000, "application/json")
+        assert cache.get("e", 1) is None
+        assert cache.size <= cache.max_bytes
+
+    def test_stats(self) -> None:
+        cache = ResponseCache(max_bytes=1000)
+        cache.put("a", 1, b"body", "application/json")
+        cache.get("a", 1)
+        assert cache.stats() == {
+            "entries": 1,
+            "size": CACHE_ENTRY_BYTES + 4,
+            "max_bytes": 1000,
+            "hits": 1,
+            "misses": 0,
+        }
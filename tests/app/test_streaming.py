@@ -0,0 +1,99 @@
+import gzip
+import io
+import json
+
+import pytest
+
+from data_version_graph.app import streaming
+from data_version_graph.app.streaming import (
+    MALFORMED,
+    StreamParseError,
+    iter_chunks,
+    iter_gzip,
+    iter_json_array,
+    iter_ndjson,
+)
+
+
+class TestIterJsonArray:
+    def test_items(self) -> None:
+        items = [{"name": f"tablé_{i}", "version": i} for i in range(100)]
+        items += [12345, "x", [1, 2], None, 1.5e10]
+        data = json.dumps(items).encode()
+        # chunks of every size split items, numbers and multi-byte characters.
+        for chunk_size in (1, 2, 3, 7, 64, len(data)):
+            stream = io.BytesIO(data)
+            assert list(iter_json_array(stream, chunk_size=chunk_size)) == items
+
+    def test_empty_array(self) -> None:
+        assert list(iter_json_array(io.BytesIO(b" [ ]\n"))) == []
+
+    def test_items_are_yielded_incrementally(self) -> None:
+        stream = io.BytesIO(b'[{"a": 1}, {"a": 2}, garbage')
+        items = iter_json_array(stream, chunk_size=4)
+        assert next(items) == {"a": 1}
+        assert next(items) == {"a": 2}
+        with pytest.raises(StreamParseError):
+            next(items)
+
+    @pytest.mark.parametrize(
+        "data",
+        [b"", b"{}", b"[1,", b"[1,]", b"[1 2]", b"[1] x", b"[12", b'[{"a":'],
+    )
+    def test_invalid(self, data: bytes) -> None:
+        for chunk_size in (1, 2, 100):
+            with pytest.raises(StreamParseError):
+                list(iter_json_array(io.BytesIO(data), chunk_size=chunk_size))
+
+    def test_invalid_item_fails_without_reading_on(self) -> None:
+        # Only an item cut short by the end of a chunk waits for the next.
+        data = b'[{"a": 1}, {"a": x}, ' + b'{"a": 2}, ' * 10_000 + b"]"
+        stream = io.BytesIO(data)
+        with pytest.raises(StreamParseError, match="Invalid JSON in array"):
+            list(iter_json_array(stream, chunk_size=64))
+        assert stream.tell() == 64
+
+        # values cut short at every position are decoded once complete.
+        data = b'[{"a": -Infinity, "b": "\\ud83d\\ude00", "c": [1.5e+10, false]}]'
+        for chunk_size in (1, 2, 5):
+            items = iter_json_array(io.BytesIO(data), chunk_size=chunk_size)
+            assert list(items) == [
+                {"a": float("-inf"), "b": "\U0001f600", "c": [1.5e10, False]}
+            ]
+
+    def test_large_items_are_decoded_once_complete(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        calls = []
+
+        class Decoder(json.JSONDecoder):
+            def raw_decode(self, s: str, idx: int = 0) -> tuple:
+                calls.append(idx)
+                return super().raw_decode(s, idx)
+
+        monkeypatch.setattr(streaming, "_decoder", Decoder())
+        # brackets and escaped quotes within strings do not end an item early.
+        items = [{"a": list(range(1000)), "b": '"]}\\'}, 'x\\"' * 100, 12345]
+        data = json.dumps(items).encode()
+        assert list(iter_json_array(io.BytesIO(data), chunk_size=7)) == items
+        # when each item is first seen, and at most once more when it can be complete.
+        assert len(calls) <= 2 * len(items)
+
+
+class TestIterNdjson:
+    def test_items(self) -> None:
+        stream = io.BytesIO(b'{"a": 1}\n\n  {"a": 2}  \r\nnot json\n[3]')
+        assert list(iter_ndjson(stream)) == [{"a": 1}, {"a": 2}, MALFORMED, [3]]
+
+
+class TestIterChunks:
+    def test_chunks(self) -> None:
+        lines = [f"line {i}\n" for i in range(100)]
+        chunks = list(iter_chunks(lines, chunk_size=50))
+        assert b"".join(chunks) == "".join(lines).encode()
+        assert all(len(chunk) >= 50 for chunk in chunks[:-1])
+        assert list(iter_chunks([])) == []
+
+    def test_gzip(self) -> None:
+        chunks = [b"x" * 1000, b"y" * 1000, b""]
+        assert gzip.decompress(b"".join(iter_gzip(chunks))) == b"".join(chunks)
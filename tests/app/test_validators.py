@@ -25,6 +25,9 @@ class TestValidators:
         data = None
         assert Validate.node_request(data) is False
 
+        data = "ntype name"
+        assert Validate.node_request(data) is False
+
     def test_edge_request(self):
         data = {
             "upstream": {"ntype": "test", "name": "test"},
@@ -69,3 +72,28 @@ class TestValidators:
 
         data = None
         assert Validate.edge_request(data) is False
+
+        data = {"upstream": "ntype name", "downstream": "ntype name"}
+        assert Validate.edge_request(data) is False
+
+    def test_rebuild_plan_request(self):
+        data = {"nodes": [{"name": "a"}, {"name": "b", "version": 2}]}
+        assert Validate.rebuild_plan_request(data) is True
+
+        data = {"nodes": [], "cost": "runtime"}
+        assert Validate.rebuild_plan_request(data) is True
+
+        data = {"nodes": [{"name": "a", "version": None}], "cost": None}
+        assert Validate.rebuild_plan_request(data) is True
+
+    def test_rebuild_plan_request_invalid(self):
+        assert Validate.rebuild_plan_request(None) is False
+        assert Validate.rebuild_plan_request({"nodes": "a"}) is False
+        assert Validate.rebuild_plan_request({"nodes": [{"version": 1}]}) is False
+        assert Validate.rebuild_plan_request({"nodes": ["a"]}) is False
+
+        data = {"nodes": [{"name": "a", "version": "1"}]}
+        assert Validate.rebuild_plan_request(data) is False
+
+        data = {"nodes": [{"name": "a"}], "cost": 1}
+        assert Validate.rebuild_plan_request(data) is False
@@ -0,0 +1,124 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from data_version_graph import analytics
+from data_version_graph.analytics import GraphAnalytics, GraphEncoding
+from data_version_graph.database import Base
+from data_version_graph.graph import Graph
+from data_version_graph.nodes import Node
+
+
+class TestGraphAnalytics:
+    def setup_method(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.graph = Graph(session=self.session)
+
+        # source v1 -> a -> b, source v2 -> c, and a separate pair d -> e.
+        self.source = Node("source")
+        self.source2 = Node("source", version=2)
+        self.source3 = Node("source", version=3)
+        self.a = Node("a")
+        self.b = Node("b")
+        self.c = Node("c")
+        self.d = Node("d")
+        self.e = Node("e")
+        self.graph.add_edges(
+            [
+                (self.source, self.a),
+                (self.a, self.b),
+                (self.source2, self.c),
+                (self.d, self.e),
+            ]
+        )
+        self.graph.add_node(self.source3)
+
+    def teardown_method(self) -> None:
+        self.session.close()
+        Base.metadata.drop_all(self.engine)
+
+    def test_encoding(self) -> None:
+        encoding = GraphEncoding(self.graph)
+        assert len(encoding) == 8
+        assert encoding.counts == {"nodes": 8, "edges": 4, "names": 6}
+        assert encoding.components == [3, 2, 2, 1]
+
+        nodes = encoding.nodes
+        arrays = encoding.arrays
+        source = nodes.index(self.source)
+        assert [
+            nodes[i]
+            for i in arrays["indices"][
+                arrays["indptr"][source] : arrays["indptr"][source + 1]
+            ]
+        ] == [self.a]
+        assert nodes[arrays["latest"][arrays["name_ids"][source]]] == self.source3
+
+        buffer = memoryview(bytearray(encoding.nbytes))
+        encoding.write(buffer)
+        views = analytics._views(buffer, encoding.counts)
+        assert {name: view.tolist() for name, view in views.items()} == {
+            name: values.tolist() for name, values in arrays.items()
+        }
+
+    def test_partitions(self) -> None:
+        encoding = GraphEncoding(self.graph)
+        # components of 3, 2, 2 and 1 nodes.
+        assert encoding.partitions(8) == [(0, 8)]
+        assert encoding.partitions(4) == [(0, 3), (3, 7), (7, 8)]
+        assert encoding.partitions(2) == [(0, 2), (2, 3), (3, 5), (5, 7), (7, 8)]
+
+    def check(self, graph_analytics: GraphAnalytics) -> None:
+        assert graph_analytics.downstream_counts() == {
+            self.source: 2,
+            self.source2: 1,
+            self.source3: 0,
+            self.a: 1,
+            self.b: 0,
+            self.c: 0,
+            self.d: 1,
+            self.e: 0,
+        }
+        assert graph_analytics.orphans() == []
+        report = graph_analytics.stale_report()
+        assert report == {
+            self.a: {self.source: self.source3},
+            self.c: {self.source2: self.source3},
+        }
+        assert {node: frozenset(stale) for node, stale in report.items()} == (
+            self.graph.stale_nodes()
+        )
+
+    def test_serial(self) -> None:
+        graph_analytics = GraphAnalytics(self.graph)
+        assert graph_analytics.workers == 1
+        self.check(graph_analytics)
+        assert not graph_analytics.parallel
+
+        self.graph.add_node(Node("e", version=2))
+        self.graph.remove_edge(self.source2, self.c)
+        assert GraphAnalytics(self.graph).orphans() == [self.e, self.source2]
+
+        with pytest.raises(ValueError, match="workers must be at least 1"):
+            GraphAnalytics(self.graph, workers=0)
+
+    def test_parallel(self) -> None:
+        with GraphAnalytics(self.graph, workers=2) as graph_analytics:
+            assert graph_analytics.parallel
+            self.check(graph_analytics)
+        assert not graph_analytics.parallel
+
+        # without the context manager, each analysis starts its own workers.
+        assert GraphAnalytics(self.graph, workers=2).downstream_counts()[self.a] == 1
+
+    def test_falls_back_to_serial(self, monkeypatch) -> None:
+        def unavailable(*args, **kwargs):
+            raise OSError("no shared memory")
+
+        monkeypatch.setattr(analytics.shared_memory, "SharedMemory", unavailable)
+        with GraphAnalytics(self.graph, workers=2) as graph_analytics:
+            assert not graph_analytics.parallel
+            assert graph_analytics.workers == 1
+            self.check(graph_analytics)
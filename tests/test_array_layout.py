@@ -0,0 +1,41 @@
+from array import array
+
+import pytest
+
+from data_version_graph import array_layout
+
+SECTIONS = (("a", "B"), ("b", "q"), ("c", "H"))
+
+
+def test_layout() -> None:
+    lengths = {"a": 3, "b": 2, "c": 1}
+    assert list(array_layout.layout(SECTIONS, lengths.__getitem__)) == [
+        ("a", "B", 0, 3),
+        ("b", "q", 8, 24),
+        ("c", "H", 24, 26),
+    ]
+    # sections are aligned from the start of the buffer, not from offset.
+    assert list(array_layout.layout(SECTIONS, lengths.__getitem__, 5))[0] == (
+        "a",
+        "B",
+        8,
+        11,
+    )
+    assert array_layout.nbytes(SECTIONS, lengths.__getitem__) == 26
+
+
+def test_write_and_views() -> None:
+    arrays = {"a": array("B", [1, 2, 3]), "b": array("q", [-1, 2]), "c": array("H")}
+    lengths = {name: len(values) for name, values in arrays.items()}
+    buffer = memoryview(bytearray(array_layout.nbytes(SECTIONS, lengths.__getitem__)))
+    array_layout.write(buffer, SECTIONS, arrays)
+
+    views = dict(array_layout.views(buffer, SECTIONS, lengths.__getitem__))
+    assert {name: view.tolist() for name, view in views.items()} == {
+        "a": [1, 2, 3],
+        "b": [-1, 2],
+        "c": [],
+    }
+
+    with pytest.raises(IndexError, match="Section b ends past the buffer"):
+        list(array_layout.views(buffer[:20], SECTIONS, lengths.__getitem__))
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from data_version_graph.async_graph import AsyncGraph
+from data_version_graph.database import create_async_database
+from data_version_graph.graph import Graph
+from data_version_graph.nodes import BigQueryTable, Node
+
+pytest.importorskip("aiosqlite")
+
+
+class TestAsyncGraph:
+    def setup_method(self) -> None:
+        self.node = Node("test")
+        self.node2 = Node("test2")
+        self.node3 = Node("test3")
+
+    def run(self, tmp_path, test) -> None:
+        async def main() -> None:
+            sessionmaker = await create_async_database(
+                f"sqlite+aiosqlite:///{tmp_path / 'graph.db'}"
+            )
+            graph = await AsyncGraph.create(sessionmaker)
+            try:
+                await test(graph, sessionmaker)
+            finally:
+                await graph.close()
+                await sessionmaker.kw["bind"].dispose()
+
+        asyncio.run(main())
+
+    def test_create(self, tmp_path) -> None:
+        async def test(graph, sessionmaker) -> None:
+            assert isinstance(graph.graph, Graph)
+            assert graph.graph.graph.number_of_nodes() == 0
+
+        self.run(tmp_path, test)
+
+    def test_writes_and_reads(self, tmp_path) -> None:
+        async def test(graph, sessionmaker) -> None:
+            await graph.add_edge(self.node, self.node2)
+            await graph.add_edges([(self.node2, self.node3)])
+            await graph.add_node(Node("test", version=2))
+
+            assert await graph.get_node("test2") == self.node2
+            assert await graph.get_latest_version("test") == Node("test", version=2)
+            assert await graph.downstream(self.node) == {self.node2, self.node3}
+            assert await graph.upstream(self.node3, depth=1) == {self.node2}
+            order = await graph.topological_sort()
+            assert order.index(self.node) < order.index(self.node2)
+            assert order.index(self.node2) < order.index(self.node3)
+            assert await graph.stale_nodes() == {self.node2: frozenset({self.node})}
+            assert await graph.is_cyclic_with_edge(self.node3, self.node)
+            with pytest.raises(ValueError, match="would create a cycle"):
+                await graph.add_edge(self.node3, self.node)
+
+            await graph.remove_edge(self.node2, self.node3)
+            await graph.remove_node(self.node)
+            assert await graph.downstream(self.node2) == set()
+
+            # a new instance loads the same graph from the database.
+            loaded = await AsyncGraph.create(sessionmaker)
+            assert set(loaded.graph.graph.nodes) == set(graph.graph.graph.nodes)
+            assert set(loaded.graph.graph.edges) == set(graph.graph.graph.edges)
+            await loaded.close()
+
+            await graph.add_edge(Node("test3", version=2), self.node2)
+            await graph.remove_nodes([self.node2])
+            await graph.remove_all_versions("test3")
+            assert list(graph.graph.graph.nodes) == [Node("test", version=2)]
+
+        self.run(tmp_path, test)
+
+    def test_batch(self, tmp_path) -> None:
+        async def test(graph, sessionmaker) -> None:
+            async with graph.batch():
+                await graph.add_edge(self.node, self.node2)
+                await graph.add_edge(self.node2, self.node3)
+            with pytest.raises(RuntimeError):
+                async with graph.batch():
+                    await graph.add_node(Node("test4"))
+                    raise RuntimeError("boom")
+            assert await graph.get_node("test4") is None
+
+            loaded = await AsyncGraph.create(sessionmaker)
+            assert await loaded.downstream(self.node) == {self.node2, self.node3}
+            assert await loaded.get_node("test4") is None
+            await loaded.close()
+
+        self.run(tmp_path, test)
+
+    def test_reads_wait_for_writes(self, tmp_path) -> None:
+        async def test(graph, sessionmaker) -> None:
+            seen = []
+
+            async def read() -> None:
+                seen.append(await graph.downstream(self.node))
+
+            await graph.add_node(self.node)
+            async with graph.batch():
+                await graph.add_edge(self.node, self.node2)
+                reader = asyncio.create_task(read())
+                await asyncio.sleep(0)
+                assert not seen
+            await reader
+            assert seen == [{self.node2}]
+
+        self.run(tmp_path, test)
+
+    def test_load_properties(self, tmp_path, monkeypatch) -> None:
+        monkeypatch.setattr("data_version_graph.async_graph.PREFETCH_CHUNK_SIZE", 2)
+
+        async def test(graph, sessionmaker) -> None:
+            nodes = [BigQueryTable(f"table{i}", rows=i) for i in range(5)]
+            await graph.add_nodes(nodes)
+            await graph.add_node(self.node)
+
+            loaded = await AsyncGraph.create(sessionmaker)
+            lazy = [await loaded.get_node(node.name) for node in nodes]
+            assert all(node.lazy_properties for node in lazy)
+            properties = await loaded.load_properties(lazy + [self.node])
+            assert properties == {
+                **{node: {"rows": i} for i, node in enumerate(lazy)},
+                self.node: {},
+            }
+            # the properties are cached, so reading them does not touch the
+            # database, which is not possible from the event loop.
+            assert lazy[3].properties == {"rows": 3}
+            assert loaded.graph.properties.misses == 0
+            await loaded.close()
+
+        self.run(tmp_path, test)
+
+    def test_sync(self, tmp_path) -> None:
+        async def test(graph, sessionmaker) -> None:
+            replica = await AsyncGraph.create(sessionmaker)
+            await graph.add_edge(self.node, self.node2)
+            assert await replica.sync() == 3
+            assert await replica.downstream(self.node) == {self.node2}
+            await replica.close()
+
+        self.run(tmp_path, test)
@@ -0,0 +1,121 @@
+import random
+
+import networkx as nx
+
+from data_version_graph.closure_cache import (
+    ANCESTORS,
+    CLOSURE_ENTRY_SIZE,
+    DESCENDANTS,
+    ClosureCache,
+)
+
+
+def cached(cache: ClosureCache, direction: str) -> set:
+    return {node for (of, node), _ in cache._entries.items() if of == direction}
+
+
+class TestClosureCache:
+    def setup_method(self) -> None:
+        self.graph = nx.DiGraph([("a", "b"), ("b", "c"), ("d", "b"), ("c", "e")])
+        self.cache = ClosureCache(self.graph)
+
+    def teardown_method(self) -> None:
+        del self.graph
+        del self.cache
+
+    def test_ancestors_and_descendants(self) -> None:
+        assert self.cache.ancestors("c") == {"a", "b", "d"}
+        assert self.cache.descendants("a") == {"b", "c", "e"}
+        # results are memoized.
+        assert self.cache.ancestors("c") is self.cache.ancestors("c")
+        assert self.cache.descendants("e") == frozenset()
+
+    def test_clear(self) -> None:
+        self.cache.ancestors("c")
+        self.cache.descendants("a")
+        self.cache.clear()
+        assert cached(self.cache, ANCESTORS) == set()
+        assert cached(self.cache, DESCENDANTS) == set()
+
+    def test_invalidate_edge_only_drops_affected_cones(self) -> None:
+        for node in self.graph:
+            self.cache.ancestors(node)
+            self.cache.descendants(node)
+
+        self.graph.add_edge("e", "f")
+        self.cache.invalidate_edge("e", "f")
+        # everything upstream of e reaches f now; nothing else changed.
+        assert cached(self.cache, DESCENDANTS) == set()
+        assert cached(self.cache, ANCESTORS) == {"a", "b", "c", "d", "e"}
+        assert self.cache.descendants("a") == {"b", "c", "e", "f"}
+        assert self.cache.ancestors("f") == {"a", "b", "c", "d", "e"}
+
+        self.cache.ancestors("a")
+        self.graph.remove_edge("a", "b")
+        self.cache.invalidate_edge("a", "b")
+        assert "a" in cached(self.cache, ANCESTORS)
+        assert "d" in cached(self.cache, ANCESTORS)
+        assert "c" not in cached(self.cache, ANCESTORS)
+        assert self.cache.descendants("a") == frozenset()
+        assert self.cache.ancestors("f") == {"b", "c", "d", "e"}
+
+    def test_invalidate_node(self) -> None:
+        for node in self.graph:
+            self.cache.ancestors(node)
+            self.cache.descendants(node)
+
+        self.cache.invalidate_node("c")
+        self.graph.remove_node("c")
+        assert cached(self.cache, DESCENDANTS) == {"e"}
+        assert cached(self.cache, ANCESTORS) == {"a", "b", "d"}
+        assert self.cache.descendants("a") == {"b"}
+        assert self.cache.ancestors("e") == frozenset()
+
+    def test_size_is_bounded(self) -> None:
+        # every entry costs CLOSURE_ENTRY_SIZE plus the size of its closure.
+        cache = ClosureCache(self.graph, max_size=2 * CLOSURE_ENTRY_SIZE + 5)
+        cache.ancestors("c")  # 3 nodes
+        cache.descendants("a")  # 3 nodes: evicts the ancestors of c
+        assert cached(cache, ANCESTORS) == set()
+        assert cached(cache, DESCENDANTS) == {"a"}
+        assert cache.size == CLOSURE_ENTRY_SIZE + 3
+
+        cache = ClosureCache(self.graph, max_size=3 * CLOSURE_ENTRY_SIZE + 6)
+        cache.ancestors("c")  # 3 nodes
+        cache.descendants("b")  # 2 nodes
+        cache.ancestors("c")  # used again, so b's descendants are the oldest
+        cache.descendants("e")  # 0 nodes
+        assert len(cache) == 3
+        assert cache.size == 3 * CLOSURE_ENTRY_SIZE + 5
+
+        cache.ancestors("b")  # 2 nodes: evicts the descendants of b
+        assert cached(cache, ANCESTORS) == {"c", "b"}
+        assert cached(cache, DESCENDANTS) == {"e"}
+        assert cache.size == 3 * CLOSURE_ENTRY_SIZE + 5
+
+        cache.invalidate_edge("d", "b")
+        assert cached(cache, ANCESTORS) == set()
+        assert cache.size == CLOSURE_ENTRY_SIZE
+        cache.clear()
+        assert cache.size == 0
+
+        # a closure larger than the budget is returned but not kept.
+        cache = ClosureCache(self.graph, max_size=CLOSURE_ENTRY_SIZE + 1)
+        assert cache.descendants("a") == {"b", "c", "e"}
+        assert len(cache) == 0
+
+    def test_matches_networkx_after_random_mutations(self) -> None:
+        rng = random.Random(0)
+        graph = nx.DiGraph()
+        graph.add_nodes_from(range(30))
+        cache = ClosureCache(graph)
+        for _ in range(300):
+            low, high = sorted(rng.sample(range(30), 2))
+            if graph.has_edge(low, high):
+                graph.remove_edge(low, high)
+            else:
+                graph.add_edge(low, high)
+            cache.invalidate_edge(low, high)
+            node = rng.randrange(30)
+            assert cache.ancestors(node) == nx.ancestors(graph, node)
+            assert cache.descendants(node) == nx.descendants(graph, node)
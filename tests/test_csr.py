@@ -0,0 +1,68 @@
+import random
+
+import networkx as nx
+import pytest
+
+pytest.importorskip("numpy")
+
+from data_version_graph.csr import CSRGraph  # noqa: E402
+
+
+def random_dag(n_nodes: int, n_edges: int, rng: random.Random) -> nx.DiGraph:
+    graph = nx.DiGraph()
+    graph.add_nodes_from(range(n_nodes))
+    for _ in range(n_edges):
+        low, high = sorted(rng.sample(range(n_nodes), 2))
+        graph.add_edge(low, high)
+    return graph
+
+
+class TestCSRGraph:
+    def setup_method(self) -> None:
+        self.graph = nx.DiGraph([("a", "b"), ("b", "c"), ("d", "b"), ("c", "e")])
+        self.graph.add_node("f")
+        self.csr = CSRGraph.from_networkx(self.graph)
+
+    def test_init(self) -> None:
+        assert len(self.csr) == 6
+        assert self.csr.number_of_edges == 4
+        assert "a" in self.csr
+        assert "x" not in self.csr
+        assert self.csr.nbytes > 0
+
+    def test_to_networkx(self) -> None:
+        graph = self.csr.to_networkx()
+        assert set(graph.nodes) == set(self.graph.nodes)
+        assert set(graph.edges) == set(self.graph.edges)
+
+    def test_ancestors_and_descendants(self) -> None:
+        assert self.csr.ancestors("c") == {"a", "b", "d"}
+        assert self.csr.ancestors("c", depth=1) == {"b"}
+        assert self.csr.descendants("a") == {"b", "c", "e"}
+        assert self.csr.descendants("a", depth=2) == {"b", "c"}
+        assert self.csr.descendants("a", depth=0) == frozenset()
+        assert self.csr.descendants("f") == frozenset()
+        with pytest.raises(KeyError):
+            self.csr.descendants("x")
+
+    def test_topological_sort(self) -> None:
+        order = self.csr.topological_sort()
+        position = {node: i for i, node in enumerate(order)}
+        assert sorted(order) == sorted(self.graph.nodes)
+        assert all(position[u] < position[v] for u, v in self.graph.edges)
+
+        with pytest.raises(ValueError, match="contains a cycle"):
+            CSRGraph.from_networkx(nx.DiGraph([(0, 1), (1, 0)])).topological_sort()
+
+    def test_matches_networkx(self) -> None:
+        rng = random.Random(0)
+        for _ in range(20):
+            graph = random_dag(rng.randint(2, 50), rng.randint(0, 120), rng)
+            csr = CSRGraph.from_networkx(graph)
+            for node in graph:
+                assert csr.ancestors(node) == nx.ancestors(graph, node)
+                assert csr.descendants(node) == nx.descendants(graph, node)
+                within_two = nx.single_source_shortest_path_length(graph, node, 2)
+                assert csr.descendants(node, depth=2) == within_two.keys() - {node}
+            position = {node: i for i, node in enumerate(csr.topological_sort())}
+            assert all(position[u] < position[v] for u, v in graph.edges)
@@ -1,7 +1,15 @@
-from sqlalchemy import JSON, Integer, String, inspect
+from sqlalchemy import JSON, Integer, String, create_engine, inspect, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-from data_version_graph.database import EdgeModel, NodeModel, create_database
+from data_version_graph.database import (
+    EdgeModel,
+    NodeModel,
+    create_database,
+    insert_ignoring_duplicates,
+    migrate_database,
+)
 
 
 def test_create_database():
@@ -17,6 +25,7 @@ def test_create_database():
     inspector = inspect(session.bind)
     assert "nodes" in inspector.get_table_names()
     assert "edges" in inspector.get_table_names()
+    assert "changes" in inspector.get_table_names()
 
     # verify that the tables have the expected columns
     columns = inspector.get_columns("nodes")
@@ -38,8 +47,99 @@ def test_create_database():
     assert columns[1]["name"] == "from_node_id"
     assert columns[2]["name"] == "to_node_id"
 
+    columns = inspector.get_columns("changes")
+    assert [column["name"] for column in columns] == [
+        "id",
+        "operation",
+        "ntype",
+        "name",
+        "version",
+        "to_name",
+        "to_version",
+    ]
+
     # verify that the tables are empty
     nodes = session.query(NodeModel).all()
     assert nodes == []
     edges = session.query(EdgeModel).all()
     assert edges == []
+
+
+def test_create_database_indexes():
+    Session = create_database("sqlite:///:memory:")
+    inspector = inspect(Session.kw["bind"])
+
+    indexes = {index["name"]: index for index in inspector.get_indexes("nodes")}
+    assert indexes["ix_nodes_name_version"]["column_names"] == ["name", "version"]
+    assert indexes["ix_nodes_name_version"]["unique"]
+
+    indexes = {index["name"]: index for index in inspector.get_indexes("edges")}
+    assert indexes["ix_edges_from_node_id_to_node_id"]["column_names"] == [
+        "from_node_id",
+        "to_node_id",
+    ]
+    assert indexes["ix_edges_from_node_id_to_node_id"]["unique"]
+    assert indexes["ix_edges_to_node_id"]["column_names"] == ["to_node_id"]
+
+
+def test_migrate_database():
+    # A database created before the indexes existed, holding duplicate rows.
+    engine = create_engine("sqlite:///:memory:", poolclass=StaticPool)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE nodes (id INTEGER PRIMARY KEY, ntype VARCHAR NOT NULL, "
+            "name VARCHAR NOT NULL, version INTEGER NOT NULL, properties JSON)"
+        )
+        connection.exec_driver_sql(
+            "CREATE TABLE edges (id INTEGER PRIMARY KEY, "
+            "from_node_id INTEGER NOT NULL REFERENCES nodes (id), "
+            "to_node_id INTEGER NOT NULL REFERENCES nodes (id))"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO nodes (id, ntype, name, version) VALUES "
+            "(1, 'Node', 'a', 1), (2, 'Node', 'b', 1), (3, 'Node', 'a', 1)"
+        )
+        # properties as stored when they were passed as a single keyword.
+        connection.exec_driver_sql(
+            "INSERT INTO nodes (id, ntype, name, version, properties) VALUES "
+            "(4, 'Node', 'c', 1, '{\"properties\": {\"rows\": 1}}'), "
+            "(5, 'Node', 'd', 1, '{\"properties\": {}}'), "
+            "(6, 'Node', 'e', 1, '{\"rows\": 2}')"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO edges (id, from_node_id, to_node_id) VALUES "
+            "(1, 1, 2), (2, 3, 2), (3, 1, 2)"
+        )
+
+    migrate_database(engine)
+    migrate_database(engine)
+
+    with engine.connect() as connection:
+        nodes = connection.execute(select(NodeModel.id).order_by(NodeModel.id))
+        assert nodes.scalars().all() == [1, 2, 4, 5, 6]
+        properties = connection.execute(
+            select(NodeModel.properties).where(NodeModel.id > 3).order_by(NodeModel.id)
+        )
+        assert properties.scalars().all() == [{"rows": 1}, None, {"rows": 2}]
+        edges = connection.execute(select(EdgeModel.from_node_id, EdgeModel.to_node_id))
+        assert [tuple(edge) for edge in edges] == [(1, 2)]
+
+    index_names = {index["name"] for index in inspect(engine).get_indexes("nodes")}
+    assert "ix_nodes_name_version" in index_names
+
+
+def test_insert_ignoring_duplicates():
+    assert "ON CONFLICT DO NOTHING" in str(
+        insert_ignoring_duplicates(NodeModel, "sqlite").compile(
+            dialect=sqlite.dialect()
+        )
+    )
+    assert "ON CONFLICT DO NOTHING" in str(
+        insert_ignoring_duplicates(NodeModel, "postgresql").compile(
+            dialect=postgresql.dialect()
+        )
+    )
+    assert "INSERT IGNORE" in str(
+        insert_ignoring_duplicates(NodeModel, "mysql").compile(dialect=mysql.dialect())
+    )
+    assert insert_ignoring_duplicates(NodeModel, "oracle") is None
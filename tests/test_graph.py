@@ -1,11 +1,16 @@
+import json
+import random
+import time
+
 import networkx as nx
 import pytest
 from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
-from data_version_graph.database import Base
+from data_version_graph import graph as graph_module
+from data_version_graph.database import Base, ChangeModel, EdgeModel, NodeModel
 from data_version_graph.graph import Graph
-from data_version_graph.nodes import Node
+from data_version_graph.nodes import BigQueryTable, Node, PostgresTable
 
 
 class TestGraph:
@@ -48,6 +53,24 @@ class TestGraph:
         assert graph.graph.nodes == self.graph.graph.nodes
         assert list(graph.graph.edges) == list(self.graph.graph.edges)
 
+    def test__load_graph_is_read_only(self):
+        self.graph.add_edge(self.node, self.node2)
+        self.graph.add_edge(self.node2, self.node3)
+
+        Graph(session=self.session)
+        Graph(session=self.session)
+        assert self.session.query(NodeModel).count() == 3
+        assert self.session.query(EdgeModel).count() == 2
+
+    def test__load_graph_skips_dangling_edges(self):
+        self.graph.add_edge(self.node, self.node2)
+        self.session.query(NodeModel).filter_by(name=self.node2.name).delete()
+        self.session.commit()
+
+        graph = Graph(session=self.session)
+        assert list(graph.graph.nodes) == [self.node]
+        assert list(graph.graph.edges) == []
+
     def test_add_node(self):
         self.graph.add_node(self.node)
         assert self.node in self.graph.graph.nodes
@@ -74,6 +97,64 @@ class TestGraph:
         ):
             self.graph.remove_node("test")
 
+    def test_remove_node_deletes_its_edges(self):
+        self.graph.add_edge(self.node, self.node2)
+        self.graph.add_edge(self.node2, self.node3)
+
+        self.graph.remove_node(self.node2)
+        assert self.session.query(EdgeModel).count() == 0
+        assert list(Graph(session=self.session).graph.edges) == []
+
+    def test_remove_nodes(self, monkeypatch):
+        self.graph.add_edge(self.node, self.node2)
+        self.graph.add_edge(self.node2, self.node3)
+        self.graph.add_edge(self.node4, self.node3)
+        flushes = []
+        flush = self.graph._writes.flush
+
+        def counted_flush(session):
+            flushes.append(session)
+            return flush(session)
+
+        monkeypatch.setattr(self.graph._writes, "flush", counted_flush)
+
+        self.graph.remove_nodes([self.node2, self.node4, Node("missing")])
+        assert len(flushes) == 1
+        assert list(self.graph.graph.nodes) == [self.node, self.node3]
+        assert list(self.graph.graph.edges) == []
+        assert self.graph.get_latest_version("test") == self.node
+        assert self.graph.get_node("test2") is None
+        assert [row.name for row in self.session.query(NodeModel)] == ["test", "test3"]
+        assert self.session.query(EdgeModel).count() == 0
+
+        with pytest.raises(
+            TypeError, match="Only instances of Node can be removed from the graph"
+        ):
+            self.graph.remove_nodes([self.node, "test"])
+        assert self.node in self.graph.graph
+
+    def test_remove_all_versions(self):
+        report = Node("report")
+        self.graph.add_edge(self.node, report)
+        self.graph.add_edge(self.node4, self.node2)
+        self.graph.add_node(Node("test", version=3))
+        assert self.graph.stale_nodes() == {
+            report: {self.node},
+            self.node2: {self.node4},
+        }
+
+        graph = Graph(session=self.session)
+        assert graph.get_node("test").lazy_properties
+        graph.remove_all_versions("test")
+        assert graph.get_versions("test") == []
+        assert list(graph.graph.nodes) == [report, self.node2]
+        assert graph.stale_nodes() == {}
+        assert graph.properties.misses == 0
+
+        reloaded = Graph(session=self.session)
+        assert list(reloaded.graph.nodes) == [report, self.node2]
+        assert list(reloaded.graph.edges) == []
+
     def test_add_edge(self):
         # test adding an edge between two nodes.
         self.graph.add_node(self.node)
@@ -148,6 +229,22 @@ class TestGraph:
         assert self.graph.get_node("test", version=2) == self.node4
         assert self.graph.get_node("test", version=3) is None
 
+    def test_nodes_are_canonical(self):
+        self.graph.add_node(self.node)
+        self.graph.add_edge(Node("test"), self.node2)
+        self.graph.add_edges([(Node("test2"), Node("test3"))])
+        assert all(node is self.node for node in self.graph.graph if node == self.node)
+        assert self.graph.upstream(self.node3) == {self.node, self.node2}
+        assert next(iter(self.graph.upstream(self.node2))) is self.node
+
+        # after a reload every edge endpoint is the same object as its node.
+        graph = Graph(session=self.session)
+        node = graph.get_node("test")
+        assert all(
+            from_node is node for from_node, _ in graph.graph.edges if from_node == node
+        )
+        assert node.properties is graph.get_node("test2").properties
+
     def test_get_latest_version(self):
         self.graph.add_node(self.node)
         self.graph.add_node(self.node2)
@@ -158,3 +255,655 @@ class TestGraph:
         assert self.graph.get_latest_version("test") == self.node4
         assert self.graph.get_latest_version("test2") == self.node2
         assert self.graph.get_latest_version("test3") is None
+
+    def test_get_versions(self):
+        node5 = Node("test", version=5)
+        self.graph.add_node(self.node4)
+        self.graph.add_node(node5)
+        self.graph.add_node(self.node)
+        self.graph.add_node(self.node2)
+        assert self.graph.get_versions("test") == [self.node, self.node4, node5]
+        assert self.graph.get_versions("test", start=2) == [self.node4, node5]
+        assert self.graph.get_versions("test", end=4) == [self.node, self.node4]
+        assert self.graph.get_versions("test", start=2, end=2) == [self.node4]
+        assert self.graph.get_versions("test3") == []
+
+        self.graph.remove_node(node5)
+        assert self.graph.get_versions("test") == [self.node, self.node4]
+        assert self.graph.get_latest_version("test") == self.node4
+
+    def test_lookups_after_add_edge_and_load(self):
+        self.graph.add_edge(self.node, self.node4)
+        assert self.graph.get_node("test", version=2) == self.node4
+        assert self.graph.get_latest_version("test") == self.node4
+
+        graph = Graph(session=self.session)
+        assert graph.get_node("test") == self.node
+        assert graph.get_latest_version("test") == self.node4
+
+    def test_batch(self):
+        with self.graph.batch():
+            self.graph.add_node(self.node)
+            self.graph.add_edge(self.node2, self.node3)
+            assert self.node in self.graph.graph.nodes
+            assert self.session.query(NodeModel).count() == 0
+
+            with self.graph.batch():
+                self.graph.add_edge(self.node, self.node2)
+            assert self.session.query(EdgeModel).count() == 0
+
+        assert self.session.query(NodeModel).count() == 3
+        assert self.session.query(EdgeModel).count() == 2
+
+        # removing and re-adding within a batch keeps the rows.
+        with self.graph.batch():
+            self.graph.remove_edge(self.node, self.node2)
+            self.graph.add_edge(self.node, self.node2)
+            self.graph.remove_node(self.node4)
+        assert self.session.query(NodeModel).count() == 3
+        assert self.session.query(EdgeModel).count() == 2
+
+    def test_batch_rolls_back_on_error(self):
+        self.graph.add_node(self.node)
+
+        with pytest.raises(RuntimeError):
+            with self.graph.batch():
+                self.graph.add_edge(self.node, self.node2)
+                raise RuntimeError
+
+        assert list(self.graph.graph.nodes) == [self.node]
+        assert list(self.graph.graph.edges) == []
+        assert self.graph.get_node("test2") is None
+        assert self.session.query(NodeModel).count() == 1
+        assert self.session.query(EdgeModel).count() == 0
+
+    def test_add_nodes(self):
+        self.graph.add_nodes([self.node, self.node2, self.node, self.node4])
+        assert list(self.graph.graph.nodes) == [self.node, self.node2, self.node4]
+        assert self.graph.get_latest_version("test") == self.node4
+        assert self.session.query(NodeModel).count() == 3
+
+        with pytest.raises(
+            TypeError, match="Only instances of Node can be added to the graph"
+        ):
+            self.graph.add_nodes([self.node3, "test"])
+        assert self.node3 not in self.graph.graph.nodes
+        assert self.session.query(NodeModel).count() == 3
+
+    def test_add_edges(self):
+        self.graph.add_node(self.node)
+        self.graph.add_edges(
+            [(self.node, self.node2), (self.node2, self.node3), (self.node, self.node2)]
+        )
+        assert list(self.graph.graph.edges) == [
+            (self.node, self.node2),
+            (self.node2, self.node3),
+        ]
+        assert self.session.query(NodeModel).count() == 3
+        assert self.session.query(EdgeModel).count() == 2
+        assert self.graph.is_cyclic_with_edge(self.node3, self.node)
+
+        with pytest.raises(
+            TypeError, match="Only instances of Node can be added to the graph"
+        ):
+            self.graph.add_edges([(self.node, "test")])
+
+        # a cycle anywhere in the batch rejects the whole batch.
+        with pytest.raises(ValueError, match="Adding these edges would create a cycle"):
+            self.graph.add_edges([(self.node3, self.node4), (self.node4, self.node)])
+        assert self.node4 not in self.graph.graph.nodes
+        assert self.graph.get_node("test", version=2) is None
+        assert len(self.graph.graph.edges) == 2
+        assert self.session.query(EdgeModel).count() == 2
+
+    def test_add_node_twice_does_not_duplicate_rows(self):
+        self.graph.add_node(self.node)
+        self.graph.add_node(self.node)
+        self.graph.add_edge(self.node, self.node2)
+        self.graph.add_edge(self.node, self.node2)
+        assert self.session.query(NodeModel).count() == 2
+        assert self.session.query(EdgeModel).count() == 1
+
+    def test_subgraph(self):
+        node5 = Node("test5")
+        self.graph.add_edge(self.node, self.node2)
+        self.graph.add_edge(self.node2, self.node3)
+        self.graph.add_edge(self.node4, self.node2)
+        self.graph.add_edge(self.node3, node5)
+
+        subgraph = self.graph.subgraph(self.node2)
+        assert set(subgraph.nodes) == {
+            self.node,
+            self.node2,
+            self.node3,
+            self.node4,
+            node5,
+        }
+        assert subgraph is not self.graph.graph
+
+        subgraph = self.graph.subgraph(self.node2, direction="downstream", depth=1)
+        assert set(subgraph.nodes) == {self.node2, self.node3}
+        assert list(subgraph.edges) == [(self.node2, self.node3)]
+
+        subgraph = self.graph.subgraph(self.node3, direction="upstream")
+        assert set(subgraph.nodes) == {self.node, self.node2, self.node3, self.node4}
+
+        subgraph = self.graph.subgraph(self.node2, depth=0)
+        assert list(subgraph.nodes) == [self.node2]
+
+        with pytest.raises(ValueError, match="Unknown direction: sideways"):
+            self.graph.subgraph(self.node2, direction="sideways")
+        with pytest.raises(KeyError):
+            self.graph.subgraph(Node("missing"))
+
+    def test_upstream_and_downstream(self):
+        node5 = Node("test5")
+        self.graph.add_edge(self.node, self.node2)
+        self.graph.add_edge(self.node2, self.node3)
+        self.graph.add_edge(self.node4, self.node2)
+
+        assert self.graph.upstream(self.node3) == {self.node, self.node2, self.node4}
+        assert self.graph.upstream(self.node3, depth=1) == {self.node2}
+        assert self.graph.downstream(self.node) == {self.node2, self.node3}
+        assert self.graph.downstream(self.node, depth=1) == {self.node2}
+        assert self.graph.downstream(self.node3) == frozenset()
+
+        # cached closures follow every mutation.
+        self.graph.add_edge(self.node3, node5)
+        assert self.graph.downstream(self.node) == {self.node2, self.node3, node5}
+        assert self.graph.upstream(node5) == {
+            self.node,
+            self.node2,
+            self.node3,
+            self.node4,
+        }
+
+        self.graph.remove_edge(self.node2, self.node3)
+        assert self.graph.downstream(self.node) == {self.node2}
+        assert self.graph.upstream(node5) == {self.node3}
+
+        self.graph.remove_node(self.node2)
+        assert self.graph.downstream(self.node) == frozenset()
+        assert self.graph.downstream(self.node4) == frozenset()
+
+        self.graph.add_edges([(self.node, self.node3), (self.node4, self.node)])
+        assert self.graph.upstream(node5) == {self.node, self.node3, self.node4}
+
+        with pytest.raises(KeyError):
+            self.graph.upstream(self.node2)
+        with pytest.raises(KeyError):
+            self.graph.downstream(self.node2, depth=1)
+
+    def test_properties_are_loaded_lazily(self):
+        self.graph.add_node(BigQueryTable("test", rows=1))
+        self.graph.add_edge(Node("test2"), PostgresTable("test3", columns=["id"]))
+
+        graph = Graph(session=self.session)
+        node = graph.get_node("test")
+        assert node.lazy_properties
+        assert len(graph.properties) == 0
+
+        assert node.properties == {"rows": 1}
+        assert graph.get_node("test2").properties == {}
+        assert len(graph.properties) == 2
+
+        graph.properties.clear()
+        graph.prefetch_properties(graph.graph.nodes)
+        assert len(graph.properties) == 3
+        assert graph.get_node("test3").properties == {"columns": ["id"]}
+        assert graph.properties.misses == 2
+
+        # writing lazy nodes back does not touch their stored properties.
+        graph.add_edge(node, graph.get_node("test2"))
+        assert Graph(session=self.session).get_node("test").properties == {"rows": 1}
+
+    def test_removed_lazy_node_keeps_its_properties(self):
+        self.graph.add_node(BigQueryTable("test", rows=1))
+        graph = Graph(session=self.session)
+        node = graph.get_node("test")
+
+        with graph.batch():
+            graph.remove_node(BigQueryTable("test"))
+            assert not node.lazy_properties
+            graph.add_node(node)
+
+        assert Graph(session=self.session).get_node("test").properties == {"rows": 1}
+
+    def test_export(self):
+        self.graph.add_edge(BigQueryTable("b", rows=1), Node("c"))
+        self.graph.add_edge(Node("a"), BigQueryTable("b", rows=1))
+        self.graph.add_node(Node("a", version=2))
+
+        lines = list(self.graph.export())
+        assert all(line.endswith("\n") for line in lines)
+        items = [json.loads(line) for line in lines]
+        assert items == [
+            {
+                "type": "node",
+                "ntype": "Node",
+                "name": "a",
+                "version": 1,
+                "properties": {},
+            },
+            {
+                "type": "node",
+                "ntype": "Node",
+                "name": "a",
+                "version": 2,
+                "properties": {},
+            },
+            {
+                "type": "node",
+                "ntype": "BigQueryTable",
+                "name": "b",
+                "version": 1,
+                "properties": {"rows": 1},
+            },
+            {
+                "type": "node",
+                "ntype": "Node",
+                "name": "c",
+                "version": 1,
+                "properties": {},
+            },
+            {
+                "type": "edge",
+                "upstream": {"ntype": "Node", "name": "a", "version": 1},
+                "downstream": {"ntype": "BigQueryTable", "name": "b", "version": 1},
+            },
+            {
+                "type": "edge",
+                "upstream": {"ntype": "BigQueryTable", "name": "b", "version": 1},
+                "downstream": {"ntype": "Node", "name": "c", "version": 1},
+            },
+        ]
+
+    def test_import_stream(self):
+        self.graph.add_edge(BigQueryTable("b", rows=1), Node("c"))
+        self.graph.add_edge(Node("a"), BigQueryTable("b", rows=1))
+        self.graph.add_node(Node("a", version=2))
+        lines = list(self.graph.export())
+
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        graph = Graph(session=session)
+        graph.import_stream(line.encode() for line in lines)
+
+        assert set(graph.graph.nodes) == set(self.graph.graph.nodes)
+        assert set(graph.graph.edges) == set(self.graph.graph.edges)
+        assert graph.get_node("b").properties == {"rows": 1}
+        assert list(Graph(session=session).export()) == lines
+
+    def test_import_stream_is_atomic(self):
+        self.graph.add_node(self.node)
+        lines = [
+            '{"type":"node","ntype":"Node","name":"b","version":1}',
+            '{"type":"edge","upstream":{"ntype":"Node","name":"b"},'
+            '"downstream":{"ntype":"Node","name":"c"}}',
+            '{"type":"edge","upstream":{"ntype":"Node","name":"c"},'
+            '"downstream":{"ntype":"Node","name":"b"}}',
+        ]
+        with pytest.raises(ValueError, match="would create a cycle"):
+            self.graph.import_stream(lines)
+        assert set(self.graph.graph.nodes) == {self.node}
+        assert self.session.query(NodeModel).count() == 1
+
+        with pytest.raises(ValueError, match="Invalid line 2"):
+            self.graph.import_stream(lines[:1] + ["not json"])
+        with pytest.raises(ValueError, match="Unknown item type: graph"):
+            self.graph.import_stream(['{"type":"graph"}'])
+        assert set(self.graph.graph.nodes) == {self.node}
+
+    def test_load_from_snapshot(self, tmp_path):
+        path = str(tmp_path / "graph.snapshot")
+        self.graph.add_edge(BigQueryTable("a", rows=1), Node("b"))
+        self.graph.add_edge(Node("b"), Node("c"))
+        self.graph.save_snapshot(path)
+
+        # changes made after the snapshot are replayed from the database.
+        self.graph.add_edge(Node("c"), Node("d"))
+        self.graph.add_edge(BigQueryTable("a"), Node("d"))
+
+        graph = Graph(session=self.session, snapshot_path=path)
+        assert set(graph.graph.nodes) == set(self.graph.graph.nodes)
+        assert set(graph.graph.edges) == set(self.graph.graph.edges)
+        assert graph.get_node("a").properties == {"rows": 1}
+        assert graph.get_node("a").ntype == "BigQueryTable"
+        assert graph.downstream(graph.get_node("a")) == {
+            Node("b"),
+            Node("c"),
+            Node("d"),
+        }
+
+        with pytest.raises(ValueError, match="would create a cycle"):
+            graph.add_edge(Node("d"), BigQueryTable("a"))
+
+    def test_stale_or_missing_snapshot_falls_back_to_the_database(self, tmp_path):
+        path = str(tmp_path / "graph.snapshot")
+        graph = Graph(session=self.session, snapshot_path=path)
+        assert graph.graph.number_of_nodes() == 0
+
+        self.graph.add_edge(Node("a"), Node("b"))
+        self.graph.save_snapshot(path)
+        self.graph.remove_node(Node("b"))
+
+        graph = Graph(session=self.session, snapshot_path=path)
+        assert set(graph.graph.nodes) == {Node("a")}
+        assert graph.graph.number_of_edges() == 0
+
+    def test_snapshot_is_stale_when_ids_are_reused(self, tmp_path):
+        path = str(tmp_path / "graph.snapshot")
+        self.graph.add_node(Node("a"))
+        self.graph.add_node(Node("old"))
+        self.graph.save_snapshot(path)
+        # SQLite gives the new node the id of the removed one.
+        self.graph.remove_node(Node("old"))
+        self.graph.add_node(Node("new"))
+
+        graph = Graph(session=self.session, snapshot_path=path)
+        assert set(graph.graph.nodes) == {Node("a"), Node("new")}
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError, match="Unknown backend: igraph"):
+            Graph(session=self.session, backend="igraph")
+
+    def test_csr_backend(self):
+        pytest.importorskip("numpy")
+        self.graph.add_edge(self.node, self.node2)
+        self.graph.add_edge(self.node2, self.node3)
+        self.graph.add_edge(self.node4, self.node2)
+
+        graph = Graph(session=self.session, backend="csr")
+        assert graph.upstream(self.node3) == self.graph.upstream(self.node3)
+        assert graph.upstream(self.node3, depth=1) == {self.node2}
+        assert graph.downstream(self.node) == self.graph.downstream(self.node)
+        assert set(graph.subgraph(self.node2).edges) == set(
+            self.graph.subgraph(self.node2).edges
+        )
+        order = graph.topological_sort()
+        assert (
+            order.index(self.node) < order.index(self.node2) < order.index(self.node3)
+        )
+
+        # writes are visible to the next read.
+        node5 = Node("test5")
+        graph.add_edge(self.node3, node5)
+        assert graph.downstream(self.node) == {self.node2, self.node3, node5}
+        graph.remove_edge(self.node2, self.node3)
+        assert graph.upstream(node5) == {self.node3}
+        with pytest.raises(KeyError):
+            graph.upstream(Node("missing"))
+
+    def test_csr_rebuilds_are_spaced_out(self, monkeypatch):
+        pytest.importorskip("numpy")
+        self.graph.add_edge(self.node, self.node2)
+        graph = Graph(session=self.session, backend="csr")
+        monkeypatch.setattr(graph_module, "CSR_REBUILD_FACTOR", 1_000_000)
+        built = []
+        build = graph_module.CSRGraph.from_networkx
+
+        def from_networkx(nx_graph):
+            built.append(nx_graph.number_of_edges())
+            return build(nx_graph)
+
+        monkeypatch.setattr(graph_module.CSRGraph, "from_networkx", from_networkx)
+
+        assert graph.downstream(self.node) == {self.node2}
+        assert graph.downstream(self.node) == {self.node2}
+        assert built == [1]
+
+        # reads between rebuilds are answered from the nx.DiGraph.
+        graph.add_edge(self.node2, self.node3)
+        assert graph.downstream(self.node) == {self.node2, self.node3}
+        assert graph.topological_sort().index(self.node3) == 2
+        assert built == [1]
+
+        graph._csr_next_build = 0.0
+        assert graph.downstream(self.node) == {self.node2, self.node3}
+        assert built == [1, 2]
+
+    def test_topological_sort(self):
+        self.graph.add_edge(self.node3, self.node2)
+        self.graph.add_edge(self.node2, self.node)
+        self.graph.add_node(self.node4)
+        order = self.graph.topological_sort()
+        assert len(order) == 4
+        assert (
+            order.index(self.node3) < order.index(self.node2) < order.index(self.node)
+        )
+
+    def test_stale_nodes_and_latest_dependencies(self):
+        table = BigQueryTable("table")
+        report = Node("report")
+        self.graph.add_edge(self.node, report)
+        self.graph.add_edge(table, report)
+        assert self.graph.stale_nodes() == {}
+        assert self.graph.latest_dependencies(report) == {
+            self.node: self.node,
+            table: table,
+        }
+
+        # a newer version of test makes report stale.
+        self.graph.add_node(self.node4)
+        assert self.graph.stale_nodes() == {report: {self.node}}
+        assert self.graph.latest_dependencies(report) == {
+            self.node: self.node4,
+            table: table,
+        }
+
+        self.graph.add_edges([(self.node, self.node2)])
+        assert self.graph.stale_nodes() == {
+            report: {self.node},
+            self.node2: {self.node},
+        }
+
+        # rebuilding report on the latest version clears it.
+        self.graph.remove_edge(self.node, report)
+        self.graph.add_edge(self.node4, report)
+        assert self.graph.stale_nodes() == {self.node2: {self.node}}
+
+        self.graph.remove_node(self.node4)
+        assert self.graph.stale_nodes() == {}
+        assert Graph(session=self.session).stale_nodes() == {}
+
+        with pytest.raises(KeyError):
+            self.graph.latest_dependencies(Node("missing"))
+
+    def test_rebuild_plan(self):
+        # raw -> staged -> report, raw -> audit, slow -> report, plus an
+        # unrelated branch that is left out of the plan.
+        raw = BigQueryTable("raw", runtime=1)
+        staged = BigQueryTable("staged", runtime=2)
+        audit = BigQueryTable("audit", runtime=10)
+        slow = BigQueryTable("slow", runtime=30)
+        report = BigQueryTable("report", runtime=4)
+        self.graph.add_edges(
+            [(raw, staged), (staged, report), (raw, audit), (slow, report)]
+        )
+        self.graph.add_edge(self.node, self.node2)
+
+        assert self.graph.rebuild_plan([raw]) == [[raw], [staged, audit], [report]]
+        # staged leads a longer chain than audit, unless costs say otherwise.
+        assert self.graph.rebuild_plan([raw], cost="runtime") == [
+            [raw],
+            [audit, staged],
+            [report],
+        ]
+        assert self.graph.rebuild_plan([raw, slow], cost="runtime") == [
+            [slow, raw],
+            [audit, staged],
+            [report],
+        ]
+        # a changed node downstream of another only adds its own descendants.
+        assert self.graph.rebuild_plan([staged, raw]) == self.graph.rebuild_plan([raw])
+        assert self.graph.rebuild_plan([report]) == [[report]]
+        assert self.graph.rebuild_plan([]) == []
+
+        # plans follow changes to the graph.
+        self.graph.add_edge(audit, report)
+        assert self.graph.rebuild_plan([raw]) == [[raw], [audit, staged], [report]]
+        self.graph.add_edge(staged, audit)
+        assert self.graph.rebuild_plan([raw]) == [[raw], [staged], [audit], [report]]
+
+        # properties of lazily loaded nodes are read for their costs.
+        graph = Graph(session=self.session)
+        assert graph.rebuild_plan([slow, raw], cost="runtime") == [
+            [slow, raw],
+            [staged],
+            [audit],
+            [report],
+        ]
+
+        with pytest.raises(KeyError):
+            self.graph.rebuild_plan([Node("missing")])
+
+    def test_sync(self):
+        replica = Graph(session=Session(bind=self.engine))
+        self.graph.add_edge(BigQueryTable("a", rows=1), Node("b"))
+        self.graph.add_edge(Node("b"), Node("c"))
+        self.graph.add_node(Node("a", version=2))
+        revision = replica.revision
+
+        # the endpoint "b" of the second edge already exists, so it is not logged.
+        assert replica.sync() == 6
+        assert set(replica.graph.nodes) == set(self.graph.graph.nodes)
+        assert set(replica.graph.edges) == set(self.graph.graph.edges)
+        assert replica.get_node("a").ntype == "BigQueryTable"
+        assert replica.get_node("a").properties == {"rows": 1}
+        assert replica.downstream(replica.get_node("a")) == {Node("b"), Node("c")}
+        assert replica.revision > revision
+        assert replica.sequence == self.graph._last_sequence()
+
+        # only the entries after the last one seen are replayed.
+        assert replica.sync() == 0
+        self.graph.remove_edge(Node("b"), Node("c"))
+        self.graph.remove_node(BigQueryTable("a"))
+        assert replica.sync() == 2
+        assert set(replica.graph.nodes) == {Node("a", version=2), Node("b"), Node("c")}
+        assert replica.graph.number_of_edges() == 0
+        assert replica.downstream(Node("b")) == set()
+
+        # the instance's own writes are skipped.
+        replica.add_edge(Node("c"), Node("b"))
+        assert replica.sync() == 0
+        assert set(replica.graph.edges) == {(Node("c"), Node("b"))}
+        assert self.graph.sync() == 1
+        assert set(self.graph.graph.edges) == {(Node("c"), Node("b"))}
+
+    def test_sync_skips_own_writes(self):
+        # Replaying them would close a cycle, and bring back a removed node.
+        self.graph.add_edge(Node("a"), Node("b"))
+        self.graph.remove_edge(Node("a"), Node("b"))
+        self.graph.add_edge(Node("b"), Node("a"))
+        self.graph.add_node(Node("x"))
+        self.graph.remove_node(Node("x"))
+        assert self.graph.sync() == 0
+        assert self.graph.sequence == self.graph._last_sequence()
+        assert set(self.graph.graph.edges) == {(Node("b"), Node("a"))}
+        assert Node("x") not in self.graph.graph
+
+        # entries after those of another writer wait for sync() to replay them.
+        other = Graph(session=Session(bind=self.engine))
+        other.add_node(Node("c"))
+        self.graph.add_node(Node("d"))
+        assert self.graph.sequence < self.graph._last_sequence()
+        self.graph.remove_node(Node("d"))
+        assert self.graph.sync() == 1
+        assert set(self.graph.graph.nodes) == {Node("a"), Node("b"), Node("c")}
+        assert self.graph.sequence == self.graph._last_sequence()
+        assert other.sync() == 2
+        assert set(other.graph.nodes) == {Node("a"), Node("b"), Node("c")}
+
+    def test_sync_replays_own_writes_after_others(self):
+        # other removes "a" before this graph, unaware, adds an edge from it:
+        # the edge brings "a" back, in the database and after sync().
+        self.graph.add_node(Node("a"))
+        other = Graph(session=Session(bind=self.engine))
+        self.graph.remove_node(Node("a"))
+        other.add_edge(Node("a"), Node("b"))
+        assert other.sync() == 1
+        assert set(other.graph.nodes) == {Node("a"), Node("b")}
+        assert set(other.graph.edges) == {(Node("a"), Node("b"))}
+        assert self.graph.sync() == 3
+        assert set(self.graph.graph.edges) == {(Node("a"), Node("b"))}
+
+    def test_sync_converges(self):
+        rng = random.Random(0)
+        writers = [Graph(session=Session(bind=self.engine)) for _ in range(2)]
+        names = "abcdef"
+        for _ in range(300):
+            writer = rng.choice(writers)
+            operation = rng.randrange(5)
+            if operation == 0:
+                writer.add_node(Node(rng.choice(names)))
+            elif operation == 1:
+                writer.remove_node(Node(rng.choice(names)))
+            elif operation in (2, 3):
+                # edges only run forward, so that the writers cannot close a
+                # cycle between them.
+                from_name, to_name = sorted(rng.sample(names, 2))
+                if operation == 2:
+                    writer.add_edge(Node(from_name), Node(to_name))
+                else:
+                    writer.remove_edge(Node(from_name), Node(to_name))
+            else:
+                writer.sync()
+
+        loaded = Graph(session=Session(bind=self.engine))
+        for writer in writers:
+            writer.sync()
+            assert set(writer.graph.nodes) == set(loaded.graph.nodes)
+            assert set(writer.graph.edges) == set(loaded.graph.edges)
+
+    def test_sync_picks_up_late_commits(self):
+        # As on PostgreSQL, where an entry can commit after one with a
+        # higher id.
+        replica = Graph(session=Session(bind=self.engine))
+        for change_id, name in ((10, "a"), (5, "b")):
+            self.session.add(NodeModel(ntype="Node", name=name, version=1))
+            self.session.add(
+                ChangeModel(
+                    id=change_id,
+                    operation="add_node",
+                    ntype="Node",
+                    name=name,
+                    version=1,
+                )
+            )
+            self.session.commit()
+            assert replica.sync() == 1
+        assert set(replica.graph.nodes) == {Node("a"), Node("b")}
+        assert replica.sequence == 10
+        assert replica.sync() == 0
+
+    def test_seen_changes_are_bounded(self, monkeypatch):
+        monkeypatch.setattr(graph_module, "SEEN_CHANGES_LIMIT", 10)
+        other = Graph(session=Session(bind=self.engine))
+        other.add_node(Node("a"))
+        # every entry of this graph now comes after one it has not replayed.
+        for version in range(1, 30):
+            self.graph.add_node(Node("b", version=version))
+            assert len(self.graph._seen_changes) <= 10
+        assert self.graph.sync() > 1
+        assert self.graph.sequence == self.graph._last_sequence()
+        assert len(self.graph.get_versions("b")) == 29
+        assert Node("a") in self.graph.graph
+
+    def test_sync_in_the_background(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'graph.db'}")
+        Base.metadata.create_all(engine)
+        writer = Graph(session=scoped_session(sessionmaker(bind=engine)))
+        replica = Graph(session=scoped_session(sessionmaker(bind=engine)))
+
+        replica.start_sync(0.01)
+        try:
+            writer.add_edge(Node("a"), Node("b"))
+            deadline = time.monotonic() + 5
+            while replica.sequence < writer._last_sequence():
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+        finally:
+            replica.stop_sync()
+        assert set(replica.graph.edges) == {(Node("a"), Node("b"))}
+        engine.dispose()
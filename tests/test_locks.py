@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from data_version_graph.locks import ReadWriteLock
+
+
+class TestReadWriteLock:
+    def setup_method(self) -> None:
+        self.lock = ReadWriteLock()
+
+    def teardown_method(self) -> None:
+        del self.lock
+
+    def test_readers_share_the_lock(self) -> None:
+        inside = threading.Barrier(3, timeout=5)
+
+        def reader() -> None:
+            with self.lock.read():
+                inside.wait()
+
+        threads = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        inside.wait()  # all readers hold the lock at the same time.
+        for thread in threads:
+            thread.join()
+
+    def test_writer_excludes_readers(self) -> None:
+        events: list[str] = []
+        writer_inside = threading.Event()
+
+        def writer() -> None:
+            with self.lock.write():
+                writer_inside.set()
+                time.sleep(0.05)
+                events.append("write")
+
+        def reader() -> None:
+            writer_inside.wait()
+            with self.lock.read():
+                events.append("read")
+
+        threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert events == ["write", "read"]
+
+    def test_waiting_writer_blocks_new_readers(self) -> None:
+        events: list[str] = []
+        release_reader = threading.Event()
+
+        def writer() -> None:
+            with self.lock.write():
+                events.append("write")
+
+        with self.lock.read():
+            writer_thread = threading.Thread(target=writer)
+            writer_thread.start()
+            while not self.lock._waiting_writers:
+                time.sleep(0.001)
+
+            def reader() -> None:
+                with self.lock.read():
+                    events.append("read")
+                release_reader.set()
+
+            reader_thread = threading.Thread(target=reader)
+            reader_thread.start()
+            time.sleep(0.02)
+            assert events == []
+
+        writer_thread.join()
+        reader_thread.join()
+        assert release_reader.is_set()
+        assert events == ["write", "read"]
+
+    def test_reentrancy(self) -> None:
+        with self.lock.write():
+            with self.lock.write():
+                with self.lock.read():
+                    pass
+        with self.lock.read():
+            with self.lock.read():
+                pass
+        assert self.lock._writer is None
+        assert self.lock._readers == {}
+
+    def test_upgrade_is_rejected(self) -> None:
+        with self.lock.read():
+            with pytest.raises(RuntimeError, match="Cannot upgrade a read lock"):
+                with self.lock.write():
+                    pass
+        with self.lock.write():
+            pass
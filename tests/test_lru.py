@@ -0,0 +1,40 @@
+from data_version_graph.lru import BoundedLRU
+
+
+def test_get_and_put() -> None:
+    lru: BoundedLRU[str, int] = BoundedLRU(10)
+    lru.put("a", 1, 3)
+    lru.put("b", 2, 3)
+    assert lru.get("a") == 1
+    assert lru.get("c") is None
+    assert "b" in lru
+    assert len(lru) == 2
+    assert lru.size == 6
+
+    # replacing a value releases the size of the old one.
+    lru.put("b", 3, 1)
+    assert lru.peek("b") == 3
+    assert lru.size == 4
+
+    assert lru.pop("a") == 1
+    assert lru.pop("a") is None
+    assert lru.size == 1
+    lru.clear()
+    assert len(lru) == 0
+    assert lru.size == 0
+
+
+def test_size_is_bounded() -> None:
+    lru: BoundedLRU[str, int] = BoundedLRU(10)
+    lru.put("a", 1, 4)
+    lru.put("b", 2, 4)
+    lru.get("a")  # used again, so b is the oldest
+    lru.peek("b")  # peeking does not count as a use
+    lru.put("c", 3, 4)
+    assert list(lru.items()) == [("a", 1), ("c", 3)]
+    assert lru.size == 8
+
+    # a value larger than the budget is not kept, and evicts nothing.
+    lru.put("d", 4, 11)
+    assert "d" not in lru
+    assert list(lru.items()) == [("a", 1), ("c", 3)]
@@ -0,0 +1,109 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from data_version_graph import metrics
+from data_version_graph.database import Base
+from data_version_graph.graph import Graph
+from data_version_graph.metrics import Counter, Histogram, Registry, timed
+from data_version_graph.nodes import Node
+
+
+@pytest.fixture
+def enabled():
+    metrics.REGISTRY.clear()
+    metrics.enable()
+    yield
+    metrics.disable()
+    metrics.REGISTRY.clear()
+
+
+def test_counter():
+    counter = Counter("requests_total", "Requests.", ("method",))
+    counter.inc("GET")
+    counter.inc("GET", amount=2)
+    counter.inc('P"OST')
+    assert counter.value("GET") == 3
+    assert list(counter.collect()) == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{method="GET"} 3',
+        'requests_total{method="P\\"OST"} 1',
+    ]
+
+
+def test_histogram():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), (0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, "/a")
+    assert histogram.count("/a") == 4
+    assert histogram.sum("/a") == pytest.approx(2.65)
+    assert list(histogram.collect()) == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 2.65',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_registry_render():
+    registry = Registry()
+    assert registry.counter("a_total", "A.") is registry.counter("a_total", "A.")
+    registry.counter("a_total", "A.").inc()
+    assert registry.render() == "# HELP a_total A.\n# TYPE a_total counter\na_total 1\n"
+    registry.clear()
+    assert registry.counter("a_total", "A.").value() == 0
+    with pytest.raises(TypeError, match="Metric 'a_total' is not a histogram"):
+        registry.histogram("a_total", "A.")
+
+
+def test_timed_is_a_no_op_when_disabled():
+    @timed
+    def double(value):
+        return value * 2
+
+    metrics.REGISTRY.clear()
+    assert double(2) == 4
+    assert metrics.OPERATION_SECONDS.count(double.__qualname__) == 0
+
+
+def test_timed(enabled):
+    @timed
+    def double(value):
+        return value * 2
+
+    @timed
+    def count(n):
+        yield from range(n)
+
+    assert double(2) == 4
+    assert list(count(3)) == [0, 1, 2]
+    assert metrics.OPERATION_SECONDS.count(double.__qualname__) == 1
+    assert metrics.OPERATION_SECONDS.count(count.__qualname__) == 1
+
+
+def test_graph_operations_and_queries(enabled):
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    graph = Graph(session=session)
+
+    queries = metrics.SQL_QUERIES.value("Graph.add_edge")
+    graph.add_edge(Node("a"), Node("b"))
+    assert metrics.OPERATION_SECONDS.count("Graph.add_edge") == 1
+    # nested operations are timed, and their queries count towards add_edge.
+    assert metrics.OPERATION_SECONDS.count("WriteBuffer.flush") == 1
+    assert metrics.SQL_QUERIES.value("Graph.add_edge") > queries
+    assert metrics.SQL_QUERIES.value("WriteBuffer.flush") == 0
+
+    graph.upstream(Node("b"))
+    assert metrics.OPERATION_SECONDS.count("Graph.upstream") == 1
+    assert metrics.SQL_QUERIES.value("Graph.upstream") == 0
+
+    assert 'graph_operation_seconds_count{operation="Graph.add_edge"} 1' in (
+        metrics.REGISTRY.render()
+    )
+    session.close()
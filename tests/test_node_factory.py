@@ -1,14 +1,38 @@
 import pytest
 
+from data_version_graph import node_factory
 from data_version_graph.node_factory import NodeFactory
 from data_version_graph.nodes import (
+    EMPTY_PROPERTIES,
+    NODE_TYPES,
     BigQueryTable,
     GoogleCloudStorageObject,
     Node,
     PostgresTable,
+    PropertyLoader,
 )
 
 
+@pytest.fixture
+def registry(monkeypatch):
+    saved = dict(NODE_TYPES)
+    monkeypatch.setattr(node_factory, "_discovered", False)
+    yield NODE_TYPES
+    NODE_TYPES.clear()
+    NODE_TYPES.update(saved)
+
+
+class FakePropertyLoader(PropertyLoader):
+    def load(self, node):
+        return {"rows": 1}
+
+
+class FakeEntryPoint:
+    def __init__(self, name, load):
+        self.name = name
+        self.load = load
+
+
 class TestNodeFactory:
     def test_create(self):
         node = NodeFactory.create("Node", name="test")
@@ -43,3 +67,103 @@ class TestNodeFactory:
 
         with pytest.raises(ValueError, match="Unknown node type: test"):
             NodeFactory.create("test", name="test")
+
+    def test_create_with_properties(self):
+        node = NodeFactory.create("BigQueryTable", name="test", properties={"rows": 1})
+        assert node.properties == {"rows": 1}
+
+        node = NodeFactory.create("BigQueryTable", name="test")
+        assert node.properties is EMPTY_PROPERTIES
+
+        node = NodeFactory.create("Node", name="test", properties={"rows": 1})
+        assert node.properties == {"rows": 1}
+
+        # properties named like the node's own fields are kept as properties.
+        node = NodeFactory.create(
+            "BigQueryTable", name="test", properties={"name": "other", "version": 3}
+        )
+        assert node.name == "test"
+        assert node.version == 1
+        assert node.properties == {"name": "other", "version": 3}
+
+    def test_subclasses_are_registered(self, registry):
+        class SnowflakeTable(Node):
+            __slots__ = ()
+
+        assert registry["SnowflakeTable"] is SnowflakeTable
+        node = NodeFactory.create("SnowflakeTable", name="test", version=2)
+        assert isinstance(node, SnowflakeTable)
+        assert node.ntype == "SnowflakeTable"
+        assert node.version == 2
+
+    def test_create_many(self):
+        rows = [
+            ("BigQueryTable", "test", 1),
+            ("PostgresTable", "test2", 2),
+            ("BigQueryTable", "test3", 1, {"rows": 1}),
+            ("Node", "test4", 1, None),
+        ]
+        nodes = list(NodeFactory.create_many(rows))
+        assert nodes == [
+            BigQueryTable("test"),
+            PostgresTable("test2", version=2),
+            BigQueryTable("test3"),
+            Node("test4"),
+        ]
+        assert [node.ntype for node in nodes] == [row[0] for row in rows]
+        assert nodes[2].properties == {"rows": 1}
+        assert nodes[3].properties is EMPTY_PROPERTIES
+
+        (node,) = NodeFactory.create_many([("Node", "test", 2, {"name": "other"})])
+        assert node == Node("test", version=2)
+        assert node.properties == {"name": "other"}
+
+        with pytest.raises(ValueError, match="Unknown node type: test"):
+            list(NodeFactory.create_many([("test", "test", 1)]))
+
+        with pytest.raises(TypeError, match="abstract"):
+            PropertyLoader()
+
+        loader = FakePropertyLoader()
+        nodes = list(
+            NodeFactory.create_many(
+                [("Node", "test", 1), ("Node", "test2", 1, {"rows": 1})],
+                properties=loader,
+            )
+        )
+        assert nodes[0].lazy_properties
+        assert nodes[0].properties == {"rows": 1}
+        assert not nodes[1].lazy_properties
+
+    def test_entry_point_discovery(self, registry, monkeypatch):
+        def load_s3_object():
+            class S3Object(Node):
+                __slots__ = ()
+
+            return S3Object
+
+        calls = []
+
+        def fake_entry_points(group):
+            calls.append(group)
+            return [FakeEntryPoint("s3", load_s3_object)]
+
+        monkeypatch.setattr(node_factory, "entry_points", fake_entry_points)
+        node = NodeFactory.create("S3Object", name="test")
+        assert node.ntype == "S3Object"
+        assert calls == [node_factory.ENTRY_POINT_GROUP]
+
+        # discovery runs once; known types never trigger it.
+        NodeFactory.create("S3Object", name="test")
+        with pytest.raises(ValueError, match="Unknown node type: test"):
+            NodeFactory.create("test", name="test")
+        assert len(calls) == 1
+
+    def test_entry_point_must_be_a_node_type(self, registry, monkeypatch):
+        monkeypatch.setattr(
+            node_factory,
+            "entry_points",
+            lambda group: [FakeEntryPoint("broken", lambda: dict)],
+        )
+        with pytest.raises(TypeError, match="'broken' is not a subclass of Node"):
+            NodeFactory.create("test", name="test")
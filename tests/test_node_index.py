@@ -0,0 +1,77 @@
+from data_version_graph.node_index import NodeIndex
+from data_version_graph.nodes import BigQueryTable, Node
+
+
+class TestNodeIndex:
+    def setup_method(self) -> None:
+        self.node = Node("test")
+        self.node2 = Node("test", version=2)
+        self.node3 = Node("test", version=3)
+        self.node4 = Node("test2")
+        self.index = NodeIndex([self.node3, self.node, self.node4])
+
+    def teardown_method(self) -> None:
+        del self.index
+
+    def test_init(self) -> None:
+        assert len(self.index) == 3
+        assert self.node in self.index
+        assert self.node2 not in self.index
+        assert "test" not in self.index
+
+    def test_add(self) -> None:
+        self.index.add(self.node2)
+        assert self.index.get("test", 2) is self.node2
+        assert self.index.versions("test") == [self.node, self.node2, self.node3]
+
+        # adding an existing key keeps the first node.
+        self.index.add(BigQueryTable("test", version=2))
+        assert self.index.get("test", 2) is self.node2
+        assert len(self.index) == 4
+
+    def test_canonical(self) -> None:
+        assert self.index.canonical(Node("test", version=3)) is self.node3
+        assert self.index.canonical(self.node2) is self.node2
+
+        other = BigQueryTable("test")
+        assert self.index.canonical(other) is other
+
+    def test_previous(self) -> None:
+        assert self.index.previous("test", 3) is self.node
+        assert self.index.previous("test", 2) is self.node
+        assert self.index.previous("test", 1) is None
+        assert self.index.previous("missing", 1) is None
+
+    def test_remove(self) -> None:
+        self.index.remove(self.node3)
+        assert self.index.get("test", 3) is None
+        assert self.index.latest("test") == self.node
+
+        # removing a node of another type with the same key is a no-op.
+        self.index.remove(BigQueryTable("test"))
+        assert self.index.get("test", 1) is self.node
+
+        self.index.remove(self.node)
+        assert self.index.latest("test") is None
+        assert self.index.versions("test") == []
+
+        self.index.remove(self.node)
+        assert len(self.index) == 1
+
+    def test_get(self) -> None:
+        assert self.index.get("test", 1) is self.node
+        assert self.index.get("test", 2) is None
+        assert self.index.get("test3", 1) is None
+
+    def test_latest(self) -> None:
+        assert self.index.latest("test") is self.node3
+        assert self.index.latest("test2") is self.node4
+        assert self.index.latest("test3") is None
+
+    def test_versions(self) -> None:
+        assert self.index.versions("test") == [self.node, self.node3]
+        assert self.index.versions("test", start=2) == [self.node3]
+        assert self.index.versions("test", end=2) == [self.node]
+        assert self.index.versions("test", start=1, end=3) == [self.node, self.node3]
+        assert self.index.versions("test", start=4) == []
+        assert self.index.versions("test3") == []
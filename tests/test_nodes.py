@@ -1,4 +1,7 @@
+import pytest
+
 from data_version_graph.nodes import (
+    EMPTY_PROPERTIES,
     BigQueryTable,
     GoogleCloudStorageObject,
     Node,
@@ -138,3 +141,32 @@ class TestGoogleCloudStorageObject:
         assert hash(self.node) == hash(("GoogleCloudStorageObject", "test_node", 1))
         assert hash(self.node2) == hash(("GoogleCloudStorageObject", "test_node2", 1))
         assert hash(self.node3) == hash(("GoogleCloudStorageObject", "test_node", 2))
+
+
+class TestNodeLayout:
+    def test_slots(self) -> None:
+        for node_class in (
+            Node,
+            BigQueryTable,
+            PostgresTable,
+            GoogleCloudStorageObject,
+        ):
+            node = node_class(name="test_node")
+            assert not hasattr(node, "__dict__")
+            with pytest.raises(AttributeError):
+                node.colour = "red"
+
+    def test_empty_properties_are_shared(self) -> None:
+        node = Node(name="test_node")
+        node2 = BigQueryTable(name="test_node2")
+        assert node.properties == {}
+        assert node.properties is node2.properties is EMPTY_PROPERTIES
+        with pytest.raises(TypeError):
+            node.properties["rows"] = 1
+
+        node3 = Node(name="test_node3", rows=1)
+        assert node3.properties == {"rows": 1}
+
+    def test_names_are_interned(self) -> None:
+        name = "".join(["test_", "node"])
+        assert Node(name=name).name is Node(name="test_node", version=2).name
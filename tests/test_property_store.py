@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from data_version_graph.database import Base, NodeModel
+from data_version_graph.nodes import EMPTY_PROPERTIES, Node
+from data_version_graph.property_store import CACHE_ENTRY_BYTES, PropertyStore
+
+
+class TestPropertyStore:
+    def setup_method(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.session.execute(
+            insert(NodeModel),
+            [
+                {"ntype": "Node", "name": "test", "version": 1, "properties": None},
+                {"ntype": "Node", "name": "test", "version": 2, "properties": {"a": 1}},
+                {
+                    "ntype": "Node",
+                    "name": "test2",
+                    "version": 1,
+                    "properties": {"b": 2},
+                },
+                {
+                    "ntype": "Node",
+                    "name": "test3",
+                    "version": 1,
+                    "properties": {"schema": "x" * 1000},
+                },
+            ],
+        )
+        self.session.commit()
+        self.store = PropertyStore(self.session)
+
+    def teardown_method(self) -> None:
+        self.session.close()
+        Base.metadata.drop_all(self.engine)
+
+    def test_load(self) -> None:
+        assert self.store.load(Node("test")) is EMPTY_PROPERTIES
+        properties = self.store.load(Node("test", version=2))
+        assert properties == {"a": 1}
+        with pytest.raises(TypeError):
+            properties["a"] = 2
+
+        # a second load is served from the cache.
+        assert self.store.load(Node("test", version=2)) is properties
+        assert (self.store.hits, self.store.misses) == (1, 2)
+        assert Node("test", version=2) in self.store
+        assert "test" not in self.store
+
+        assert self.store.load(Node("missing")) is EMPTY_PROPERTIES
+
+    def test_lazy_node(self) -> None:
+        node = Node("test2")
+        node.properties = self.store
+        assert node.lazy_properties
+        assert len(self.store) == 0
+
+        assert node.properties == {"b": 2}
+        assert len(self.store) == 1
+
+    def test_prefetch(self) -> None:
+        nodes = [Node("test", version=2), Node("test2"), Node("test2", version=5)]
+        self.store.prefetch(nodes)
+        assert len(self.store) == 2
+        assert self.store.misses == 0
+
+        assert self.store.load(nodes[0]) == {"a": 1}
+        assert self.store.load(nodes[1]) == {"b": 2}
+        assert self.store.hits == 2
+
+    def test_size_based_eviction(self) -> None:
+        store = PropertyStore(self.session, max_bytes=3 * CACHE_ENTRY_BYTES)
+        store.load(Node("test"))
+        store.load(Node("test", version=2))
+        store.load(Node("test2"))
+        assert len(store) == 2
+        assert Node("test") not in store
+        assert store.size <= store.max_bytes
+
+        # touching an entry protects it from the next eviction.
+        store.load(Node("test", version=2))
+        store.load(Node("test"))
+        assert Node("test", version=2) in store
+        assert Node("test2") not in store
+
+        # values larger than the whole budget are returned but not kept.
+        assert store.load(Node("test3")) == {"schema": "x" * 1000}
+        assert Node("test3") not in store
+
+    def test_discard_and_clear(self) -> None:
+        self.store.prefetch([Node("test"), Node("test2")])
+        size = self.store.size
+
+        self.store.discard(Node("test2"))
+        assert Node("test2") not in self.store
+        assert self.store.size < size
+
+        self.store.clear()
+        assert len(self.store) == 0
+        assert self.store.size == 0
@@ -0,0 +1,123 @@
+import os
+
+import pytest
+from sqlalchemy import delete, event
+from sqlalchemy.orm import Session
+
+from data_version_graph.database import EdgeModel, create_database
+from data_version_graph.graph import Graph
+from data_version_graph.nodes import BigQueryTable, Node
+from data_version_graph.snapshot import (
+    MAGIC,
+    Snapshot,
+    SnapshotError,
+    write_snapshot,
+)
+
+
+class TestSnapshot:
+    def setup_method(self) -> None:
+        self.session: Session = create_database("sqlite:///:memory:")()
+        self.graph = Graph(session=self.session)
+        self.graph.add_edge(Node("a"), BigQueryTable("bé"))
+        self.graph.add_edge(Node("a"), Node("c"))
+        self.graph.add_node(Node("a", version=2))
+
+    def teardown_method(self) -> None:
+        self.session.close()
+
+    def test_write_and_read(self, tmp_path) -> None:
+        path = str(tmp_path / "graph.snapshot")
+        write_snapshot(self.session, path)
+
+        with Snapshot(path) as snapshot:
+            assert len(snapshot) == 4
+            assert snapshot.max_node_id == 4
+            assert snapshot.max_edge_id == 2
+            assert list(snapshot.nodes()) == [
+                ("Node", "a", 1),
+                ("BigQueryTable", "bé", 1),
+                ("Node", "c", 1),
+                ("Node", "a", 2),
+            ]
+            assert list(snapshot.edges()) == [(0, 1), (0, 2)]
+            assert snapshot.position(3) == 2
+            assert snapshot.position(5) is None
+            assert snapshot.is_current(self.session)
+
+        assert os.listdir(tmp_path) == ["graph.snapshot"]
+
+    def test_empty(self, tmp_path) -> None:
+        path = str(tmp_path / "graph.snapshot")
+        write_snapshot(create_database("sqlite:///:memory:")(), path)
+        with Snapshot(path) as snapshot:
+            assert len(snapshot) == 0
+            assert list(snapshot.nodes()) == []
+            assert list(snapshot.edges()) == []
+
+    def test_is_current(self, tmp_path) -> None:
+        path = str(tmp_path / "graph.snapshot")
+        write_snapshot(self.session, path)
+
+        # rows added later are replayed on top of the snapshot.
+        self.graph.add_edge(Node("c"), Node("d"))
+        with Snapshot(path) as snapshot:
+            assert snapshot.is_current(self.session)
+
+        # rows removed through a graph make it stale, even when their ids are
+        # reused by rows added since.
+        self.graph.remove_node(Node("d"))
+        self.graph.add_node(Node("e"))
+        with Snapshot(path) as snapshot:
+            assert snapshot.max_change_id > 0
+            assert not snapshot.is_current(self.session)
+
+        # so do rows deleted directly.
+        write_snapshot(self.session, path)
+        self.session.execute(delete(EdgeModel).where(EdgeModel.id == 1))
+        self.session.commit()
+        with Snapshot(path) as snapshot:
+            assert not snapshot.is_current(self.session)
+
+    def test_edges_to_nodes_added_meanwhile(self, tmp_path) -> None:
+        # Another writer adds a node and an edge to it between the queries for
+        # nodes and edges, which the edges query sees.
+        sessionmaker = create_database(f"sqlite:///{tmp_path / 'graph.db'}")
+        session = sessionmaker()
+        Graph(session=session).add_edge(Node("a"), Node("b"))
+        writer = Graph(session=sessionmaker())
+        path = str(tmp_path / "graph.snapshot")
+
+        def write_meanwhile(state) -> None:
+            froms = state.statement.get_final_froms()
+            if EdgeModel.__table__ in froms and not writer.graph.has_node(Node("c")):
+                writer.add_edge(Node("c"), Node("d"))
+                writer.add_edge(Node("a"), Node("b", version=2))
+
+        event.listen(session, "do_orm_execute", write_meanwhile)
+        write_snapshot(session, path)
+        event.remove(session, "do_orm_execute", write_meanwhile)
+
+        with Snapshot(path) as snapshot:
+            assert len(snapshot) == 2
+            assert snapshot.max_edge_id == 1
+            assert snapshot.is_current(session)
+        graph = Graph(session=session, snapshot_path=path)
+        assert set(graph.graph.edges) == set(writer.graph.edges)
+        session.close()
+        writer.session.close()
+
+    def test_invalid(self, tmp_path) -> None:
+        path = tmp_path / "graph.snapshot"
+        path.write_bytes(b"not a snapshot")
+        with pytest.raises(SnapshotError, match="Not a graph snapshot"):
+            Snapshot(str(path))
+
+        write_snapshot(self.session, str(path))
+        path.write_bytes(path.read_bytes()[:-4])
+        with pytest.raises(SnapshotError, match="Truncated graph snapshot"):
+            Snapshot(str(path))
+
+        path.write_bytes(MAGIC + (2).to_bytes(8, "little") + b"{}")
+        with pytest.raises(SnapshotError, match="Unsupported snapshot format"):
+            Snapshot(str(path))
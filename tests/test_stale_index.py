@@ -0,0 +1,90 @@
+import random
+
+import networkx as nx
+
+from data_version_graph.node_index import NodeIndex
+from data_version_graph.nodes import Node
+from data_version_graph.stale_index import StaleIndex
+
+
+def brute_force(graph: nx.DiGraph, index: NodeIndex) -> dict:
+    stale: dict = {}
+    for from_node, to_node in graph.edges:
+        if index.latest(from_node.name).version > from_node.version:
+            stale.setdefault(to_node, set()).add(from_node)
+    return {node: frozenset(outdated) for node, outdated in stale.items()}
+
+
+class TestStaleIndex:
+    def setup_method(self) -> None:
+        self.a1 = Node("a")
+        self.a2 = Node("a", version=2)
+        self.b = Node("b")
+        self.c = Node("c")
+        self.graph = nx.DiGraph([(self.a1, self.b), (self.a2, self.c)])
+        self.index = NodeIndex(self.graph.nodes)
+        self.stale = StaleIndex(self.graph, self.index)
+
+    def test_rebuild(self) -> None:
+        assert len(self.stale) == 1
+        assert self.b in self.stale
+        assert self.stale.outdated(self.b) == {self.a1}
+        assert self.stale.outdated(self.c) == frozenset()
+        assert self.stale.is_outdated(self.a1)
+        assert not self.stale.is_outdated(self.a2)
+
+    def test_edges(self) -> None:
+        self.graph.add_edge(self.a1, self.c)
+        self.stale.add_edge(self.a1, self.c)
+        assert self.stale.outdated(self.c) == {self.a1}
+
+        self.stale.remove_edge(self.a1, self.c)
+        self.graph.remove_edge(self.a1, self.c)
+        assert self.c not in self.stale
+
+    def test_new_latest_version(self) -> None:
+        a3 = Node("a", version=3)
+        self.graph.add_node(a3)
+        self.index.add(a3)
+        self.stale.add_node(a3)
+        assert dict(self.stale.items()) == {self.b: {self.a1}, self.c: {self.a2}}
+
+        # removing it again makes version 2 the latest.
+        self.stale.remove_node(a3)
+        self.graph.remove_node(a3)
+        self.index.remove(a3)
+        assert dict(self.stale.items()) == {self.b: {self.a1}}
+
+    def test_remove_node(self) -> None:
+        self.stale.remove_node(self.a1)
+        self.graph.remove_node(self.a1)
+        self.index.remove(self.a1)
+        assert len(self.stale) == 0
+
+    def test_matches_brute_force_after_random_changes(self) -> None:
+        rng = random.Random(0)
+        nodes = [Node(name, version=v) for name in "abcdef" for v in (1, 2, 3)]
+        graph = nx.DiGraph()
+        index = NodeIndex()
+        stale = StaleIndex(graph, index)
+        for _ in range(500):
+            node = rng.choice(nodes)
+            if node not in graph:
+                graph.add_node(node)
+                index.add(node)
+                stale.add_node(node)
+            elif rng.random() < 0.2:
+                stale.remove_node(node)
+                graph.remove_node(node)
+                index.remove(node)
+            else:
+                other = rng.choice([n for n in graph if n.name != node.name] or [node])
+                if other is node:
+                    continue
+                if graph.has_edge(node, other):
+                    graph.remove_edge(node, other)
+                    stale.remove_edge(node, other)
+                else:
+                    graph.add_edge(node, other)
+                    stale.add_edge(node, other)
+            assert dict(stale.items()) == brute_force(graph, index)
@@ -0,0 +1,77 @@
+import random
+
+import networkx as nx
+import pytest
+
+from data_version_graph.topological_order import TopologicalOrder
+
+
+def assert_is_topological(order: TopologicalOrder, graph: nx.DiGraph) -> None:
+    for from_node, to_node in graph.edges:
+        assert order.position(from_node) < order.position(to_node)
+
+
+class TestTopologicalOrder:
+    def setup_method(self):
+        self.graph = nx.DiGraph()
+        self.graph.add_edges_from([("a", "b"), ("b", "c")])
+        self.order = TopologicalOrder(self.graph)
+
+    def teardown_method(self):
+        del self.graph
+        del self.order
+
+    def test_init(self):
+        assert "a" in self.order
+        assert "d" not in self.order
+        assert_is_topological(self.order, self.graph)
+
+        self.graph.add_edge("c", "a")
+        with pytest.raises(ValueError, match="The graph contains a cycle"):
+            TopologicalOrder(self.graph)
+
+    def test_add_and_remove_node(self):
+        self.order.add_node("d")
+        assert "d" in self.order
+        assert self.order.position("d") > self.order.position("c")
+
+        self.order.remove_node("d")
+        assert "d" not in self.order
+        self.order.remove_node("d")
+
+    def test_creates_cycle(self):
+        assert self.order.creates_cycle("c", "a")
+        assert self.order.creates_cycle("b", "a")
+        assert self.order.creates_cycle("a", "a")
+        assert not self.order.creates_cycle("a", "c")
+        assert not self.order.creates_cycle("c", "d")
+        assert not self.order.creates_cycle("d", "a")
+
+    def test_add_edge_reorders_affected_window(self):
+        self.graph.add_node("d")
+        self.order.add_node("d")
+        assert self.order.position("d") > self.order.position("a")
+
+        assert not self.order.creates_cycle("d", "a")
+        self.graph.add_edge("d", "a")
+        self.order.add_edge("d", "a")
+        assert_is_topological(self.order, self.graph)
+        assert self.order.creates_cycle("c", "d")
+
+    def test_matches_networkx_on_random_graphs(self):
+        rng = random.Random(0)
+        graph = nx.DiGraph()
+        graph.add_nodes_from(range(50))
+        order = TopologicalOrder(graph)
+
+        for _ in range(500):
+            from_node, to_node = rng.randrange(50), rng.randrange(50)
+            candidate = graph.copy()
+            candidate.add_edge(from_node, to_node)
+            expected = not nx.is_directed_acyclic_graph(candidate)
+
+            assert order.creates_cycle(from_node, to_node) is expected
+            if not expected:
+                graph.add_edge(from_node, to_node)
+                order.add_edge(from_node, to_node)
+                assert_is_topological(order, graph)
@@ -0,0 +1,187 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from data_version_graph.database import Base, ChangeModel, EdgeModel, NodeModel
+from data_version_graph.nodes import BigQueryTable, Node
+from data_version_graph.write_buffer import (
+    WriteBuffer,
+    select_edge_ids,
+    select_node_ids,
+)
+
+
+class TestWriteBuffer:
+    def setup_method(self) -> None:
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.buffer = WriteBuffer()
+
+        self.node = Node("test")
+        self.node2 = BigQueryTable("test2", rows=1)
+        self.node3 = Node("test", version=2)
+
+    def teardown_method(self) -> None:
+        self.session.close()
+        Base.metadata.drop_all(self.engine)
+
+    def test_bool_and_clear(self) -> None:
+        assert not self.buffer
+        self.buffer.add_node(self.node)
+        assert self.buffer
+
+        self.buffer.clear()
+        assert not self.buffer
+
+    def test_flush_inserts(self) -> None:
+        self.buffer.add_node(self.node)
+        self.buffer.add_edge(self.node, self.node2)
+        self.buffer.add_node(self.node2)
+        self.buffer.flush(self.session)
+        assert not self.buffer
+
+        rows = self.session.query(NodeModel).order_by(NodeModel.id).all()
+        assert [(row.ntype, row.name, row.version) for row in rows] == [
+            ("Node", "test", 1),
+            ("BigQueryTable", "test2", 1),
+        ]
+        assert rows[1].properties == {"rows": 1}
+        edge = self.session.query(EdgeModel).one()
+        assert (edge.from_node_id, edge.to_node_id) == (rows[0].id, rows[1].id)
+
+        # flushing the same writes again does not duplicate rows.
+        self.buffer.add_node(self.node)
+        self.buffer.add_node(self.node2)
+        self.buffer.add_edge(self.node, self.node2)
+        self.buffer.flush(self.session)
+        assert self.session.query(NodeModel).count() == 2
+        assert self.session.query(EdgeModel).count() == 1
+
+    def test_flush_deletes(self) -> None:
+        for node in (self.node, self.node2, self.node3):
+            self.buffer.add_node(node)
+        self.buffer.add_edge(self.node, self.node2)
+        self.buffer.add_edge(self.node2, self.node3)
+        self.buffer.flush(self.session)
+
+        self.buffer.remove_edge(self.node, self.node2)
+        self.buffer.remove_node(self.node)
+        self.buffer.flush(self.session)
+        assert [row.name for row in self.session.query(NodeModel)] == [
+            "test2",
+            "test",
+        ]
+        assert self.session.query(EdgeModel).count() == 1
+
+    def test_flush_deletes_incident_edges(self) -> None:
+        # SQLite only enforces foreign keys when asked to.
+        self.session.execute(text("PRAGMA foreign_keys = ON"))
+        for node in (self.node, self.node2, self.node3):
+            self.buffer.add_node(node)
+        self.buffer.add_edge(self.node, self.node2)
+        self.buffer.add_edge(self.node2, self.node3)
+        self.buffer.add_edge(self.node, self.node3)
+        self.buffer.flush(self.session)
+        node3_id = select_node_ids(self.session, [("test", 2)])[("test", 2)]
+
+        self.buffer.remove_node(self.node)
+        self.buffer.remove_node(self.node2)
+        self.buffer.flush(self.session)
+        assert [row.id for row in self.session.query(NodeModel)] == [node3_id]
+        assert self.session.query(EdgeModel).count() == 0
+
+    def test_flush_logs_changes(self) -> None:
+        self.buffer.add_node(self.node)
+        self.buffer.add_node(self.node2)
+        self.buffer.add_edge(self.node, self.node2)
+        assert self.buffer.flush(self.session) == [1, 2, 3]
+        assert self.buffer.flush(self.session) == []
+        # nodes that already have a row are not logged again.
+        self.buffer.add_node(self.node)
+        self.buffer.add_edge(self.node, self.node2)
+        assert self.buffer.flush(self.session) == [4]
+
+        self.buffer.remove_edge(self.node, self.node2)
+        self.buffer.remove_node(self.node)
+        # dropped with its endpoint, so it is not logged either.
+        self.buffer.add_edge(self.node, self.node2)
+        self.buffer.remove_node(self.node)
+        self.buffer.add_node(self.node3)
+        self.buffer.flush(self.session)
+
+        changes = self.session.query(ChangeModel).order_by(ChangeModel.id).all()
+        assert [
+            (
+                change.operation,
+                change.ntype,
+                change.name,
+                change.version,
+                change.to_name,
+                change.to_version,
+            )
+            for change in changes
+        ] == [
+            ("add_node", "Node", "test", 1, None, None),
+            ("add_node", "BigQueryTable", "test2", 1, None, None),
+            ("add_edge", None, "test", 1, "test2", 1),
+            ("add_edge", None, "test", 1, "test2", 1),
+            ("remove_edge", None, "test", 1, "test2", 1),
+            ("remove_node", None, "test", 1, None, None),
+            ("add_node", "Node", "test", 2, None, None),
+        ]
+
+    def test_flush_returns_change_ids_without_returning(self, monkeypatch) -> None:
+        # As on MySQL, which has no RETURNING for many rows.
+        monkeypatch.setattr(self.engine.dialect, "insert_executemany_returning", False)
+        self.buffer.add_node(self.node)
+        self.buffer.add_node(self.node2)
+        self.buffer.add_edge(self.node, self.node2)
+        assert self.buffer.flush(self.session) == [1, 2, 3]
+        self.buffer.remove_node(self.node)
+        assert self.buffer.flush(self.session) == [4]
+
+    def test_failed_flush_logs_nothing(self, monkeypatch) -> None:
+        def fail(*args, **kwargs):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(WriteBuffer, "_insert_edges", fail)
+        self.buffer.add_node(self.node)
+        with pytest.raises(RuntimeError):
+            self.buffer.flush(self.session)
+        assert self.session.query(ChangeModel).count() == 0
+        assert self.session.query(NodeModel).count() == 0
+
+    def test_remove_cancels_pending_add(self) -> None:
+        self.buffer.add_node(self.node)
+        self.buffer.add_edge(self.node, self.node3)
+        self.buffer.remove_node(self.node)
+        self.buffer.remove_edge(self.node, self.node3)
+        self.buffer.flush(self.session)
+        assert self.session.query(NodeModel).count() == 0
+        assert self.session.query(EdgeModel).count() == 0
+
+    def test_select_ids(self) -> None:
+        for node in (self.node, self.node2, self.node3):
+            self.buffer.add_node(node)
+        self.buffer.add_edge(self.node, self.node2)
+        self.buffer.flush(self.session)
+
+        node_ids = select_node_ids(
+            self.session, [("test", 1), ("test2", 1), ("test2", 2)]
+        )
+        assert node_ids == {("test", 1): 1, ("test2", 1): 2}
+        assert select_edge_ids(self.session, [(1, 2), (2, 1), (1, 3)]) == {(1, 2)}
+
+    def test_flush_without_conflict_clause(self, monkeypatch) -> None:
+        monkeypatch.setattr(
+            "data_version_graph.write_buffer.insert_ignoring_duplicates",
+            lambda model, dialect_name: None,
+        )
+        for _ in range(2):
+            self.buffer.add_node(self.node)
+            self.buffer.add_node(self.node2)
+            self.buffer.add_edge(self.node, self.node2)
+            self.buffer.flush(self.session)
+        assert self.session.query(NodeModel).count() == 2
+        assert self.session.query(EdgeModel).count() == 1